@@ -1,16 +1,133 @@
-import json
 import os
+import pickle
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from SCstorage import JsonStore, SqliteStore, SCConflict
+from SCvalidators.PMstate import ValidationState
 
+# Хранилище выбирается переменной окружения SMARTGRANT_STORAGE: json (по умолчанию) или sqlite
+SC_FOLDER = "SmartContracts"
+SC_DATABASE = os.path.join(SC_FOLDER, "contracts.db")
+STORAGE = os.environ.get("SMARTGRANT_STORAGE", "json")
 
-def saveSC(name, sc):
-    with open(f"SmartContracts/{name}.json", "w", encoding="utf-8") as f:
-            json.dump(sc, f, ensure_ascii=False, indent=2)
+# Кэш прочитанных контрактов в процессе: имя -> (версия хранилища, pickle контракта).
+# Версия - mtime/размер файлов или счётчик в SQLite; pickle.loads отдаёт независимую копию,
+# так что правки контракта вызывающим кодом (handlePayments и т.п.) не портят кэш.
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 64 * 1024 * 1024
 
-def readSC(name):
-      with open(f"SmartContracts/{name}.json", "r", encoding="utf-8") as f:
-            return json.load(f)
+PAY_RETRIES = 50
+
+_store = None
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+def getStore():
+    global _store
+    if _store is None:
+        _store = SqliteStore(SC_DATABASE) if STORAGE == "sqlite" else JsonStore(SC_FOLDER)
+    return _store
+
+
+def _cache_put(name, version, sc):
+    global _cache_bytes
+    data = pickle.dumps(sc, protocol=pickle.HIGHEST_PROTOCOL)
+    with _cache_lock:
+        if name in _cache:
+            _cache_bytes -= len(_cache.pop(name)[1])
+        _cache[name] = (version, data)
+        _cache_bytes += len(data)
+        while _cache and (len(_cache) > CACHE_MAX_ENTRIES or _cache_bytes > CACHE_MAX_BYTES):
+            _cache_bytes -= len(_cache.popitem(last=False)[1][1])
+
+def _cache_clear():
+    """Сбрасывает кэш контрактов (например, при смене хранилища)"""
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+def _cache_get(name, version):
+    with _cache_lock:
+        cached = _cache.get(name)
+        if cached is None or cached[0] != version:
+            cache_stats["misses"] += 1
+            return None
+        _cache.move_to_end(name)
+        cache_stats["hits"] += 1
+    return pickle.loads(cached[1])
+
+
+def saveSC(name, sc, expected_version=None):
+    """
+    Сохраняет контракт и возвращает его новую версию.
+    С expected_version сохранение идёт через сравнение с обменом: если контракт
+    изменился после чтения этой версии, бросается SCConflict.
+    """
+    version = getStore().save(name, sc, expected_version=expected_version)
+    _cache_put(name, version, sc)
+    return version
+
+def readSC(name, versioned=False):
+    """Контракт (независимая копия); с versioned=True - пара (контракт, версия) для saveSC/CAS"""
+    store = getStore()
+    # Версия снимается до чтения: в худшем случае свежие данные лягут под старую версию
+    # и дадут лишний промах кэша или конфликт CAS, но не устаревшее чтение
+    version = store.version(name)
+    sc = _cache_get(name, version)
+    if sc is None:
+        sc = store.read(name)
+        _cache_put(name, version, sc)
+    return (sc, version) if versioned else sc
       
 def getSCs():
-    folder = r"SmartContracts"
-    return [name[:-5] for name in os.listdir(folder)]
-        
\ No newline at end of file
+    return getStore().names()
+
+def paySC(name, transfer_list, retries=PAY_RETRIES):
+    """
+    Проверяет переводы по состоянию гранта и, если ошибок нет, учитывает их.
+    Запись идёт через CAS: если грант успел оплатить другой сеанс,
+    переводы перепроверяются по свежему состоянию.
+    Возвращает список ошибок (пустой - оплачено).
+    """
+    for attempt in range(retries):
+        sc, version = readSC(name, versioned=True)
+        state = ValidationState.from_contract(sc, key=(name, version))
+        errors = state.apply_all(transfer_list)
+        if errors:
+            return errors
+
+        entries = []
+        for trn in transfer_list:
+            stage_id, rule_id, _ = state.resolve(trn)
+            entries.append((stage_id, rule_id, trn['amount'], trn))
+        sc = state.store(sc)
+        try:
+            version = getStore().add_payments(name, sc, entries, expected_version=version)
+        except SCConflict:
+            # Случайная пауза разводит сеансы, столкнувшиеся на одном гранте
+            time.sleep(random.uniform(0, 0.005 * 2 ** min(attempt, 6)))
+            continue
+        _cache_put(name, version, sc)
+        return []
+    raise SCConflict(f"Не удалось провести оплату гранта {name}: {retries} конфликтов подряд")
+
+def getPayments(name):
+    """Журнал принятых платежей гранта"""
+    return list(getStore().payments(name))
+
+def importSCs(folder=SC_FOLDER, overwrite=False):
+    """Разовый перенос JSON-контрактов из folder в SQLite"""
+    return SqliteStore(SC_DATABASE).import_json(folder, overwrite=overwrite)
+
+
+if __name__ == "__main__":
+    # python SChandler.py import - перенести SmartContracts/*.json в SQLite
+    if sys.argv[1:2] == ["import"]:
+        imported = importSCs(overwrite="--overwrite" in sys.argv)
+        print(f"Перенесено контрактов: {len(imported)}")
@@ -0,0 +1,499 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from SCvalidators.PMstate import STATE_KEY, ValidationState
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    import msvcrt
+
+# ========================
+# Хранилища смарт-контрактов
+# ========================
+
+
+class SCConflict(Exception):
+    """Контракт изменён другим сеансом после чтения (версия не совпала)"""
+
+
+def _tail_seq(path):
+    """seq последней целой строки журнала (читается только конец файла)"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return 0
+    with f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        block = 4096
+        while True:
+            f.seek(max(0, size - block))
+            lines = f.read().split(b"\n")
+            for line in reversed(lines[1:] if size > block else lines):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                return entry["seq"] if isinstance(entry, dict) else entry[0]
+            if block >= size:
+                return 0
+            block *= 4
+
+
+@contextmanager
+def _file_lock(path):
+    """Эксклюзивная блокировка файла между потоками и процессами"""
+    with open(path, "a+b") as f:
+        if msvcrt:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class JsonStore:
+    """
+    Контракты в виде JSON-файлов SmartContracts/<имя>.json (снимок)
+    и журнала платежей SmartContracts/<имя>.journal (одна строка на принятый перевод).
+    Платёж - дозапись в журнал; раз в snapshot_every записей журнал переносится
+    в архив <имя>.ledger и сворачивается в новый снимок.
+
+    Журнал начинается строкой-заголовком {"rev": N, "seq": S}: rev растёт при каждом
+    сохранении снимка, а внутри ревизии журнал только растёт, поэтому пара
+    (rev, размер журнала) - точная версия для сравнения с обменом (CAS).
+    Запись идёт под блокировкой файла SmartContracts/.<имя>.lock.
+    """
+
+    def __init__(self, folder, snapshot_every=200, fsync_batch=1):
+        self.folder = folder
+        self.snapshot_every = snapshot_every
+        self.fsync_batch = fsync_batch
+        self._unsynced = {}
+
+    def path(self, name):
+        return os.path.join(self.folder, f"{name}.json")
+
+    def journal_path(self, name):
+        return os.path.join(self.folder, f"{name}.journal")
+
+    def ledger_path(self, name):
+        return os.path.join(self.folder, f"{name}.ledger")
+
+    def lock_path(self, name):
+        return os.path.join(self.folder, f".{name}.lock")
+
+    def names(self):
+        if not os.path.isdir(self.folder):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.folder) if name.endswith(".json"))
+
+    def _header(self, name):
+        """Заголовок журнала {"rev", "seq"} или None для журналов без заголовка"""
+        try:
+            with open(self.journal_path(name), "r", encoding="utf-8") as f:
+                entry = json.loads(f.readline())
+        except (FileNotFoundError, ValueError):
+            return None
+        return entry if isinstance(entry, dict) else None
+
+    def version(self, name):
+        """
+        Версия контракта для кэша и CAS: mtime/размер снимка, ревизия и размер журнала.
+        Обходится в два stat и чтение первой строки журнала.
+        """
+        snapshot = os.stat(self.path(name))
+        header = self._header(name)
+        try:
+            journal_size = os.stat(self.journal_path(name)).st_size
+        except FileNotFoundError:
+            journal_size = None
+        return (snapshot.st_mtime_ns, snapshot.st_size, header["rev"] if header else 0, journal_size)
+
+    def read(self, name):
+        """Снимок + хвост журнала после него"""
+        with open(self.path(name), "r", encoding="utf-8") as f:
+            sc = json.load(f)
+        base_seq = sc.get(STATE_KEY, {}).get("journal_seq", 0)
+        tail = [entry for entry in self._entries(self.journal_path(name)) if entry[0] > base_seq]
+        if tail:
+            state = ValidationState.from_contract(sc)
+            for _, stage_id, rule_id, amount, _ in tail:
+                if (stage_id, rule_id) in state.spent:
+                    state.spent[(stage_id, rule_id)] += amount
+            state.store(sc)
+        return sc
+
+    def _entries(self, path):
+        """Записи [seq, stage_id, rule_id, amount, transfer]; заголовок и оборванные строки пропускаются"""
+        try:
+            f = open(path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, list):
+                    yield entry
+
+    def last_seq(self, name):
+        """Последний выданный seq; обычно это конец журнала или его заголовок"""
+        seq = _tail_seq(self.journal_path(name))
+        if not seq:
+            seq = _tail_seq(self.ledger_path(name))
+            if os.path.exists(self.path(name)):
+                seq = max(seq, self._snapshot_state(name).get("journal_seq", 0))
+        return seq
+
+    def _check_version(self, name, expected_version):
+        if expected_version is not None and self.version(name) != expected_version:
+            raise SCConflict(f"Смарт-контракт {name} изменён другим сеансом")
+
+    def save(self, name, sc, expected_version=None):
+        """
+        Атомарно пишет снимок (временный файл + os.replace) и возвращает новую версию.
+        Хвост журнала сначала дописывается в архив, затем журнал начинается заново с заголовка;
+        записи с seq <= journal_seq уже в снимке, так что обрыв на любом шаге ничего не удвоит.
+        journal_seq проставляется и в переданном sc.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        with _file_lock(self.lock_path(name)):
+            if expected_version is not None:
+                self._check_version(name, expected_version)
+            return self._save(name, sc)
+
+    def _save(self, name, sc):
+        seq = self.last_seq(name)
+        header = self._header(name)
+        rev = header["rev"] + 1 if header else 1
+        if os.path.exists(self.path(name)):
+            rev = max(rev, self._snapshot_state(name).get("rev", 0) + 1)
+
+        ledger_seq = _tail_seq(self.ledger_path(name))
+        archived = [entry for entry in self._entries(self.journal_path(name)) if entry[0] > ledger_seq]
+        if archived:
+            with open(self.ledger_path(name), "a", encoding="utf-8") as f:
+                f.writelines(self._line(entry) for entry in archived)
+                f.flush()
+                os.fsync(f.fileno())
+
+        if STATE_KEY in sc:
+            sc[STATE_KEY]["journal_seq"] = seq
+            sc[STATE_KEY]["rev"] = rev
+        tmp_path = os.path.join(self.folder, f".{name}.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sc, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path(name))
+
+        with open(self.journal_path(name), "w", encoding="utf-8") as f:
+            f.write(self._line({"rev": rev, "seq": seq}))
+        return self.version(name)
+
+    @staticmethod
+    def _line(entry):
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def add_payments(self, name, sc, entries, expected_version=None):
+        """
+        Дозаписывает принятые переводы в журнал: O(1) на платёж вместо перезаписи контракта.
+        entries - [(stage_id, rule_id, amount, transfer), ...]
+        """
+        with _file_lock(self.lock_path(name)):
+            if expected_version is not None:
+                self._check_version(name, expected_version)
+
+            seq = self.last_seq(name)
+            lines = []
+            for stage_id, rule_id, amount, trn in entries:
+                seq += 1
+                lines.append(self._line([seq, stage_id, rule_id, amount, trn]))
+
+            if not os.path.exists(self.journal_path(name)) and not self._snapshot_state(name):
+                # Первый платёж старого контракта: записи сразу в архив и снимок с перенесённым состоянием
+                with open(self.ledger_path(name), "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+                return self._save(name, sc)
+
+            with open(self.journal_path(name), "a+b") as f:
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # Остаток оборванной записи не должен склеиться с новой
+                        lines.insert(0, "\n")
+                f.write("".join(lines).encode("utf-8"))
+                f.flush()
+                # fsync пачками: один на fsync_batch вызовов
+                self._unsynced[name] = self._unsynced.get(name, 0) + 1
+                if self._unsynced[name] >= self.fsync_batch:
+                    os.fsync(f.fileno())
+                    self._unsynced[name] = 0
+
+            if seq - sc.get(STATE_KEY, {}).get("journal_seq", 0) >= self.snapshot_every:
+                return self._save(name, sc)
+            return self.version(name)
+
+    def _snapshot_state(self, name):
+        with open(self.path(name), "r", encoding="utf-8") as f:
+            return json.load(f).get(STATE_KEY, {})
+
+    def payments(self, name):
+        """Полный журнал платежей гранта (архив + текущий хвост) для аудита и повторного проигрывания"""
+        seq = 0
+        for path in (self.ledger_path(name), self.journal_path(name)):
+            for entry in self._entries(path):
+                if entry[0] > seq:
+                    seq = entry[0]
+                    yield {"seq": entry[0], "stage_id": entry[1], "rule_id": entry[2],
+                           "amount": entry[3], "transfer": entry[4]}
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS grants (
+    name TEXT PRIMARY KEY,
+    metadata TEXT NOT NULL,
+    extra TEXT NOT NULL,
+    state_version INTEGER,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS stages (
+    grant_name TEXT NOT NULL REFERENCES grants(name) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    stage_id TEXT NOT NULL,
+    start_date TEXT,
+    end_date TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (grant_name, position)
+);
+CREATE TABLE IF NOT EXISTS rules (
+    grant_name TEXT NOT NULL REFERENCES grants(name) ON DELETE CASCADE,
+    stage_position INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    stage_id TEXT NOT NULL,
+    rule_id TEXT NOT NULL,
+    rule_type TEXT,
+    limit_amount NUMERIC,
+    spent NUMERIC NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    PRIMARY KEY (grant_name, stage_position, position)
+);
+CREATE INDEX IF NOT EXISTS rules_by_key ON rules (grant_name, stage_id, rule_id);
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    grant_name TEXT NOT NULL REFERENCES grants(name) ON DELETE CASCADE,
+    stage_id TEXT NOT NULL,
+    rule_id TEXT NOT NULL,
+    amount NUMERIC NOT NULL,
+    transfer TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS payments_by_grant ON payments (grant_name, id);
+"""
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class SqliteStore:
+    """
+    Контракты в SQLite (режим WAL): гранты, этапы, правила и платежи - отдельные таблицы.
+    Траты обновляются построчно, без перезаписи всего контракта.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def names(self):
+        return [row[0] for row in self._connect().execute("SELECT name FROM grants ORDER BY name")]
+
+    def version(self, name):
+        """Версия контракта: растёт при каждом сохранении и платеже"""
+        row = self._connect().execute("SELECT version FROM grants WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Смарт-контракт {name} не найден")
+        return row[0]
+
+    def read(self, name):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT metadata, extra, state_version FROM grants WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Смарт-контракт {name} не найден")
+        metadata, extra, state_version = row
+
+        sc = {"grant_metadata": json.loads(metadata)}
+        stages = []
+        for (data,) in conn.execute(
+            "SELECT data FROM stages WHERE grant_name = ? ORDER BY position", (name,)
+        ):
+            stage = json.loads(data)
+            stage['spending_rules'] = []
+            stages.append(stage)
+
+        spent = []
+        seen = set()
+        for stage_position, data, spent_amount in conn.execute(
+            "SELECT stage_position, data, spent FROM rules WHERE grant_name = ? ORDER BY stage_position, position",
+            (name,),
+        ):
+            rule = json.loads(data)
+            rule['spent'] = spent_amount
+            stage = stages[stage_position]
+            stage['spending_rules'].append(rule)
+            key = (stage['stage_id'], rule['rule_id'])
+            if spent_amount and key not in seen:
+                spent.append([stage['stage_id'], rule['rule_id'], spent_amount])
+            seen.add(key)
+        sc['stages'] = stages
+        sc.update(json.loads(extra))
+        if state_version is not None:
+            sc[STATE_KEY] = {"version": state_version, "spent": spent}
+        return sc
+
+    def _begin(self, conn, name, expected_version):
+        """Транзакция с блокировкой записи сразу (BEGIN IMMEDIATE) и проверкой версии"""
+        conn.execute("BEGIN IMMEDIATE")
+        if expected_version is not None:
+            row = conn.execute("SELECT version FROM grants WHERE name = ?", (name,)).fetchone()
+            if row is None or row[0] != expected_version:
+                raise SCConflict(f"Смарт-контракт {name} изменён другим сеансом")
+
+    def save(self, name, sc, expected_version=None):
+        conn = self._connect()
+        with conn:
+            self._begin(conn, name, expected_version)
+            self._write(conn, name, sc)
+            return conn.execute("SELECT version FROM grants WHERE name = ?", (name,)).fetchone()[0]
+
+    def _write(self, conn, name, sc):
+        state = sc.get(STATE_KEY)
+        spent = {}
+        if state is not None:
+            spent = {(stage_id, rule_id): amount for stage_id, rule_id, amount in state['spent']}
+        extra = {key: value for key, value in sc.items()
+                 if key not in ("grant_metadata", "stages", STATE_KEY)}
+
+        conn.execute(
+            "INSERT INTO grants (name, metadata, extra, state_version) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET metadata = excluded.metadata, extra = excluded.extra, "
+            "state_version = excluded.state_version, version = grants.version + 1",
+            (name, _dumps(sc.get('grant_metadata', {})), _dumps(extra),
+             state['version'] if state is not None else None),
+        )
+        conn.execute("DELETE FROM rules WHERE grant_name = ?", (name,))
+        conn.execute("DELETE FROM stages WHERE grant_name = ?", (name,))
+
+        stage_rows = []
+        rule_rows = []
+        for stage_position, stage in enumerate(sc.get('stages', [])):
+            stage_data = {key: value for key, value in stage.items() if key != 'spending_rules'}
+            stage_rows.append((name, stage_position, _dumps(stage['stage_id']),
+                               stage.get('start_date'), stage.get('end_date'), _dumps(stage_data)))
+            for position, rule in enumerate(stage.get('spending_rules', [])):
+                rule_data = {key: value for key, value in rule.items() if key != 'spent'}
+                if state is not None:
+                    used = spent.get((stage['stage_id'], rule['rule_id']), 0)
+                else:
+                    used = rule.get('spent', 0)
+                rule_rows.append((name, stage_position, position, _dumps(stage['stage_id']),
+                                  str(rule['rule_id']), rule.get('rule_type'), rule.get('limit'),
+                                  used, _dumps(rule_data)))
+        conn.executemany(
+            "INSERT INTO stages (grant_name, position, stage_id, start_date, end_date, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)", stage_rows)
+        conn.executemany(
+            "INSERT INTO rules (grant_name, stage_position, position, stage_id, rule_id, rule_type, "
+            "limit_amount, spent, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rule_rows)
+
+    def add_payments(self, name, sc, entries, expected_version=None):
+        """
+        Построчный учёт принятых платежей: spent += amount у правила и запись в payments.
+        entries - [(stage_id, rule_id, amount, transfer), ...]
+        """
+        conn = self._connect()
+        now = datetime.now().isoformat(timespec="seconds")
+        with conn:
+            self._begin(conn, name, expected_version)
+            if conn.execute("SELECT state_version FROM grants WHERE name = ?", (name,)).fetchone()[0] is None:
+                # Первый платёж старого контракта: сохраняем перенесённое состояние целиком
+                self._write(conn, name, sc)
+            else:
+                for stage_id, rule_id, amount, _ in entries:
+                    conn.execute(
+                        "UPDATE rules SET spent = spent + ? WHERE rowid = ("
+                        "SELECT rowid FROM rules WHERE grant_name = ? AND stage_id = ? AND rule_id = ? "
+                        "ORDER BY stage_position, position LIMIT 1)",
+                        (amount, name, _dumps(stage_id), str(rule_id)),
+                    )
+                conn.execute("UPDATE grants SET version = version + 1 WHERE name = ?", (name,))
+            conn.executemany(
+                "INSERT INTO payments (grant_name, stage_id, rule_id, amount, transfer, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(name, _dumps(stage_id), str(rule_id), amount, _dumps(trn), now)
+                 for stage_id, rule_id, amount, trn in entries],
+            )
+            return conn.execute("SELECT version FROM grants WHERE name = ?", (name,)).fetchone()[0]
+
+    def payments(self, name):
+        """Журнал платежей гранта для аудита и повторного проигрывания"""
+        for seq, stage_id, rule_id, amount, trn in self._connect().execute(
+            "SELECT id, stage_id, rule_id, amount, transfer FROM payments WHERE grant_name = ? ORDER BY id",
+            (name,),
+        ):
+            yield {"seq": seq, "stage_id": json.loads(stage_id), "rule_id": rule_id,
+                   "amount": amount, "transfer": json.loads(trn)}
+
+    def import_json(self, folder, overwrite=False):
+        """Разовый перенос SmartContracts/*.json в базу. Возвращает имена перенесённых грантов"""
+        source = JsonStore(folder)
+        existing = set(self.names())
+        imported = []
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for name in source.names():
+                if name in existing and not overwrite:
+                    continue
+                self._write(conn, name, source.read(name))
+                imported.append(name)
+        return imported
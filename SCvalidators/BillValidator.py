@@ -1,33 +1,38 @@
 import time
-import requests
 import base64
-import re
-import json
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+import threading
 from config import NVIDIA_API_BILL, LLM_API_URL
+from SCvalidators.FNScookies import BASE_URL, USER_AGENT, cookie_provider
+from SCvalidators import HTTPpool
+from SCvalidators.LLMgateway import llm_gateway
+from SCvalidators.ReceiptImage import preprocess_receipt
+from SCvalidators.ReceiptQR import qr_stats
 
-BASE_URL = "https://kkt-online.nalog.ru"
 NVIDIA_API_KEY = NVIDIA_API_BILL
-
-def extract_receipt_data_from_image(image):
-    image_b64 = base64.b64encode(image.getvalue()).decode()
-
-    invoke_url = LLM_API_URL
-    
-    
-    headers = {
-        "Authorization": f"Bearer {NVIDIA_API_KEY}",
-        "Accept": "application/json"
-    }
+# Модели с распознаванием изображений: шлюз шлёт чек самой быстрой, при ошибке или долгом ответе - другой
+RECEIPT_MODELS = ["meta/llama-4-maverick-17b-128e-instruct", "meta/llama-4-scout-17b-16e-instruct"]
+
+# Накопленная статистика распознавания: вес картинок до/после подготовки и время
+ocr_stats = {"images": 0, "before_bytes": 0, "after_bytes": 0, "preprocess_ms": 0.0, "llm_calls": 0, "llm_ms": 0.0}
+_stats_lock = threading.Lock()
+
+def extract_receipt_data_from_image(image, preprocess=True):
+    mime = "image/jpeg"
+    if preprocess:
+        jpeg, stats = preprocess_receipt(image)
+        mime = stats["mime"]
+        with _stats_lock:
+            ocr_stats["images"] += 1
+            ocr_stats["before_bytes"] += stats["before_bytes"]
+            ocr_stats["after_bytes"] += stats["after_bytes"]
+            ocr_stats["preprocess_ms"] += stats["ms"]
+    else:
+        jpeg = image.getvalue()
+    image_b64 = base64.b64encode(jpeg).decode()
+
+    gateway = llm_gateway("receipt", LLM_API_URL, NVIDIA_API_KEY, RECEIPT_MODELS)
 
     payload = {
-        "model": "meta/llama-4-maverick-17b-128e-instruct",
         "messages": [
             {
                 "role": "user",
@@ -53,7 +58,7 @@ def extract_receipt_data_from_image(image):
         }}
 
         Некоторые значения статичны. Если значения не найдены, укажи нули во всех пунктах
-        <img src="data:image/png;base64,{image_b64}" />"""
+        <img src="data:{mime};base64,{image_b64}" />"""
                     }
                 ],
                 "max_tokens": 512,
@@ -65,178 +70,56 @@ def extract_receipt_data_from_image(image):
     }
 
     try:
-        response = requests.post(invoke_url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        content = result['choices'][0]['message']['content']
-        
-        json_match = re.search(r'\{.*\}', content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            receipt_data = json.loads(json_str)
-            return receipt_data
-        else:
-            raise ValueError("JSON not found in API response")
+        started = time.perf_counter()
+        try:
+            # ответ без JSON шлюз считает ошибкой модели и переходит к следующей
+            reply = gateway.complete(**payload)
+        finally:
+            with _stats_lock:
+                ocr_stats["llm_calls"] += 1
+                ocr_stats["llm_ms"] += (time.perf_counter() - started) * 1000
+        return reply["result"]
             
     except Exception as e:
         print(f"Error extracting data from image: {e}")
         return None
 
-def get_cookies_via_browser():
-    chrome_options = Options()
-    chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--disable-images")
-    chrome_options.add_argument("--disable-javascript")
-    chrome_options.add_argument("--disable-plugins")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-background-networking")
-    chrome_options.add_argument("--safebrowsing-disable-auto-update")
-    chrome_options.add_argument("--disable-client-side-phishing-detection")
-    chrome_options.add_argument("--dns-prefetch-disable")
-    chrome_options.add_argument("--no-proxy-server")
-    chrome_options.add_argument("--memory-efficient-offscreen")
-    chrome_options.add_argument("--max-old-space-size=1024")
-    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    chrome_options.set_capability("pageLoadStrategy", "eager")
-    chrome_options.add_argument("--disable-application-cache")
-
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-
-    try:
-        driver.set_page_load_timeout(10)
-        driver.set_script_timeout(5)
-        
-        driver.get(BASE_URL)
-        
-        try:
-            WebDriverWait(driver, 5).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-        except Exception:
-            pass
-        
-        cookies = driver.get_cookies()
-        cookies_dict = {}
-        for cookie in cookies:
-            cookies_dict[cookie['name']] = cookie['value']
-
-        driver.quit()
-        return cookies_dict
-
-    except Exception:
-        try:
-            cookies = driver.get_cookies()
-            cookies_dict = {}
-            for cookie in cookies:
-                cookies_dict[cookie['name']] = cookie['value']
-            driver.quit()
-            return cookies_dict
-        except:
-            driver.quit()
-            return {}
-
-def get_cookies_via_browser_fast():
-    chrome_options = Options()
-    chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--disable-images")
-    chrome_options.add_argument("--disable-javascript")
-    chrome_options.add_argument("--disable-plugins")
-    chrome_options.add_argument("--disable-extensions")
-    
-    prefs = {
-        'profile.default_content_setting_values': {
-            'images': 2,
-            'plugins': 2,
-            'popups': 2,
-            'geolocation': 2,
-            'notifications': 2,
-            'auto_select_certificate': 2,
-            'fullscreen': 2,
-            'mouselock': 2,
-            'mixed_script': 2,
-            'media_stream': 2,
-            'media_stream_mic': 2,
-            'media_stream_camera': 2,
-            'protocol_handlers': 2,
-            'ppapi_broker': 2,
-            'automatic_downloads': 2,
-            'midi_sysex': 2,
-            'push_messaging': 2,
-            'ssl_cert_decisions': 2,
-            'metro_switch_to_desktop': 2,
-            'protected_media_identifier': 2,
-            'app_banner': 2,
-            'site_engagement': 2,
-            'durable_storage': 2
-        }
+def fast_path_stats():
+    """Сколько чеков распознано по QR и сколько времени и запросов к LLM это сэкономило"""
+    with _stats_lock:
+        llm_calls, llm_ms = ocr_stats["llm_calls"], ocr_stats["llm_ms"]
+    attempts, hits, qr_ms = qr_stats["attempts"], qr_stats["hits"], qr_stats["qr_ms"]
+    llm_avg = llm_ms / llm_calls if llm_calls else 0.0
+    qr_avg = qr_ms / attempts if attempts else 0.0
+    return {
+        "receipts": attempts,
+        "qr_hits": hits,
+        "hit_rate": hits / attempts if attempts else 0.0,
+        "qr_ms_avg": qr_avg,
+        "llm_ms_avg": llm_avg,
+        "llm_calls_saved": hits,
+        # оценка: каждый чек по QR сэкономил средний запрос к LLM за вычетом попытки QR
+        "seconds_saved": hits * max(llm_avg - qr_avg, 0.0) / 1000,
     }
-    chrome_options.add_experimental_option('prefs', prefs)
-    
-    try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        driver.set_page_load_timeout(8)
-        
-        driver.execute_cdp_cmd('Network.setBlockedURLs', {
-            "urls": [
-                "*.gif", "*.jpg", "*.jpeg", "*.png", "*.webp",
-                "*.css", "*.woff", "*.woff2", "*.ttf",
-                "*.mp4", "*.avi", "*.mov",
-                "*.mp3", "*.wav",
-                "*.json", "*.xml"
-            ]
-        })
-        driver.execute_cdp_cmd('Network.enable', {})
-        
-        driver.get(BASE_URL)
-        time.sleep(2)
-        
-        cookies = driver.get_cookies()
-        cookies_dict = {}
-        for cookie in cookies:
-            cookies_dict[cookie['name']] = cookie['value']
-            
-        driver.quit()
-        return cookies_dict
-        
-    except Exception:
-        try:
-            cookies = driver.get_cookies()
-            driver.quit()
-            return {cookie['name']: cookie['value'] for cookie in cookies}
-        except:
-            if 'driver' in locals():
-                driver.quit()
-            return {}
 
-def post_receipt(data, cookies):
-    session = requests.Session()
-
-    for name, value in cookies.items():
-        session.cookies.set(name, value)
+def get_cookies_via_browser():
+    """Cookie через общий headless Chrome (см. FNScookies.BrowserPool)"""
+    return cookie_provider().browser.get_cookies()
 
+def post_receipt(data, cookies):
     headers = {
         "accept": "*/*",
         "content-type": "application/x-www-form-urlencoded; charset=UTF-8",
         "origin": BASE_URL,
         "referer": BASE_URL + "/",
-        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "user-agent": USER_AGENT,
         "x-requested-with": "XMLHttpRequest",
     }
 
     post_url = BASE_URL + "/openapikkt.html"
     
     try:
-        resp = session.post(post_url, data=data, headers=headers, timeout=30)
+        resp = HTTPpool.post(post_url, data=data, headers=headers, cookies=cookies)
         
         if resp.status_code == 200:
             try:
@@ -251,13 +134,21 @@ def post_receipt(data, cookies):
         return False, {"error": str(e)}
 
 def fetch_receipt(data):
-    cookies = get_cookies_via_browser_fast()
-    
-    if not cookies:
-        cookies = get_cookies_via_browser()
-    
+    provider = cookie_provider()
+    cookies = provider.get()
+
     if not cookies:
         return False, {"error": "Failed to get cookies"}
-    
+
     success, details = post_receipt(data, cookies)
-    return success, details
\ No newline at end of file
+    if not success and _cookies_rejected(details):
+        # Cookie из кэша могли протухнуть раньше TTL - берём свежие и пробуем ещё раз
+        provider.invalidate(cookies)
+        cookies = provider.get()
+        if not cookies:
+            return False, {"error": "Failed to get cookies"}
+        success, details = post_receipt(data, cookies)
+    return success, details
+
+def _cookies_rejected(details):
+    return details.get("error") in ("HTTP 401", "HTTP 403", "Invalid JSON response")
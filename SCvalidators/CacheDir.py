@@ -0,0 +1,19 @@
+import os
+
+# ========================
+# Папка служебных кэшей
+# ========================
+#
+# Производные файлы - справочник MCC (.npz), индекс BM25, кэш чеков, кэш смет - лежат в одной папке,
+# отдельно от хранилища контрактов SmartContracts. Папка задаётся один раз переменной
+# SMARTGRANT_CACHE_DIR; по умолчанию - .cache в корне проекта, от текущей папки процесса она не зависит.
+# Переменные отдельных кэшей (MCC_REGISTRY, MCC_INDEX, RECEIPT_CACHE, SMETA_CACHE) по-прежнему
+# переопределяют свой файл.
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get("SMARTGRANT_CACHE_DIR", os.path.join(PROJECT_DIR, ".cache"))
+
+
+def cache_path(name):
+    """Путь к файлу или папке кэша name внутри CACHE_DIR"""
+    return os.path.join(CACHE_DIR, name)
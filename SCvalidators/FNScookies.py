@@ -0,0 +1,234 @@
+import os
+import time
+import atexit
+import threading
+from functools import lru_cache
+import requests
+from SCvalidators import HTTPpool
+
+# ========================
+# Cookie для проверки чеков ФНС
+# ========================
+#
+# Уровни: кэш в процессе (TTL, заранее обновляется в фоне) ->
+# простой HTTP-запрос к сайту -> долгоживущий headless Chrome, общий для всех запросов.
+# Адрес сайта можно подменить переменной FNS_BASE_URL (например, на локальную заглушку _bench_fns.py).
+
+BASE_URL = os.environ.get("FNS_BASE_URL", "https://kkt-online.nalog.ru")
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+COOKIE_TTL = 15 * 60        # сколько живут полученные cookie, сек
+REFRESH_AHEAD = 0.8         # после этой доли TTL обновляем в фоне, отдавая ещё действующие
+HTTP_TIMEOUT = 10
+BROWSER_WAIT = 5            # сколько ждать появления cookie на странице, сек
+BROWSER_MAX_USES = 200      # после стольких загрузок браузер перезапускается (утечки памяти Chrome)
+
+
+@lru_cache(maxsize=None)
+def chromedriver_path():
+    """Путь к chromedriver: webdriver_manager вызывается один раз на процесс"""
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+
+def get_cookies_via_http(base_url=BASE_URL, timeout=HTTP_TIMEOUT):
+    """Cookie обычным GET-запросом (без браузера); {} если сайт их не выдал"""
+    try:
+        resp = HTTPpool.get(base_url, headers={"user-agent": USER_AGENT}, timeout=timeout)
+    except requests.RequestException:
+        return {}
+    cookies = {}
+    for r in resp.history + [resp]:   # cookie могли выставить и на редиректах
+        cookies.update(r.cookies.get_dict())
+    return cookies
+
+
+def _chrome_options():
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    for arg in ("--headless=new", "--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu",
+                "--disable-images", "--disable-plugins", "--disable-extensions",
+                "--disable-background-networking", "--safebrowsing-disable-auto-update",
+                "--disable-client-side-phishing-detection", "--dns-prefetch-disable",
+                "--no-proxy-server", "--memory-efficient-offscreen", "--disable-application-cache",
+                f"--user-agent={USER_AGENT}"):
+        chrome_options.add_argument(arg)
+    chrome_options.set_capability("pageLoadStrategy", "eager")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.default_content_setting_values": {"images": 2, "plugins": 2, "popups": 2, "notifications": 2},
+    })
+    return chrome_options
+
+
+class BrowserPool:
+    """
+    Один headless Chrome на процесс, переиспользуемый между запросами.
+    Запускается при первом обращении, перезапускается после ошибки или BROWSER_MAX_USES загрузок.
+    """
+
+    def __init__(self, base_url=BASE_URL):
+        self.base_url = base_url
+        self._driver = None
+        self._uses = 0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        driver = webdriver.Chrome(service=Service(chromedriver_path()), options=_chrome_options())
+        driver.set_page_load_timeout(10)
+        driver.set_script_timeout(5)
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": [
+            "*.gif", "*.jpg", "*.jpeg", "*.png", "*.webp", "*.css", "*.woff", "*.woff2", "*.ttf",
+            "*.mp4", "*.avi", "*.mov", "*.mp3", "*.wav",
+        ]})
+        self._driver = driver
+        self._uses = 0
+
+    def _load_cookies(self):
+        driver = self._driver
+        driver.delete_all_cookies()
+        try:
+            driver.get(self.base_url)
+        except Exception:
+            pass  # eager-загрузка могла не успеть, cookie обычно уже выставлены
+        # Вместо фиксированной паузы - опрос, пока сайт не выставит cookie
+        deadline = time.monotonic() + BROWSER_WAIT
+        cookies = {}
+        while True:
+            cookies = {cookie['name']: cookie['value'] for cookie in driver.get_cookies()}
+            if cookies or time.monotonic() > deadline:
+                return cookies
+            time.sleep(0.1)
+
+    def get_cookies(self):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._driver is None or self._uses >= BROWSER_MAX_USES:
+                        self._close()
+                        self._start()
+                    self._uses += 1
+                    cookies = self._load_cookies()
+                    if cookies:
+                        return cookies
+                except Exception:
+                    self._close()
+            return {}
+
+    def _close(self):
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+            self._driver = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+class CookieProvider:
+    """
+    Cookie сайта ФНС с кэшем.
+    get() отдаёт кэш, пока он свежий; ближе к концу TTL обновляет его в фоне,
+    после TTL - обновляет синхронно (одновременные вызовы ждут одного обновления).
+    """
+
+    def __init__(self, base_url=BASE_URL, ttl=COOKIE_TTL, refresh_ahead=REFRESH_AHEAD, use_browser=True):
+        self.base_url = base_url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.browser = BrowserPool(base_url) if use_browser else None
+        self.stats = {"hits": 0, "http": 0, "browser": 0, "failures": 0, "background": 0}
+        self._cookies = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()   # одно синхронное обновление за раз
+        self._refreshing = False
+
+    def _count(self, name):
+        # счётчики меняют и потоки запросов, и фоновое обновление
+        with self._lock:
+            self.stats[name] += 1
+
+    def _fetch(self):
+        cookies = get_cookies_via_http(self.base_url)
+        if cookies:
+            self._count("http")
+            return cookies
+        if self.browser is not None:
+            cookies = self.browser.get_cookies()
+            if cookies:
+                self._count("browser")
+                return cookies
+        self._count("failures")
+        return {}
+
+    def refresh(self):
+        """Получает cookie заново (HTTP, затем браузер) и кладёт в кэш"""
+        cookies = self._fetch()
+        if cookies:
+            with self._lock:
+                self._cookies = cookies
+                self._fetched_at = time.monotonic()
+        return dict(cookies)
+
+    def _refresh_background(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self):
+        """Действующие cookie; {} если получить их не удалось"""
+        with self._lock:
+            age = time.monotonic() - self._fetched_at
+            if self._cookies and age < self.ttl:
+                self.stats["hits"] += 1
+                if age > self.ttl * self.refresh_ahead and not self._refreshing:
+                    self._refreshing = True
+                    self.stats["background"] += 1
+                    threading.Thread(target=self._refresh_background, daemon=True).start()
+                return dict(self._cookies)
+
+        with self._refresh_lock:
+            # Пока ждали, cookie мог обновить другой поток
+            with self._lock:
+                if self._cookies and time.monotonic() - self._fetched_at < self.ttl:
+                    self.stats["hits"] += 1
+                    return dict(self._cookies)
+            return self.refresh()
+
+    def invalidate(self, rejected=None):
+        """
+        Сбрасывает кэш (например, когда сайт отверг cookie).
+        С rejected сбрасывает, только если в кэше всё ещё именно они, а не уже обновлённые другим потоком.
+        """
+        with self._lock:
+            if rejected is not None and rejected != self._cookies:
+                return
+            self._cookies = {}
+            self._fetched_at = 0.0
+
+    def close(self):
+        if self.browser is not None:
+            self.browser.close()
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def cookie_provider():
+    """Общий на процесс CookieProvider"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = CookieProvider()
+            atexit.register(_provider.close)
+        return _provider
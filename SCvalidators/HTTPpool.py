@@ -0,0 +1,148 @@
+import os
+import time
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.cookies import RequestsCookieJar
+from urllib3.util.retry import Retry
+
+# ========================
+# Общий HTTP-клиент (LLM и ФНС)
+# ========================
+#
+# Одна сессия requests и по одному клиенту OpenAI на (адрес, ключ) на процесс:
+# соединения держатся открытыми (keep-alive), TLS и DNS не повторяются на каждый запрос.
+# Параметры берутся из переменных окружения.
+
+CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 30))
+POOL_HOSTS = int(os.environ.get("HTTP_POOL_HOSTS", 10))         # сколько хостов держат свой пул
+POOL_PER_HOST = int(os.environ.get("HTTP_POOL_PER_HOST", 8))    # соединений (и одновременных запросов) на хост
+RETRIES = int(os.environ.get("HTTP_RETRIES", 3))
+BACKOFF = float(os.environ.get("HTTP_BACKOFF", 0.5))            # пауза 0.5, 1, 2 ... сек
+BACKOFF_JITTER = float(os.environ.get("HTTP_BACKOFF_JITTER", 0.5))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+POST_RETRY_STATUSES = (429, 503)      # сервер отказал до выполнения - повторить POST безопасно
+
+
+class _NoCookies(RequestsCookieJar):
+    """
+    Хранилище cookie, которое ничего не запоминает: общая сессия не должна
+    переносить cookie одного запроса (например, сессию ФНС) в другие.
+    Cookie запроса передаются явно через cookies=, cookie ответа - в response.cookies.
+    """
+
+    def set_cookie(self, cookie, *args, **kwargs):
+        pass
+
+    def extract_cookies(self, response, request):
+        pass
+
+
+class _Retry(Retry):
+    """
+    Повторы с учётом метода. Идемпотентные запросы повторяются при ошибке подключения,
+    обрыве чтения и 429/5xx. POST (чек в ФНС) - только при ошибке подключения и 429/503:
+    после обрыва чтения или 500 запрос мог уже выполниться, и повтор его задвоит.
+    """
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if not self._is_method_retryable(method):
+            return status_code in POST_RETRY_STATUSES
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def _make_retry():
+    return _Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,                       # только для идемпотентных методов (allowed_methods)
+        status=RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=BACKOFF,
+        backoff_jitter=BACKOFF_JITTER,
+        respect_retry_after_header=True,
+        raise_on_status=False,              # после последней попытки отдаём сам ответ с ошибкой
+    )
+
+
+_session = None
+_session_lock = threading.Lock()
+
+def session():
+    """Общая на процесс сессия requests с пулом соединений и повторами"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            s.cookies = _NoCookies()
+            # pool_block: сверх POOL_PER_HOST запросы к хосту ждут свободное соединение
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_PER_HOST,
+                                  pool_block=True, max_retries=_make_retry())
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+
+def request(method, url, timeout=None, **kwargs):
+    """requests.request через общую сессию; timeout по умолчанию (подключение, чтение)"""
+    return session().request(method, url, timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT), **kwargs)
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+_openai_clients = {}
+
+def openai_client(base_url, api_key, timeout=300.0):
+    """
+    Общий клиент OpenAI для (base_url, api_key, timeout).
+    Внутри - один httpx.Client с пулом keep-alive соединений; 429/5xx повторяет сам SDK
+    (экспоненциальная пауза со случайной добавкой).
+    """
+    key = (base_url, api_key, timeout)
+    with _session_lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            import httpx
+            from openai import OpenAI
+
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=POOL_HOSTS * POOL_PER_HOST,
+                                    max_keepalive_connections=POOL_PER_HOST),
+                timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+            )
+            client = _openai_clients[key] = OpenAI(base_url=base_url, api_key=api_key, timeout=timeout,
+                                                   max_retries=RETRIES, http_client=http_client)
+        return client
+
+
+class RateLimiter:
+    """
+    RPM-limiter для asyncio: запросы идут не чаще max_rpm в минуту.
+    Слоты раздаются под обычной блокировкой, поэтому один лимитер можно делить
+    между потоками и циклами событий (каждый запуск Streamlit - свой asyncio.run).
+    """
+
+    def __init__(self, max_rpm: int):
+        self.interval = 60.0 / max_rpm
+        self._lock = threading.Lock()
+        self._last = 0.0
+
+    def reserve(self):
+        """Занимает ближайший слот и возвращает, сколько до него ждать"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._last + self.interval)
+            self._last = slot
+        return slot - now
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,191 @@
+import re
+import json
+
+# ========================
+# Инкрементальный разбор JSON из потока модели
+# ========================
+#
+# Ответ модели приходит кусками. Автомат проверяет синтаксис JSON по мере поступления символов
+# (стек объектов/массивов, строки с escape-последовательностями, числа и литералы) и сразу
+# сообщает, когда закрылся объект по отслеживаемому пути, например ("stages", "*") - очередной этап.
+# Как только ответ перестаёт быть JSON, бросается JSONStreamError - дальше ждать ответ нет смысла.
+# Текст до первой "{" (```json и т.п.) пропускается, после закрытия корневого объекта - игнорируется.
+
+WHITESPACE = " \t\n\r"
+ESCAPES = '"\\/bfnrt'
+HEX = set("0123456789abcdefABCDEF")
+TOKEN_CHARS = set("0123456789+-.eE") | set("truefalsn")
+LITERALS = ("true", "false", "null")
+NUMBER = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+
+
+class JSONStreamError(ValueError):
+    """Поток перестал быть корректным JSON"""
+
+
+class IncrementalJSON:
+    def __init__(self, watch=()):
+        """watch - пути вида ("stages", "*"); "*" совпадает с любым ключом или индексом"""
+        self.watch = [tuple(path) for path in watch]
+        self._parts = []
+        self._length = 0
+        self._stack = []          # кадры: {"type", "state", "path", "start", "key", "index"}
+        self._started = False
+        self.done = False
+        self.root_start = None
+        self.root_end = None
+        # строка/число в процессе чтения
+        self._in_string = False
+        self._string_is_key = False
+        self._key_chars = []
+        self._escape = False
+        self._unicode = 0
+        self._token = None
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    def result(self):
+        """Корневой объект целиком (только после done)"""
+        if not self.done:
+            raise JSONStreamError("JSON ещё не закончился")
+        return json.loads(self.text[self.root_start:self.root_end + 1])
+
+    def feed(self, chunk):
+        """Добавляет кусок ответа; возвращает [(путь, значение)] закрывшихся отслеживаемых объектов"""
+        base = self._length
+        self._parts.append(chunk)
+        self._length += len(chunk)
+        events = []
+        for i, ch in enumerate(chunk):
+            if self.done:
+                break
+            self._step(ch, base + i, events)
+        return events
+
+    # --- автомат ---
+
+    def _fail(self, pos, ch, expected):
+        raise JSONStreamError(f"Ответ перестал быть JSON на символе {pos} ({ch!r}): ожидалось {expected}")
+
+    def _step(self, ch, pos, events):
+        if self._in_string:
+            self._string_char(ch, pos)
+            return
+        if self._token is not None:
+            if ch in TOKEN_CHARS:
+                self._token += ch
+                if self._token[0].isalpha() and not any(lit.startswith(self._token) for lit in LITERALS):
+                    self._fail(pos, ch, "true, false или null")
+                return
+            self._token_done(pos)
+        if not self._started:
+            if ch == "{":
+                self._started = True
+                self.root_start = pos
+                self._stack.append(self._frame("object", (), pos))
+            return
+        if ch in WHITESPACE:
+            return
+
+        frame = self._stack[-1]
+        state = frame["state"]
+        if state in ("key_or_end", "key"):
+            if ch == '"':
+                self._open_string(pos, is_key=True)
+            elif ch == "}" and state == "key_or_end":
+                self._close(pos, events)
+            else:
+                self._fail(pos, ch, "ключ объекта")
+        elif state == "colon":
+            if ch != ":":
+                self._fail(pos, ch, "':'")
+            frame["state"] = "value"
+        elif state in ("value", "value_or_end"):
+            if ch == "]" and state == "value_or_end":
+                self._close(pos, events)
+            else:
+                self._open_value(ch, pos)
+        elif state == "comma_or_end":
+            if ch == ",":
+                if frame["type"] == "object":
+                    frame["state"] = "key"
+                else:
+                    frame["state"] = "value"
+                    frame["index"] += 1
+            elif ch == ("}" if frame["type"] == "object" else "]"):
+                self._close(pos, events)
+            else:
+                self._fail(pos, ch, "',' или конец " + ("объекта" if frame["type"] == "object" else "массива"))
+
+    def _frame(self, kind, path, start):
+        return {"type": kind, "state": "key_or_end" if kind == "object" else "value_or_end",
+                "path": path, "start": start, "key": None, "index": 0}
+
+    def _child_path(self):
+        frame = self._stack[-1]
+        return frame["path"] + ((frame["key"],) if frame["type"] == "object" else (frame["index"],))
+
+    def _open_value(self, ch, pos):
+        if ch == "{":
+            self._stack.append(self._frame("object", self._child_path(), pos))
+        elif ch == "[":
+            self._stack.append(self._frame("array", self._child_path(), pos))
+        elif ch == '"':
+            self._open_string(pos, is_key=False)
+        elif ch == "-" or ch.isdigit() or ch in "tfn":
+            self._token = ch
+        else:
+            self._fail(pos, ch, "значение")
+
+    def _open_string(self, pos, is_key):
+        self._in_string = True
+        self._string_is_key = is_key
+        self._key_chars = []
+
+    def _string_char(self, ch, pos):
+        if self._string_is_key and not (ch == '"' and not self._escape and not self._unicode):
+            self._key_chars.append(ch)
+        if self._unicode:
+            if ch not in HEX:
+                self._fail(pos, ch, "шестнадцатеричная цифра \\u")
+            self._unicode -= 1
+        elif self._escape:
+            if ch == "u":
+                self._unicode = 4
+            elif ch not in ESCAPES:
+                self._fail(pos, ch, "escape-последовательность")
+            self._escape = False
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            frame = self._stack[-1]
+            if self._string_is_key:
+                frame["key"] = json.loads('"' + "".join(self._key_chars) + '"')
+                frame["state"] = "colon"
+            else:
+                frame["state"] = "comma_or_end"
+        elif ch < " ":
+            self._fail(pos, ch, "символ строки (управляющие символы должны быть экранированы)")
+
+    def _token_done(self, pos):
+        token, self._token = self._token, None
+        if token not in LITERALS and not NUMBER.fullmatch(token):
+            self._fail(pos, token, "число или литерал")
+        self._stack[-1]["state"] = "comma_or_end"
+
+    def _watched(self, path):
+        return any(len(pattern) == len(path) and all(p == "*" or p == part for p, part in zip(pattern, path))
+                   for pattern in self.watch)
+
+    def _close(self, pos, events):
+        frame = self._stack.pop()
+        if self._watched(frame["path"]):
+            events.append((frame["path"], json.loads(self.text[frame["start"]:pos + 1])))
+        if self._stack:
+            self._stack[-1]["state"] = "comma_or_end"
+        else:
+            self.done = True
+            self.root_end = pos
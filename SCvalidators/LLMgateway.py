@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from SCvalidators.HTTPpool import POOL_HOSTS, POOL_PER_HOST, CONNECT_TIMEOUT, READ_TIMEOUT
+
+# ========================
+# Шлюз к моделям: выбор по задержке, запасная модель, хеджирование
+# ========================
+#
+# Раньше модель была зашита в каждый вызов: если её эндпоинт тормозит или упирается в лимит,
+# пользователь ждёт до таймаута. Шлюз держит по каждой модели скользящее окно последних запросов
+# (p50/p95 задержки, доля ошибок) и отправляет запрос самой быстрой здоровой модели из списка задачи;
+# ещё не спрошенная модель один раз получает запрос первой, чтобы у неё появился замер.
+# Ошибка, 429 или ответ без JSON - сразу следующая модель; модель с ошибками уходит на паузу.
+# С hedge_after через заданное время (или p95 первой модели) без ответа параллельно уходит
+# дубль второй модели: побеждает первый корректный JSON, проигравший запрос отменяется
+# (соединение закрывается, эндпоинт перестаёт генерировать).
+# Запросы идут из своего потока с циклом событий и одним httpx.AsyncClient на шлюз:
+# синхронный complete() можно звать из любого потока, await acomplete() - из любого цикла.
+
+WINDOW = int(os.environ.get("LLM_STATS_WINDOW", 50))          # запросов в скользящем окне модели
+MIN_SAMPLES = 5              # раньше p95 модели не считается надёжным и не задаёт порог хеджирования
+MAX_ERROR_RATE = 0.5         # при большей доле ошибок в окне модель уходит на паузу
+COOLDOWN = float(os.environ.get("LLM_COOLDOWN", 30))          # пауза модели после ошибок/429, сек
+HEDGE_AFTER = os.environ.get("LLM_HEDGE_AFTER", "p95")        # "p95", число секунд или "" - без дублей
+MAX_PARALLEL = 2             # основной запрос и один дубль
+
+
+class GatewayError(RuntimeError):
+    """Ни одна модель не вернула корректный ответ"""
+
+    def __init__(self, errors):
+        self.errors = errors   # {модель: причина}
+        super().__init__("Модели не ответили: " + "; ".join(f"{model}: {error}" for model, error in errors.items()))
+
+
+def extract_json(text):
+    """JSON-объект из ответа модели (от первой "{" до последней "}") или None"""
+    start, end = text.find("{"), text.rfind("}") + 1
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(text[start:end])
+    except ValueError:
+        return None
+
+
+class ModelStats:
+    """Скользящее окно последних запросов к модели: (мс, успешно)"""
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.cooldown_until = 0.0
+
+    def add(self, ms, ok):
+        self.samples.append((ms, ok))
+
+    def percentile(self, q):
+        latencies = sorted(ms for ms, ok in self.samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    @property
+    def error_rate(self):
+        return sum(not ok for _, ok in self.samples) / len(self.samples) if self.samples else 0.0
+
+    def healthy(self, now=None):
+        return (now or time.monotonic()) >= self.cooldown_until
+
+
+class LLMGateway:
+    def __init__(self, url, api_key, models, timeout=READ_TIMEOUT, hedge_after=HEDGE_AFTER, window=WINDOW):
+        """
+        url - адрес chat/completions, models - модели задачи в порядке предпочтения
+        (пока задержки не измерены, запрос идёт первой), timeout - на один запрос, сек.
+        hedge_after - когда слать дубль второй модели: "p95", секунды или None/"" - никогда.
+        """
+        self.url = url
+        self.headers = {"Authorization": f"Bearer {api_key}", "Accept": "application/json"}
+        self.models = list(models)
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.window = window
+        self.stats = {}
+        self.counters = {"requests": 0, "calls": 0, "fallbacks": 0, "hedges": 0, "hedge_wins": 0, "cancelled": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+
+    # --- статистика и выбор модели ---
+
+    def _stats(self, model):
+        stats = self.stats.get(model)
+        if stats is None:
+            stats = self.stats[model] = ModelStats(self.window)
+        return stats
+
+    def record(self, model, ms, ok, retry_after=None):
+        """Замер запроса к модели; запросы мимо шлюза (потоковые) тоже сообщают сюда, чтобы выбор их учитывал"""
+        with self._lock:
+            stats = self._stats(model)
+            stats.add(ms, ok)
+            if not ok and (retry_after is not None or stats.error_rate > MAX_ERROR_RATE):
+                stats.cooldown_until = time.monotonic() + (retry_after if retry_after is not None else COOLDOWN)
+
+    def _record_censored(self, model, ms):
+        """Отменённый запрос шёл не меньше ms: в окно, только если это больше текущего p50 модели"""
+        with self._lock:
+            stats = self._stats(model)
+            p50 = stats.percentile(0.5)
+            if p50 is not None and ms > p50:
+                stats.add(ms, True)
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def route(self, models=None):
+        """
+        Порядок моделей для запроса: сначала ещё не спрошенные (в порядке списка) - каждая один раз
+        получает основной запрос и настоящий замер, иначе более быстрая модель из конца списка
+        так и не была бы найдена; затем здоровые по возрастанию p50, за ними здоровые без
+        единого успешного ответа в окне, последними - модели на паузе, как последний шанс.
+        """
+        models = list(models or self.models)
+        now = time.monotonic()
+        with self._lock:
+            def key(item):
+                index, model = item
+                stats = self._stats(model)
+                p50 = stats.percentile(0.5)
+                return (not stats.healthy(now), bool(stats.samples), p50 is None, p50 or 0, index)
+            return [model for _, model in sorted(enumerate(models), key=key)]
+
+    def _hedge_delay(self, model, hedge_after):
+        """Через сколько секунд слать дубль или None"""
+        if not hedge_after:
+            return None
+        if hedge_after == "p95":
+            with self._lock:
+                stats = self._stats(model)
+                if sum(ok for _, ok in stats.samples) < MIN_SAMPLES:
+                    return None
+                return stats.percentile(0.95) / 1000
+        return float(hedge_after)
+
+    def report(self):
+        """[{model, p50_ms, p95_ms, error_rate, samples, healthy}] по моделям шлюза"""
+        now = time.monotonic()
+        with self._lock:
+            return [{"model": model, "p50_ms": stats.percentile(0.5), "p95_ms": stats.percentile(0.95),
+                     "error_rate": stats.error_rate, "samples": len(stats.samples), "healthy": stats.healthy(now)}
+                    for model, stats in ((model, self._stats(model)) for model in dict.fromkeys(self.models + list(self.stats)))]
+
+    # --- запросы ---
+
+    def complete(self, messages, models=None, validate=extract_json, hedge_after=..., timeout=None, **params):
+        """
+        Синхронный запрос через шлюз. params - поля запроса (temperature, max_tokens, ...).
+        Возвращает {"model", "content", "result", "ms", "hedged"}: result - validate(content),
+        ответ без него (None) считается ошибкой модели. Все модели не ответили - GatewayError.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._race(messages, models, validate, hedge_after, timeout, params), self._ensure_loop()).result()
+
+    async def acomplete(self, messages, models=None, validate=extract_json, hedge_after=..., timeout=None, **params):
+        """То же для asyncio: запрос выполняется в цикле шлюза, текущий цикл только ждёт"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+            self._race(messages, models, validate, hedge_after, timeout, params), self._ensure_loop()))
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def _call(self, model, messages, timeout, params):
+        """(мс, текст ответа или None, ошибка или None, пауза из Retry-After или None)"""
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=POOL_HOSTS * POOL_PER_HOST, max_keepalive_connections=POOL_PER_HOST),
+                timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT))
+        begin = time.perf_counter()
+        retry_after = None
+        try:
+            response = await self._client.post(self.url, headers=self.headers, timeout=timeout,
+                                               json={"model": model, "messages": messages, **params})
+            if response.status_code == 429:
+                try:
+                    retry_after = float(response.headers.get("Retry-After", COOLDOWN))
+                except ValueError:
+                    retry_after = COOLDOWN
+            response.raise_for_status()
+            content = response.json()["choices"][0]["message"]["content"]
+            return (time.perf_counter() - begin) * 1000, content, None, None
+        except (httpx.HTTPError, KeyError, IndexError, TypeError, ValueError) as e:
+            return (time.perf_counter() - begin) * 1000, None, f"{type(e).__name__}: {e}", retry_after
+
+    async def _race(self, messages, models, validate, hedge_after, timeout, params):
+        candidates = self.route(models)
+        hedge_after = self.hedge_after if hedge_after is ... else hedge_after
+        timeout = timeout or self.timeout
+        self._count("requests")
+        started = time.perf_counter()
+        pending, errors = {}, {}
+        hedge_at = self._hedge_delay(candidates[0], hedge_after)
+        hedged = False
+        won = False
+
+        def launch(role):
+            model = candidates.pop(0)
+            pending[asyncio.ensure_future(self._call(model, messages, timeout, params))] = (model, role, time.perf_counter())
+            self._count("calls")
+
+        launch("primary")
+        try:
+            while pending:
+                wait = None
+                if not hedged and hedge_at is not None and candidates:
+                    wait = max(0.0, hedge_at - (time.perf_counter() - started))
+                done, _ = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self._count("hedges")
+                    launch("hedge")
+                    continue
+                for task in done:
+                    model, role, _ = pending.pop(task)
+                    ms, content, error, retry_after = task.result()
+                    result = validate(content) if content is not None else None
+                    if result is None:
+                        errors[model] = error or "ответ без корректного JSON"
+                        self.record(model, ms, False, retry_after)
+                        continue
+                    self.record(model, ms, True)
+                    if role == "hedge":
+                        self._count("hedge_wins")
+                    won = True
+                    return {"model": model, "content": content, "result": result,
+                            "ms": (time.perf_counter() - started) * 1000, "hedged": hedged}
+                if candidates and len(pending) < (MAX_PARALLEL if hedged else 1):
+                    self._count("fallbacks")
+                    launch("fallback")
+            self._count("failed")
+            raise GatewayError(errors)
+        finally:
+            # Проигравшие запросы отменяются. Их задержка цензурирована: известно только, что она
+            # больше времени от запуска этого запроса до отмены. Такая нижняя граница пишется в окно,
+            # лишь когда она выше текущего p50 модели: тогда она сообщает, что модель замедлилась.
+            # Граница ниже p50 (дубль, отменённый через миг после запуска) ничего не говорит
+            # и не должна делать модель быстрее, чем она есть. Без победителя замер не пишется.
+            for task, (model, _, begin) in pending.items():
+                if task.done():
+                    ms, content, error, retry_after = task.result()
+                    self.record(model, ms, error is None, retry_after)
+                    continue
+                task.cancel()
+                self._count("cancelled")
+                if won:
+                    self._record_censored(model, (time.perf_counter() - begin) * 1000)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+def llm_gateway(task, url, api_key, models, **kwargs):
+    """Общий на процесс шлюз задачи task ("smeta", "receipt", ...): у каждой задачи своя статистика задержек"""
+    key = (task, url, api_key, tuple(models))
+    with _gateways_lock:
+        gateway = _gateways.get(key)
+        if gateway is None:
+            gateway = _gateways[key] = LLMGateway(url, api_key, models, **kwargs)
+        return gateway
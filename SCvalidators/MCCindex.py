@@ -0,0 +1,180 @@
+import os
+import re
+import sys
+import json
+import math
+from collections import Counter
+from SCvalidators.CacheDir import cache_path
+from SCvalidators.MCCregistry import mcc_registry, build_registry, MCC_CSV, REGISTRY_PATH
+
+# ========================
+# Поиск MCC по тексту категорий (BM25)
+# ========================
+#
+# Справочник MCC - около 1100 кодов с длинными описаниями; целиком в промпт он занимает
+# большую часть токенов запроса. Индекс BM25 по названиям и описаниям строится один раз на процесс;
+# сохранённый на диск (build_mcc_index) он подхватывается, пока справочник не изменился. По категориям
+# сметы выбираются несколько самых близких кодов - в промпт идёт только этот короткий список.
+#
+# Сборка кэшей справочника и индекса (после обновления mcc_codes.csv):
+#   python -m SCvalidators.MCCindex
+
+INDEX_PATH = os.environ.get("MCC_INDEX", cache_path("mcc_index.json"))
+INDEX_VERSION = 2
+
+K1 = 1.5
+B = 0.75
+NAME_WEIGHT = 3           # слова названия весят как несколько повторов в описании
+STEM = 6                  # грубый стемминг: первые символы слова ("оборудование" -> "оборуд")
+
+STOP_WORDS = {
+    "и", "в", "во", "на", "по", "для", "с", "со", "из", "или", "а", "к", "от", "до", "за", "о", "об",
+    "не", "как", "так", "что", "это", "при", "под", "над", "также", "такие", "таких", "который",
+    "которые", "которых", "других", "другие", "другое", "прочие", "прочих", "том", "числе",
+    "например", "используется", "точки", "точек", "mcc",
+}
+
+_WORD = re.compile(r"[0-9a-zа-яё]+")
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре без стоп-слов, обрезанные до основы"""
+    tokens = []
+    for word in _WORD.findall(text.lower().replace("ё", "е")):
+        if len(word) < 3 or word in STOP_WORDS:
+            continue
+        tokens.append(word[:STEM])
+    return tokens
+
+
+class MCCIndex:
+    """BM25 по названиям и описаниям справочника MCC"""
+
+    def __init__(self, registry, lengths, postings):
+        self.registry = registry
+        self.codes = [registry.code(pos) for pos in range(len(registry))]   # позиция -> код
+        self.lengths = lengths              # позиция -> длина документа в токенах
+        self.postings = postings            # токен -> [[позиция, частота], ...]
+        self.source = registry.source
+        self.avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    @classmethod
+    def from_registry(cls, registry):
+        lengths, postings = [], {}
+        for pos, (_, name, description) in enumerate(registry.rows()):
+            terms = Counter(tokenize(name) * NAME_WEIGHT + tokenize(description))
+            lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append([pos, tf])
+        return cls(registry, lengths, postings)
+
+    def save(self, path=INDEX_PATH):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "source": self.source,
+                       "lengths": self.lengths, "postings": self.postings}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, registry, path=INDEX_PATH):
+        """Индекс с диска; ValueError, если он собран по другой версии справочника"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION or data.get("source") != registry.source:
+            raise ValueError(f"Индекс MCC {path} собран по другому справочнику")
+        return cls(registry, data["lengths"], data["postings"])
+
+    def line(self, code, max_chars=None):
+        """Строка справочника для кода; длинное описание обрезается по границе слова"""
+        line = self.registry.line(code)
+        if line and max_chars and len(line) > max_chars:
+            line = line[:max_chars].rsplit(" ", 1)[0].rstrip(",;:") + "…"
+        return line
+
+    def search(self, query, k=8):
+        """[(код, оценка)] - k самых релевантных запросу кодов"""
+        n = len(self.codes)
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for pos, tf in postings:
+                norm = K1 * (1 - B + B * self.lengths[pos] / self.avg_length)
+                scores[pos] = scores.get(pos, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(self.codes[pos], score) for pos, score in best]
+
+    def shortlist(self, queries, k=8, hinted=()):
+        """
+        Коды для промпта: подсказанные (всегда, в заданном порядке) плюс по k лучших на каждый запрос.
+        Порядок стабильный, без повторов.
+        """
+        codes = [str(code) for code in hinted if str(code) in self.registry]
+        for query in queries:
+            for code, _ in self.search(query, k):
+                if code not in codes:
+                    codes.append(code)
+        return codes
+
+
+_indexes = {}
+
+def load_mcc_index(csv_path=MCC_CSV, index_path=INDEX_PATH):
+    """
+    Индекс по справочнику MCC (один на процесс): с диска, если он построен по этому же
+    справочнику, иначе строится в памяти (на диск не пишется). Пустой справочник (нет CSV) - None.
+    """
+    registry = mcc_registry(csv_path)
+    if not len(registry):
+        return None
+    index = _indexes.get(registry.source)
+    if index is not None:
+        return index
+    try:
+        index = MCCIndex.load(registry, index_path)
+    except (OSError, ValueError, KeyError):
+        index = MCCIndex.from_registry(registry)
+    _indexes[registry.source] = index
+    return index
+
+
+def build_mcc_index(csv_path=MCC_CSV, registry_path=REGISTRY_PATH, index_path=INDEX_PATH):
+    """Собирает на диске кэши справочника (.npz) и индекса BM25; возвращает индекс"""
+    index = MCCIndex.from_registry(build_registry(csv_path, registry_path))
+    index.save(index_path)
+    return index
+
+
+_CATEGORIES_HEADER = re.compile(r"разрешенн\w* категори", re.IGNORECASE)
+_SECTION = re.compile(r"^\s*\d+(\.\d+)*[.\s]")
+
+
+def smeta_categories(smeta_text):
+    """
+    Строки категорий расходов из текста сметы: всё после "Разрешенные категории:"
+    до следующего нумерованного раздела. Если таких блоков нет - непустые строки текста.
+    """
+    categories, inside = [], False
+    for line in smeta_text.splitlines():
+        line = line.strip()
+        if _CATEGORIES_HEADER.search(line):
+            inside = True
+            tail = line.split(":", 1)[1].strip() if ":" in line else ""
+            categories += [part.strip() for part in tail.split(",") if part.strip()]
+            continue
+        if inside and (not line or _SECTION.match(line)):
+            inside = False
+        if inside:
+            categories.append(line.lstrip("-•* "))
+    return categories or [line.strip() for line in smeta_text.splitlines() if line.strip()]
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else MCC_CSV
+    index = build_mcc_index(csv_path)
+    print(f"Справочник MCC: {len(index.registry)} кодов -> {REGISTRY_PATH}, индекс -> {INDEX_PATH}")
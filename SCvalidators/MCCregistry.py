@@ -0,0 +1,205 @@
+import os
+import csv
+import hashlib
+import threading
+import numpy as np
+from SCvalidators.CacheDir import cache_path
+
+# ========================
+# Справочник MCC, общий на процесс
+# ========================
+#
+# CSV читается один раз за процесс, а с собранным бинарным кэшем .npz - не читается вовсе.
+# Кэш собирается только явно (build_registry, python -m SCvalidators.MCCindex): загрузка
+# справочника, в том числе при проверке переводов, файлов не пишет.
+# Хранение компактное: коды - массив int16, названия и описания - один UTF-8 буфер со смещениями,
+# поиск по коду - прямая адресация в таблице на 10000 ячеек, по названию - словарь.
+# Справочником пользуются SmetaParser (строки для промпта) и проверка переводов (неизвестные MCC).
+
+MCC_CSV = os.environ.get("MCC_CSV", os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples", "mcc_codes.csv"))
+REGISTRY_PATH = os.environ.get("MCC_REGISTRY", cache_path("mcc_registry.npz"))
+REGISTRY_VERSION = 1
+CODE_SPACE = 10000        # MCC - четыре цифры
+
+
+def _fingerprint(path):
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def parse_code(code):
+    """MCC как число 0..9999 или None, если это не MCC"""
+    text = str(code).strip()
+    if not text.isdigit() or len(text) > 4:
+        return None
+    return int(text)
+
+
+def _norm_name(name):
+    return " ".join(name.lower().replace("ё", "е").split())
+
+
+class MCCRegistry:
+    def __init__(self, codes, names, descriptions, source=None):
+        """
+        codes - int16 в порядке CSV; names/descriptions - (буфер UTF-8, смещения int32 длиной n+1)
+        """
+        self.codes = codes
+        self.source = source
+        self._names, self._name_offsets = names
+        self._descriptions, self._description_offsets = descriptions
+        self._slot = np.full(CODE_SPACE, -1, dtype=np.int16)
+        self._slot[codes] = np.arange(len(codes), dtype=np.int16)
+        self._by_name = None
+
+    @classmethod
+    def from_csv(cls, path):
+        codes, names, descriptions = [], [], []
+        with open(path, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                code = parse_code(row["MCC"])
+                if code is None:
+                    continue
+                codes.append(code)
+                names.append(row["Название"])
+                descriptions.append(row["Описание"])
+        return cls(np.array(codes, dtype=np.int16), _pack(names), _pack(descriptions), source=_fingerprint(path))
+
+    def save(self, path=REGISTRY_PATH):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, version=REGISTRY_VERSION, source=self.source or "", codes=self.codes,
+                 names=self._names, name_offsets=self._name_offsets,
+                 descriptions=self._descriptions, description_offsets=self._description_offsets)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=REGISTRY_PATH):
+        with np.load(path) as data:
+            if int(data["version"]) != REGISTRY_VERSION:
+                raise ValueError(f"Кэш справочника MCC {path} устаревшей версии")
+            return cls(data["codes"], (data["names"], data["name_offsets"]),
+                       (data["descriptions"], data["description_offsets"]), source=str(data["source"]))
+
+    # --- поиск ---
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _position(self, code):
+        value = parse_code(code)
+        return int(self._slot[value]) if value is not None else -1
+
+    def __contains__(self, code):
+        return self._position(code) >= 0
+
+    def code(self, pos):
+        return f"{int(self.codes[pos]):04d}"
+
+    def name(self, code):
+        pos = self._position(code)
+        return _unpack(self._names, self._name_offsets, pos) if pos >= 0 else None
+
+    def description(self, code):
+        pos = self._position(code)
+        return _unpack(self._descriptions, self._description_offsets, pos) if pos >= 0 else None
+
+    def line(self, code):
+        """Строка для промпта: "код: название - описание" """
+        pos = self._position(code)
+        if pos < 0:
+            return None
+        return (f"{self.code(pos)}: {_unpack(self._names, self._name_offsets, pos)} - "
+                f"{_unpack(self._descriptions, self._description_offsets, pos)}")
+
+    def lines(self):
+        return [self.line(self.code(pos)) for pos in range(len(self))]
+
+    def rows(self):
+        """(код, название, описание) в порядке справочника"""
+        for pos in range(len(self)):
+            yield (self.code(pos), _unpack(self._names, self._name_offsets, pos),
+                   _unpack(self._descriptions, self._description_offsets, pos))
+
+    def by_name(self, name):
+        """Коды категории по её названию из справочника (например, все "Авиалинии, авиакомпании")"""
+        if self._by_name is None:
+            by_name = {}
+            for pos in range(len(self)):
+                by_name.setdefault(_norm_name(_unpack(self._names, self._name_offsets, pos)), []).append(self.code(pos))
+            self._by_name = by_name
+        return list(self._by_name.get(_norm_name(name), []))
+
+    def unknown(self, codes):
+        """Коды из codes, которых нет в справочнике (без повторов, в исходном порядке)"""
+        if not len(self):
+            return []  # справочник не загружен - проверять не по чему
+        seen, result = set(), []
+        for code in codes:
+            text = str(code)
+            if text not in seen and text not in self:
+                result.append(text)
+            seen.add(text)
+        return result
+
+
+def _pack(texts):
+    blobs = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(blob) for blob in blobs])
+    return np.frombuffer(b"".join(blobs), dtype=np.uint8), offsets
+
+
+def _unpack(buffer, offsets, pos):
+    return buffer[offsets[pos]:offsets[pos + 1]].tobytes().decode("utf-8")
+
+
+def load_registry(csv_path=MCC_CSV, registry_path=REGISTRY_PATH):
+    """
+    Справочник из бинарного кэша, если он собран по этому же CSV, иначе из CSV.
+    Кэш здесь не пишется (см. build_registry). Нет CSV - пустой справочник.
+    """
+    if not os.path.exists(csv_path):
+        print(f"Внимание: файл {csv_path} не найден")
+        return MCCRegistry(np.zeros(0, dtype=np.int16), _pack([]), _pack([]))
+    source = _fingerprint(csv_path)
+    try:
+        registry = MCCRegistry.load(registry_path)
+        if registry.source == source:
+            return registry
+    except (OSError, ValueError, KeyError):
+        pass
+    return MCCRegistry.from_csv(csv_path)
+
+
+def build_registry(csv_path=MCC_CSV, registry_path=REGISTRY_PATH):
+    """Собирает бинарный кэш справочника из CSV и возвращает справочник"""
+    registry = MCCRegistry.from_csv(csv_path)
+    registry.save(registry_path)
+    return registry
+
+
+def contract_codes(json_project):
+    """MCC из категорий правил юрлиц контракта (в порядке появления, с повторами)"""
+    for stage in json_project.get("stages", []):
+        for rule in stage.get("spending_rules", []):
+            if rule.get("rule_type") != "legal_entities":
+                continue
+            for cat in rule.get("allowed_categories", []):
+                if isinstance(cat, dict):
+                    yield from (str(code) for code in cat.get("mcc_codes", []))
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+def mcc_registry(csv_path=MCC_CSV):
+    """Общий на процесс справочник MCC (загружается при первом обращении)"""
+    key = os.path.abspath(csv_path)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = load_registry(csv_path)
+        return registry
@@ -0,0 +1,221 @@
+import json
+import os
+import shutil
+import sys
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import quote
+from tqdm import tqdm
+import SChandler
+from SCvalidators.PMstream import StreamValidation, iter_transfers
+
+# ========================
+# Ночная проверка всех грантов по общей выписке
+# ========================
+#
+# Запуск из корня проекта:
+#   python -m SCvalidators.PMaudit transfers_dump.jsonl --run-dir audit/2026-10-18
+# В выписке у каждого перевода есть поле grant - имя гранта из getSCs().
+# Переводы раскладываются по файлам-шардам, гранты проверяются в пуле процессов,
+# результат каждого гранта сразу пишется в run-dir; после падения тот же запуск
+# продолжает с непроверенных грантов. Строки отчёта гранта идут потоком в reports/<грант>.jsonl,
+# в памяти и в сводном portfolio.json - только счётчики, ошибки и суммы по правилам.
+
+GRANT_KEY = "grant"
+MAX_OPEN_SHARDS = 64
+
+
+def _write_json(path, data):
+    """Атомарная запись: файл либо старый, либо новый целиком"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _grant_file(folder, name, ext):
+    return os.path.join(folder, quote(name, safe="") + ext)
+
+
+def _dump_id(path):
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def shard_transfers(dump_path, run_dir, grants, fmt=None):
+    """
+    Раскладывает переводы выписки по гранту в run_dir/shards/<грант>.jsonl.
+    Переводы без известного гранта пишутся в unknown.jsonl.
+    Если шарды этой же выписки уже есть, повторно не раскладывает.
+    Манифест пишется в папку шардов до её переименования: папка shards без манифеста -
+    остаток чужого или оборванного запуска, она удаляется и шарды собираются заново.
+    """
+    shards_dir = os.path.join(run_dir, "shards")
+    manifest_path = os.path.join(shards_dir, "manifest.json")
+    dump_id = _dump_id(dump_path)
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["dump"] != dump_id:
+            raise ValueError(f"В {run_dir} уже идёт проверка другой выписки: {manifest['dump']['path']}")
+        return manifest
+    if os.path.exists(shards_dir):
+        shutil.rmtree(shards_dir)
+
+    tmp_dir = shards_dir + ".tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name in os.listdir(tmp_dir):
+        os.remove(os.path.join(tmp_dir, name))
+
+    known = set(grants)
+    counts = {}
+    unknown = 0
+    handles = OrderedDict()  # открытые шарды, самые старые закрываются первыми
+    try:
+        for trn in tqdm(iter_transfers(dump_path, fmt), desc="Шардирование", unit=" пер."):
+            name = str(trn.pop(GRANT_KEY, ""))
+            shard = name if name in known else None
+            f = handles.get(shard)
+            if f is None:
+                path = os.path.join(tmp_dir, "unknown.jsonl") if shard is None else _grant_file(tmp_dir, shard, ".jsonl")
+                f = handles[shard] = open(path, "a", encoding="utf-8")
+                if len(handles) > MAX_OPEN_SHARDS:
+                    handles.popitem(last=False)[1].close()
+            else:
+                handles.move_to_end(shard)
+            if shard is None:
+                trn[GRANT_KEY] = name
+                unknown += 1
+            else:
+                counts[shard] = counts.get(shard, 0) + 1
+            f.write(json.dumps(trn, ensure_ascii=False) + "\n")
+    finally:
+        for f in handles.values():
+            f.close()
+
+    manifest = {"dump": dump_id, "transfers": counts, "unknown_grant": unknown}
+    _write_json(os.path.join(tmp_dir, "manifest.json"), manifest)
+    os.replace(tmp_dir, shards_dir)
+    return manifest
+
+
+def audit_grant(name, shard_path, result_path, report_path):
+    """
+    Проверка одного гранта по его шарду (выполняется в процессе пула).
+    Строки отчёта пишутся в report_path (JSON Lines) по мере проверки, ошибки остаются в результате.
+    """
+    contract, version = SChandler.readSC(name, versioned=True)
+    transfers = iter_transfers(shard_path, "jsonl") if os.path.exists(shard_path) else iter([])
+    stream = StreamValidation(contract, transfers, key=(name, version))
+    errors = []
+    with open(report_path + ".tmp", "w", encoding="utf-8") as report:
+        for kind, message in stream:
+            if kind == "report":
+                report.write(json.dumps(message, ensure_ascii=False) + "\n")
+            else:
+                errors.append(message)
+    os.replace(report_path + ".tmp", report_path)
+
+    result = {
+        "grant": name,
+        "counts": stream.counts,
+        "errors": errors,
+        "limits_used": [[stage_id, rule_id, used]
+                        for stage_id, rules in stream.limits_used.items() for rule_id, used in rules.items()],
+        "total_budget": contract['grant_metadata']['total_budget'],
+    }
+    _write_json(result_path, result)
+    return name, stream.counts
+
+
+def merge_results(run_dir, grants, failed):
+    """
+    Сводный отчёт по портфелю из результатов отдельных грантов: счётчики, ошибки и траты.
+    Строки отчёта в сводку не попадают - у каждого гранта report_path (от run_dir),
+    у переводов без гранта - число и путь к их шарду.
+    """
+    results_dir = os.path.join(run_dir, "results")
+    portfolio = {
+        "grants": {},
+        "failed": failed,
+        "unknown_grant": {"count": 0, "path": os.path.join("shards", "unknown.jsonl")},
+        "totals": {"transfers": 0, "report": 0, "error": 0, "spent": 0, "total_budget": 0},
+    }
+    for name in grants:
+        path = _grant_file(results_dir, name, ".json")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        spent = sum(used for _, _, used in result["limits_used"])
+        portfolio["grants"][name] = dict(result, spent=spent, report_path=_grant_file("reports", name, ".jsonl"))
+        totals = portfolio["totals"]
+        for key in ("transfers", "report", "error"):
+            totals[key] += result["counts"][key]
+        totals["spent"] += spent
+        totals["total_budget"] += result["total_budget"]
+
+    manifest_path = os.path.join(run_dir, "shards", "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            portfolio["unknown_grant"]["count"] = json.load(f)["unknown_grant"]
+
+    _write_json(os.path.join(run_dir, "portfolio.json"), portfolio)
+    return portfolio
+
+
+def run_audit(dump_path, run_dir, workers=None, fmt=None):
+    """
+    Проверяет все гранты из getSCs() по выписке dump_path.
+    Возвращает сводный отчёт (он же лежит в run_dir/portfolio.json).
+    """
+    grants = SChandler.getSCs()
+    os.makedirs(run_dir, exist_ok=True)
+    shard_transfers(dump_path, run_dir, grants, fmt)
+
+    shards_dir = os.path.join(run_dir, "shards")
+    results_dir = os.path.join(run_dir, "results")
+    reports_dir = os.path.join(run_dir, "reports")
+    os.makedirs(results_dir, exist_ok=True)
+    os.makedirs(reports_dir, exist_ok=True)
+    pending = [name for name in grants if not os.path.exists(_grant_file(results_dir, name, ".json"))]
+
+    failed = {}
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {
+                pool.submit(audit_grant, name, _grant_file(shards_dir, name, ".jsonl"),
+                            _grant_file(results_dir, name, ".json"), _grant_file(reports_dir, name, ".jsonl")): name
+                for name in pending
+            }
+            progress = tqdm(as_completed(futures), total=len(grants), initial=len(grants) - len(pending),
+                            desc="Проверка грантов", unit=" гр.")
+            for future in progress:
+                try:
+                    future.result()
+                except Exception as e:
+                    # Результат не записан - грант проверится заново при следующем запуске
+                    failed[futures[future]] = f"{type(e).__name__}: {e}"
+
+    return merge_results(run_dir, grants, failed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка всех грантов по общей выписке переводов")
+    parser.add_argument("transfers", help="выписка: .json (массив), .jsonl или .csv с полем grant")
+    parser.add_argument("--run-dir", required=True, help="папка запуска; повторный запуск продолжает проверку")
+    parser.add_argument("--workers", type=int, help="число процессов (по умолчанию - число ядер)")
+    parser.add_argument("--format", choices=["json", "jsonl", "ndjson", "csv"], help="формат выписки, если не по расширению")
+    args = parser.parse_args()
+
+    portfolio = run_audit(args.transfers, args.run_dir, workers=args.workers, fmt=args.format)
+    totals = portfolio["totals"]
+    print(f"Грантов: {len(portfolio['grants'])}, переводов: {totals['transfers']}, "
+          f"принято в отчёт: {totals['report']}, ошибок: {totals['error']}, "
+          f"без гранта: {portfolio['unknown_grant']['count']} ({portfolio['unknown_grant']['path']})")
+    print(f"Потрачено {totals['spent']:,} руб из {totals['total_budget']:,} руб")
+    for name, error in portfolio["failed"].items():
+        print(f"[СБОЙ] {name}: {error}", file=sys.stderr)
+    if portfolio["failed"]:
+        sys.exit(1)
@@ -0,0 +1,195 @@
+import numpy as np
+from collections.abc import Sequence
+from datetime import date
+from SCvalidators.PMrules import compile_contract
+from SCvalidators.MCCregistry import mcc_registry
+
+# ========================
+# Пакетная (колоночная) проверка переводов
+# ========================
+#
+# Библиотечный путь для тех, кому по большой выписке нужны итоги - limits_used, число
+# и первые строки ошибок: строки report/errors собираются лениво, и выигрыш (0.24 с против 0.75 с
+# на 200 тыс. переводов) получается именно за счёт того, что большинство из них не строится.
+# Потоковая проверка (PMstream, аудит PMaudit) пишет строку на каждый перевод, и там время уходит
+# на разбор и запись JSON и на сами строки: колоночная проверка пачками с выдачей всех событий
+# не быстрее построчной, поэтому эти пути остаются на iter_validation. Результаты обоих путей
+# совпадают (tests/test_batch.py).
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+PAYER_INDIVIDUAL = 0
+PAYER_LEGAL = 1
+PAYER_UNKNOWN = 2
+
+ERR_NONE = 0
+ERR_OUT_OF_RANGE = 1
+ERR_NO_RULE = 2
+ERR_LIMIT = 3
+ERR_PAYER = 4
+
+
+def to_kopecks(amounts):
+    """Суммы в рублях -> int64 копейки"""
+    return np.rint(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int64)
+
+def from_kopecks(value):
+    """int64 копейки -> рубли (int, если без копеек)"""
+    value = int(value)
+    return value // 100 if value % 100 == 0 else value / 100
+
+def dates_to_ordinals(dates):
+    """ISO-даты YYYY-MM-DD -> порядковые номера дней (date.toordinal)"""
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    return days + EPOCH_ORDINAL
+
+
+class LazyMessages(Sequence):
+    """Список сообщений, строки которого собираются только при обращении"""
+
+    def __init__(self, rows, formatter):
+        self._rows = rows
+        self._formatter = formatter
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._formatter(int(row)) for row in self._rows[index]]
+        return self._formatter(int(self._rows[index]))
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"LazyMessages({len(self)} строк)"
+
+
+class TransferColumns:
+    """Список переводов, разложенный по NumPy-массивам"""
+
+    def __init__(self, transfer_list):
+        self.transfers = list(transfer_list)
+        n = len(self.transfers)
+
+        payer = np.full(n, PAYER_UNKNOWN, dtype=np.int8)
+        mcc = [""] * n
+        for i, trn in enumerate(self.transfers):
+            payer_type = trn.get("payer_type")
+            if payer_type == "individual":
+                payer[i] = PAYER_INDIVIDUAL
+            elif payer_type == "legal_entity":
+                payer[i] = PAYER_LEGAL
+                mcc[i] = str(trn["mcc"])
+
+        self.payer = payer
+        self.dates = dates_to_ordinals([trn["date"] for trn in self.transfers])
+        self.amounts = to_kopecks([trn["amount"] for trn in self.transfers])
+        # MCC как маленькие целые: индекс в таблице уникальных кодов
+        self.mcc_values, mcc_codes = np.unique(np.array(mcc, dtype=str), return_inverse=True)
+        self.mcc = mcc_codes.astype(np.int32).reshape(-1)
+
+    def __len__(self):
+        return len(self.transfers)
+
+
+def validate_payments_batch(json_project, transfer_list, key=None):
+    """
+    Колоночный аналог validate_payments для больших выписок.
+    Возвращает тот же словарь report/errors/limits_used/rules_by_stage/unknown_mcc,
+    но report и errors - ленивые последовательности строк.
+    """
+    compiled = compile_contract(json_project, key)
+    columns = TransferColumns(transfer_list)
+    n = len(columns)
+
+    # Слот = индекс сумматора (stage_id, rule_id); на этап - слот физлиц и таблица MCC -> слот
+    keys = list(compiled.rules)
+    key_index = {key: slot for slot, key in enumerate(keys)}
+    n_stages = max(len(compiled.stage_ids), 1)
+    individual_slot = np.full(n_stages, -1, dtype=np.int32)
+    mcc_slot = np.full((n_stages, len(columns.mcc_values)), -1, dtype=np.int32)
+    for pos, stage_id in enumerate(compiled.stage_ids):
+        if stage_id in compiled.individuals:
+            individual_slot[pos] = key_index[(stage_id, compiled.individuals[stage_id])]
+        mcc_rules = compiled.mcc_rules.get(stage_id, {})
+        for code, value in enumerate(columns.mcc_values):
+            if value in mcc_rules:
+                mcc_slot[pos, code] = key_index[(stage_id, mcc_rules[value])]
+    slot_limit = to_kopecks([compiled.rules[key]['limit'] for key in keys])
+
+    stage_pos = compiled.stage_index.positions(columns.dates)
+    in_range = stage_pos >= 0
+    safe_pos = np.where(in_range, stage_pos, 0)
+
+    slot = np.full(n, -1, dtype=np.int32)
+    is_ind = in_range & (columns.payer == PAYER_INDIVIDUAL)
+    is_leg = in_range & (columns.payer == PAYER_LEGAL)
+    slot[is_ind] = individual_slot[safe_pos[is_ind]]
+    slot[is_leg] = mcc_slot[safe_pos[is_leg], columns.mcc[is_leg]]
+    matched = slot >= 0
+
+    # Нарастающие суммы по каждому сумматору в порядке переводов
+    running = np.zeros(n, dtype=np.int64)
+    used = np.zeros(len(keys), dtype=np.int64)
+    rows = np.nonzero(matched)[0]
+    if len(rows):
+        row_keys = slot[rows].astype(np.int64)
+        order = np.argsort(row_keys, kind="stable")
+        sorted_keys = row_keys[order]
+        sorted_amounts = columns.amounts[rows][order]
+        cumsum = np.cumsum(sorted_amounts)
+        group_start = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        first = np.maximum.accumulate(np.where(group_start, np.arange(len(rows)), 0))
+        running[rows[order]] = cumsum - (cumsum - sorted_amounts)[first]
+        np.add.at(used, row_keys, columns.amounts[rows])
+
+    error = np.full(n, ERR_NONE, dtype=np.int8)
+    error[~in_range] = ERR_OUT_OF_RANGE
+    error[in_range & (columns.payer == PAYER_UNKNOWN)] = ERR_PAYER
+    error[(is_ind | is_leg) & ~matched] = ERR_NO_RULE
+    exceeded = np.zeros(n, dtype=bool)
+    exceeded[rows] = running[rows] > slot_limit[slot[rows]]
+    error[exceeded] = ERR_LIMIT
+
+    transfers = columns.transfers
+
+    def format_report(i):
+        trn = transfers[i]
+        stage_id, rule_id = keys[slot[i]]
+        if columns.payer[i] == PAYER_INDIVIDUAL:
+            return f"ФизЛ: ИНН {trn['inn']} сумма {trn['amount']} дата {trn['date']} — В ЭТАПЕ {stage_id} (правило {rule_id})"
+        return f"ЮрЛ: ИНН {trn['inn']} сумма {trn['amount']} мсс {trn['mcc']} дата {trn['date']} — В ЭТАПЕ {stage_id} (правило {rule_id})"
+
+    def format_error(i):
+        trn = transfers[i]
+        code = error[i]
+        if code == ERR_OUT_OF_RANGE:
+            return f"❌ Перевод на дату {trn['date']} вне диапазона проекта"
+        if code == ERR_PAYER:
+            return f"❌ Не определён тип плательщика: {trn}"
+        if code == ERR_NO_RULE:
+            if columns.payer[i] == PAYER_INDIVIDUAL:
+                return f"❌ Нет подходящего правила для физлица ({trn['inn']}) {trn['date']}"
+            return f"❌ Нет разрешения на перевод ЮрЛ ({trn['inn']}, {trn['mcc']}) {trn['date']}"
+        stage_id, rule_id = keys[slot[i]]
+        kind = "лимит" if columns.payer[i] == PAYER_INDIVIDUAL else "лимит по MCC"
+        return f"❌ Превышен {kind} для {rule_id} ({stage_id}): {from_kopecks(running[i])} > {compiled.rules[(stage_id, rule_id)]['limit']}"
+
+    rules_by_stage = compiled.copy_rules_by_stage()
+    limits_used = {stage_id: {rule['rule_id']: 0 for rule in stage_rules}
+                   for stage_id, stage_rules in rules_by_stage.items()}
+    for k, (stage_id, rule_id) in enumerate(keys):
+        limits_used[stage_id][rule_id] = from_kopecks(used[k])
+
+    return {
+        "report": LazyMessages(rows, format_report),
+        "errors": LazyMessages(np.nonzero(error != ERR_NONE)[0], format_error),
+        "limits_used": limits_used,
+        "rules_by_stage": rules_by_stage,
+        # таблица уникальных MCC уже есть - проверка по справочнику почти бесплатна
+        "unknown_mcc": mcc_registry().unknown(value for value in columns.mcc_values if value)
+    }
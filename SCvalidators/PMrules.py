@@ -0,0 +1,184 @@
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+from SCvalidators.PMstages import StageIndex
+from SCvalidators.MCCregistry import mcc_registry
+
+# ========================
+# Скомпилированные правила контракта (кэш по версии или хэшу содержимого)
+# ========================
+
+CACHE_SIZE = 128
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+
+def normalize_rules(json_project):
+    """
+    Собирает правильные MCC для каждой allowed_categories вместе с лимитами.
+    Возвращает {stage_id: [нормализованное правило, ...]}
+    """
+    rules_by_stage = {}
+    for stage in json_project.get('stages', []):
+        stage_id = stage['stage_id']
+        rules_by_stage[stage_id] = []
+        for rule in stage.get('spending_rules', []):
+            norm = {
+                "rule_id": rule['rule_id'],
+                "rule_type": rule['rule_type'],
+                "limit": rule['limit'],
+                "allowed_categories": [],
+                "allowed_mcc": set(),
+            }
+            if rule['rule_type'] == 'legal_entities':
+                for cat in rule['allowed_categories']:
+                    # dict: category + mcc_codes
+                    for code in (cat['mcc_codes'] if isinstance(cat,dict) else []):
+                        norm["allowed_mcc"].add(str(code))
+                    norm["allowed_categories"].append(cat['category'])
+            elif rule['rule_type'] == 'individuals':
+                norm["allowed_categories"].extend(rule['allowed_categories'])
+            rules_by_stage[stage_id].append(norm)
+    return rules_by_stage
+
+
+def format_amount(value):
+    """
+    Сумма для сообщений: округлена до копеек, целая - без дробной части.
+    Пакетная проверка считает в копейках, построчная - во float; так сообщения у них совпадают.
+    """
+    kopecks = round(value * 100)
+    return kopecks // 100 if kopecks % 100 == 0 else kopecks / 100
+
+
+def _rules_projection(json_project):
+    """Только те поля контракта, от которых зависят правила (без трат и транзакций)"""
+    return [
+        {
+            "stage_id": stage['stage_id'],
+            "start_date": stage['start_date'],
+            "end_date": stage['end_date'],
+            "spending_rules": [
+                {
+                    "rule_id": rule['rule_id'],
+                    "rule_type": rule['rule_type'],
+                    "limit": rule['limit'],
+                    "allowed_categories": rule.get('allowed_categories', []),
+                }
+                for rule in stage.get('spending_rules', [])
+            ],
+        }
+        for stage in json_project.get('stages', [])
+    ]
+
+
+def _projection_hash(stages):
+    data = json.dumps(stages, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def contract_hash(json_project):
+    """Хэш содержимого контракта, значимого для правил"""
+    return _projection_hash(_rules_projection(json_project))
+
+
+class CompiledContract:
+    """
+    Скомпилированная форма правил контракта:
+    на каждый этап - слот правила физлиц и хэш-таблица MCC -> rule_id.
+    Объект общий для всех вызовов с тем же содержимым, менять его нельзя.
+    """
+
+    def __init__(self, stages):
+        self.stage_ids = [stage['stage_id'] for stage in stages]
+        self.stage_index = StageIndex(stages)
+        self.rules_by_stage = normalize_rules({"stages": stages})
+        self.rules = {}         # (stage_id, rule_id) -> нормализованное правило
+        self.individuals = {}   # stage_id -> rule_id первого правила физлиц
+        self.mcc_rules = {}     # stage_id -> {mcc: rule_id}
+        self.conflicts = []
+
+        for stage_id, rules in self.rules_by_stage.items():
+            mcc_rules = self.mcc_rules.setdefault(stage_id, {})
+            for rule in rules:
+                if (stage_id, rule['rule_id']) in self.rules:
+                    self.conflicts.append(f"Этап {stage_id}: повторяется rule_id {rule['rule_id']}")
+                    continue
+                self.rules[(stage_id, rule['rule_id'])] = rule
+                if rule['rule_type'] == 'individuals':
+                    if stage_id in self.individuals:
+                        self.conflicts.append(
+                            f"Этап {stage_id}: правило {rule['rule_id']} для физлиц не используется, действует {self.individuals[stage_id]}"
+                        )
+                    else:
+                        self.individuals[stage_id] = rule['rule_id']
+                elif rule['rule_type'] == 'legal_entities':
+                    for code in mcc_registry().unknown(sorted(rule['allowed_mcc'])):
+                        self.conflicts.append(f"Этап {stage_id}: MCC {code} в правиле {rule['rule_id']} нет в справочнике")
+                    for code in sorted(rule['allowed_mcc']):
+                        if code in mcc_rules:
+                            self.conflicts.append(
+                                f"Этап {stage_id}: MCC {code} заявлен в правилах {mcc_rules[code]} и {rule['rule_id']}, действует {mcc_rules[code]}"
+                            )
+                        else:
+                            mcc_rules[code] = rule['rule_id']
+
+    @property
+    def issues(self):
+        return self.stage_index.issues + self.conflicts
+
+    def stage_at(self, ordinal):
+        """stage_id этапа для дня ordinal или None"""
+        pos = self.stage_index.position(ordinal)
+        return self.stage_ids[pos] if pos >= 0 else None
+
+    def rule_for(self, stage_id, trn):
+        """Правило для перевода внутри этапа или None"""
+        rule_id = None
+        if trn.get("payer_type") == "individual":
+            rule_id = self.individuals.get(stage_id)
+        elif trn.get("payer_type") == "legal_entity":
+            rule_id = self.mcc_rules.get(stage_id, {}).get(str(trn["mcc"]))
+        return self.rules[(stage_id, rule_id)] if rule_id is not None else None
+
+    def copy_rules_by_stage(self):
+        """Копия rules_by_stage, которую вызывающий код может менять"""
+        return {stage_id: [dict(rule, allowed_categories=list(rule['allowed_categories']),
+                                allowed_mcc=set(rule['allowed_mcc'])) for rule in rules]
+                for stage_id, rules in self.rules_by_stage.items()}
+
+
+def compile_contract(json_project, key=None):
+    """
+    Скомпилированные правила контракта; повторные вызовы берут их из LRU-кэша.
+    key - готовый ключ версии контракта, например (имя гранта, версия хранилища) из readSC:
+    с ним попадание в кэш ничего не стоит. Без key ключ - хэш правил, его сериализация
+    сопоставима с самой компиляцией, поэтому компилируйте один раз и передавайте объект дальше.
+    """
+    stages = None
+    if key is None:
+        stages = _rules_projection(json_project)
+        key = _projection_hash(stages)
+
+    with _cache_lock:
+        compiled = _cache.get(key)
+        if compiled is not None:
+            _cache.move_to_end(key)
+            cache_stats["hits"] += 1
+            return compiled
+        cache_stats["misses"] += 1
+
+    compiled = CompiledContract(stages if stages is not None else _rules_projection(json_project))
+    with _cache_lock:
+        _cache[key] = compiled
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
+
+
+def check_contract(json_project):
+    """Проблемы контракта при загрузке: даты этапов и конфликты правил"""
+    return compile_contract(json_project).issues
@@ -0,0 +1,91 @@
+import heapq
+import numpy as np
+from bisect import bisect_right
+from datetime import date
+
+# ========================
+# Индекс интервалов этапов по датам
+# ========================
+
+def date_ordinal(value):
+    """ISO-дата YYYY-MM-DD -> порядковый номер дня"""
+    return date.fromisoformat(value).toordinal()
+
+
+class StageIndex:
+    """
+    Отсортированный индекс диапазонов дат этапов.
+    Даты этапов разбираются один раз; поиск этапа по дате - bisect, O(log N).
+    При пересечении этапов побеждает последний в json_project['stages'],
+    как и в исходном линейном поиске.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.issues = []
+
+        intervals = []
+        for pos, stage in enumerate(self.stages):
+            start = date_ordinal(stage['start_date'])
+            end = date_ordinal(stage['end_date'])
+            if start > end:
+                self.issues.append(
+                    f"Этап {stage['stage_id']}: дата начала {stage['start_date']} позже даты окончания {stage['end_date']}"
+                )
+                continue
+            intervals.append((start, end, pos))
+        intervals.sort()
+
+        for (_, prev_end, prev_pos), (start, _, pos) in zip(intervals, intervals[1:]):
+            prev, cur = self.stages[prev_pos], self.stages[pos]
+            if start <= prev_end:
+                self.issues.append(
+                    f"Этапы {prev['stage_id']} и {cur['stage_id']} пересекаются: {cur['start_date']} <= {prev['end_date']}"
+                )
+            elif start > prev_end + 1:
+                self.issues.append(
+                    f"Между этапами {prev['stage_id']} и {cur['stage_id']} разрыв: {prev['end_date']} — {cur['start_date']}"
+                )
+
+        # Элементарные отрезки [bounds[i], bounds[i+1]) и владеющий ими этап (-1 - вне проекта)
+        points = sorted({p for start, end, _ in intervals for p in (start, end + 1)})
+        self.bounds = []
+        self.owners = []
+        active = []
+        i = 0
+        for point in points:
+            while i < len(intervals) and intervals[i][0] <= point:
+                start, end, pos = intervals[i]
+                heapq.heappush(active, (-pos, end))
+                i += 1
+            # Ленивое удаление: закончившиеся этапы снимаются, только оказавшись на вершине
+            while active and active[0][1] < point:
+                heapq.heappop(active)
+            owner = -active[0][0] if active else -1
+            if self.owners and self.owners[-1] == owner:
+                continue
+            self.bounds.append(point)
+            self.owners.append(owner)
+
+    def position(self, ordinal):
+        """Позиция этапа в stages для дня ordinal или -1"""
+        i = bisect_right(self.bounds, ordinal) - 1
+        return self.owners[i] if i >= 0 else -1
+
+    def lookup(self, ordinal):
+        """Этап (dict) для дня ordinal или None"""
+        pos = self.position(ordinal)
+        return self.stages[pos] if pos >= 0 else None
+
+    def positions(self, ordinals):
+        """Векторный вариант position для массива NumPy"""
+        if not self.bounds:
+            return np.full(len(ordinals), -1, dtype=np.int32)
+        owners = np.array(self.owners, dtype=np.int32)
+        i = np.searchsorted(np.array(self.bounds, dtype=np.int64), ordinals, side="right") - 1
+        return np.where(i >= 0, owners[np.maximum(i, 0)], -1).astype(np.int32)
+
+
+def check_stages(json_project):
+    """Список проблем с датами этапов (пересечения, разрывы) при загрузке контракта"""
+    return StageIndex(json_project.get('stages', [])).issues
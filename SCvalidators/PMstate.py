@@ -0,0 +1,142 @@
+import copy
+from SCvalidators.PMstages import date_ordinal
+from SCvalidators.PMrules import compile_contract, format_amount
+
+# ========================
+# Состояние проверки платежей гранта
+# ========================
+
+STATE_KEY = "validation_state"
+STATE_VERSION = 1
+
+
+class ValidationState:
+    """
+    Постоянное состояние проверки платежей одного гранта.
+    Хранит исходные лимиты, потраченные суммы по (этап, правило) и скомпилированные правила,
+    поэтому проверка и учёт нового перевода не зависят от длины истории.
+    Сохраняется в самом контракте под ключом validation_state.
+    """
+
+    def __init__(self, json_project, spent=None, key=None):
+        self.compiled = compile_contract(json_project, key)
+        self.limits = {key: rule['limit'] for key, rule in self.compiled.rules.items()}
+        self.spent = {key: 0 for key in self.limits}
+        for key, amount in (spent or {}).items():
+            if key in self.spent:
+                self.spent[key] = amount
+        self.total_budget = json_project.get('grant_metadata', {}).get('total_budget')
+        self.migrated = False   # лимиты и бюджет восстановлены из старого формата, store() их запишет
+
+    @classmethod
+    def from_contract(cls, contract, key=None):
+        """
+        Восстанавливает состояние из контракта; key - ключ версии для кэша правил (см. compile_contract).
+        Старые контракты, у которых handlePayments вычитал траты из limit,
+        переводятся в новый формат на копии: переданный contract не меняется,
+        исходные лимиты и бюджет попадают в него только через store().
+        """
+        if STATE_KEY in contract:
+            spent = {(stage_id, rule_id): amount
+                     for stage_id, rule_id, amount in contract[STATE_KEY]['spent']}
+            return cls(contract, spent, key)
+
+        spent = {}
+        legacy = None
+        for stage_pos, stage in enumerate(contract.get('stages', [])):
+            for rule_pos, rule in enumerate(stage.get('spending_rules', [])):
+                used = rule.get('spent', 0)
+                if used:
+                    if legacy is None:
+                        legacy = copy.deepcopy(contract)
+                    legacy['stages'][stage_pos]['spending_rules'][rule_pos]['limit'] += used
+                    legacy['grant_metadata']['total_budget'] += used
+                    spent[(stage['stage_id'], rule['rule_id'])] = used
+        if legacy is None:
+            return cls(contract, spent, key)
+        # лимиты копии отличаются от хранимых - кэш правил по её содержимому, не по версии
+        state = cls(legacy, spent)
+        state.migrated = True
+        return state
+
+    def resolve(self, trn):
+        """(stage_id, rule_id, ошибка) для перевода без учёта лимитов"""
+        stage_id = self.compiled.stage_at(date_ordinal(trn['date']))
+        if stage_id is None:
+            return None, None, f"❌ Перевод на дату {trn['date']} вне диапазона проекта"
+
+        if trn.get("payer_type") not in ("individual", "legal_entity"):
+            return None, None, f"❌ Не определён тип плательщика: {trn}"
+        rule = self.compiled.rule_for(stage_id, trn)
+        if rule is None:
+            if trn["payer_type"] == "individual":
+                return stage_id, None, f"❌ Нет подходящего правила для физлица ({trn['inn']}) {trn['date']}"
+            return stage_id, None, f"❌ Нет разрешения на перевод ЮрЛ ({trn['inn']}, {trn['mcc']}) {trn['date']}"
+        return stage_id, rule['rule_id'], None
+
+    def _evaluate(self, trn):
+        stage_id, rule_id, error = self.resolve(trn)
+        if error:
+            return None, [error]
+        key = (stage_id, rule_id)
+        used = self.spent[key] + trn['amount']
+        if used > self.limits[key]:
+            kind = "лимит" if self.compiled.rules[key]['rule_type'] == 'individuals' else "лимит по MCC"
+            return key, [f"❌ Превышен {kind} для {rule_id} ({stage_id}): {format_amount(used)} > {self.limits[key]}"]
+        return key, []
+
+    def check(self, trn):
+        """Список ошибок для перевода с учётом уже потраченного; состояние не меняется"""
+        return self._evaluate(trn)[1]
+
+    def apply(self, trn):
+        """Проверяет перевод и, если ошибок нет, учитывает его сумму"""
+        key, errors = self._evaluate(trn)
+        if not errors:
+            self.spent[key] += trn['amount']
+        return errors
+
+    def apply_all(self, transfer_list):
+        """Учитывает переводы целиком или никак: при любой ошибке состояние откатывается"""
+        errors = []
+        applied = []
+        for trn in transfer_list:
+            key, trn_errors = self._evaluate(trn)
+            if trn_errors:
+                errors.extend(trn_errors)
+            else:
+                self.spent[key] += trn['amount']
+                applied.append((key, trn['amount']))
+        if errors:
+            for key, amount in applied:
+                self.spent[key] -= amount
+        return errors
+
+    def remaining(self, stage_id, rule_id):
+        return self.limits[(stage_id, rule_id)] - self.spent[(stage_id, rule_id)]
+
+    def total_spent(self):
+        return sum(self.spent.values())
+
+    def to_dict(self):
+        return {
+            "version": STATE_VERSION,
+            "spent": [[stage_id, rule_id, amount]
+                      for (stage_id, rule_id), amount in self.spent.items() if amount],
+        }
+
+    def store(self, contract):
+        """
+        Записывает состояние в контракт (служебные поля хранилища сохраняются).
+        Лимиты и бюджет не трогаются, кроме первой записи старого контракта - ему возвращаются исходные.
+        """
+        contract[STATE_KEY] = dict(contract.get(STATE_KEY, {}), **self.to_dict())
+        for stage in contract.get('stages', []):
+            for rule in stage.get('spending_rules', []):
+                key = (stage['stage_id'], rule['rule_id'])
+                rule['spent'] = self.spent.get(key, 0)
+                if self.migrated and key in self.limits:
+                    rule['limit'] = self.limits[key]
+        if self.migrated:
+            contract['grant_metadata']['total_budget'] = self.total_budget
+        return contract
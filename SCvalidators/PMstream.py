@@ -0,0 +1,216 @@
+import csv
+import json
+import os
+from datetime import datetime
+from SCvalidators.PMvalidator import iter_validation, empty_limits_used
+from SCvalidators.PMrules import compile_contract
+
+# ========================
+# Потоковая загрузка и проверка переводов
+# ========================
+
+CHUNK_SIZE = 1 << 16
+NUMBER_CHARS = set("0123456789+-.eE")
+
+# Заголовки банковских выписок -> поля перевода
+CSV_COLUMNS = {
+    "payer_type": "payer_type", "тип плательщика": "payer_type", "тип": "payer_type",
+    "inn": "inn", "инн": "inn", "инн получателя": "inn",
+    "amount": "amount", "сумма": "amount", "сумма операции": "amount",
+    "mcc": "mcc", "мсс": "mcc",
+    "date": "date", "дата": "date", "дата операции": "date",
+    "grant": "grant", "грант": "grant",
+}
+PAYER_TYPES = {
+    "individual": "individual", "физлицо": "individual", "фл": "individual",
+    "legal_entity": "legal_entity", "юрлицо": "legal_entity", "юл": "legal_entity",
+}
+
+
+def _element_ends(buf, pos):
+    """Закончился ли в buf элемент массива, начатый в pos: есть "," или "]" вне строк и вложенных скобок"""
+    depth = 0
+    in_string = escape = False
+    for i in range(pos, len(buf)):
+        ch = buf[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "[{":
+            depth += 1
+        elif ch in "]}":
+            if depth == 0:
+                return True
+            depth -= 1
+        elif ch == "," and depth == 0:
+            return True
+    return False
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """
+    Элементы большого JSON-массива по одному, без чтения файла целиком.
+    Синтаксис массива проверяется строго: [элемент, элемент, ...] и ничего после "]";
+    испорченный элемент - ValueError сразу, а не дочитывание файла до конца в поисках продолжения.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    expect = "["   # "[" - начало массива, "value" - элемент, "value]" - элемент или "]", ",]" - разделитель
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        buf = buf[pos:] + chunk
+        pos = 0
+        eof = not chunk
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                if expect is None:
+                    return
+                raise ValueError("Неожиданный конец JSON-массива")
+            fill()
+            continue
+
+        ch = buf[pos]
+        if expect is None:
+            raise ValueError(f"Лишние данные после JSON-массива: {buf[pos:pos + 20]!r}")
+        if expect == "[":
+            if ch != "[":
+                raise ValueError("Ожидался JSON-массив переводов")
+            expect = "value]"
+            pos += 1
+            continue
+        if expect in ("value]", ",]") and ch == "]":
+            expect = None   # дальше допустимы только пробелы
+            pos += 1
+            continue
+        if expect == ",]":
+            if ch != ",":
+                raise ValueError(f"Ожидалась \",\" или \"]\" между элементами JSON-массива: {buf[pos:pos + 20]!r}")
+            expect = "value"
+            pos += 1
+            continue
+        if ch in ",]":
+            raise ValueError(f"Пропущен элемент JSON-массива: {buf[pos:pos + 20]!r}")
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            # Элемент не разобрался: если он уже закончился в буфере - он испорчен,
+            # иначе просто разрезан чанком и нужно дочитать
+            if eof or _element_ends(buf, pos):
+                raise
+            fill()
+            continue
+        if not eof and (end == len(buf) or isinstance(value, (int, float))
+                        and all(ch in NUMBER_CHARS for ch in buf[end:])):
+            # Значение упёрлось в конец буфера или число разрезано чанком ("-7" + ".5") -
+            # дочитываем и разбираем заново
+            fill()
+            continue
+        pos = end
+        expect = ",]"
+        yield value
+
+
+def iter_json_lines(f):
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _csv_amount(value):
+    value = value.replace("\xa0", "").replace(" ", "").replace(",", ".")
+    amount = float(value)
+    return int(amount) if amount.is_integer() else amount
+
+def _csv_date(value):
+    value = value.strip()
+    if "." in value:
+        return datetime.strptime(value[:10], "%d.%m.%Y").date().isoformat()
+    return value[:10]
+
+def iter_csv(f):
+    """Переводы из CSV-выписки (разделитель , или ; определяется по первой строке)"""
+    header = f.readline()
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    columns = [CSV_COLUMNS.get(name.strip().strip('"').lower()) for name in next(csv.reader([header], delimiter=delimiter))]
+    for row in csv.reader(f, delimiter=delimiter):
+        if not row:
+            continue
+        trn = {column: value.strip() for column, value in zip(columns, row) if column}
+        trn["payer_type"] = PAYER_TYPES.get(trn.get("payer_type", "").lower(), trn.get("payer_type"))
+        trn["amount"] = _csv_amount(trn["amount"])
+        trn["date"] = _csv_date(trn["date"])
+        if not trn.get("mcc"):
+            trn.pop("mcc", None)
+        yield trn
+
+
+def iter_transfers(path, fmt=None):
+    """
+    Переводы из файла по одному: JSON Lines (.jsonl/.ndjson), CSV (.csv) или JSON-массив (.json).
+    Память не зависит от размера выписки.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lower().lstrip(".")
+    with open(path, "r", encoding="utf-8-sig", newline="" if fmt == "csv" else None) as f:
+        if fmt in ("jsonl", "ndjson"):
+            yield from iter_json_lines(f)
+        elif fmt == "csv":
+            yield from iter_csv(f)
+        else:
+            yield from iter_json_array(f)
+
+
+class StreamValidation:
+    """
+    Потоковая проверка: итерация выдаёт пары ("report" | "error", строка) по мере чтения,
+    а limits_used доступен в любой момент и после окончания потока.
+    """
+
+    def __init__(self, json_project, transfers, key=None):
+        compiled = compile_contract(json_project, key)
+        self.rules_by_stage = compiled.copy_rules_by_stage()
+        self.limits_used = empty_limits_used(self.rules_by_stage)
+        self.counts = {"transfers": 0, "report": 0, "error": 0}
+        self._events = iter_validation(json_project, self._count(transfers), self.limits_used, compiled)
+
+    def _count(self, transfers):
+        for trn in transfers:
+            self.counts["transfers"] += 1
+            yield trn
+
+    def __iter__(self):
+        for kind, message in self._events:
+            self.counts[kind] += 1
+            yield kind, message
+
+
+def validate_stream(json_project, transfers_path, out, fmt=None):
+    """
+    Проверяет выписку transfers_path и пишет результат в out (текстовый файл) строками JSON Lines:
+    {"kind": "report"|"error", "message": ...}, в конце - {"kind": "summary", ...}.
+    """
+    stream = StreamValidation(json_project, iter_transfers(transfers_path, fmt))
+    for kind, message in stream:
+        out.write(json.dumps({"kind": kind, "message": message}, ensure_ascii=False) + "\n")
+    summary = {
+        "kind": "summary",
+        "counts": stream.counts,
+        "limits_used": [[stage_id, rule_id, used]
+                        for stage_id, rules in stream.limits_used.items() for rule_id, used in rules.items()],
+    }
+    out.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    return stream
@@ -1,23 +1,37 @@
 import json
-from datetime import datetime
-from PIL import Image
-from pyzbar.pyzbar import decode
+from SCvalidators.QRdecoder import decode_qr, decode_batch
+from SCvalidators.PMstages import date_ordinal
+from SCvalidators.PMrules import compile_contract, format_amount
+from SCvalidators.MCCregistry import mcc_registry
+from SCvalidators.PMstate import ValidationState
 
 def qr2json(qr):
+    """Текст первого QR-кода на картинке или None (все коды картинки - в qr2transfers)"""
     if qr is None:
         return None
-    
-    try:
-        image = Image.open(qr)
-        decoded_objects = decode(image)
-        
-        if decoded_objects:
-            qr_data = decoded_objects[0].data.decode('utf-8')
-            return qr_data
-        else:
-            return None
-    except Exception as e:
-        return None
+    symbols = decode_qr(qr)["symbols"]
+    return symbols[0] if symbols else None
+
+
+def qr2transfers(images):
+    """
+    Переводы из всех QR-кодов всех картинок (пачка декодируется в пуле процессов).
+    Возвращает (список переводов, имена картинок, где не нашлось ни одного перевода).
+    """
+    transfers, failed = [], []
+    for number, (image, result) in enumerate(zip(images, decode_batch(images)), 1):
+        found = False
+        for text in result["symbols"]:
+            try:
+                data = json.loads(text)
+            except ValueError:
+                continue
+            items = [item for item in (data if isinstance(data, list) else [data]) if isinstance(item, dict)]
+            transfers += items
+            found = found or bool(items)
+        if not found:
+            failed.append(getattr(image, "name", f"#{number}"))
+    return transfers, failed
 
 
 # ========================
@@ -40,118 +54,89 @@ def generate_transfer_list(transfers):
 # Проверка переводов
 # ========================
 
-def validate_payments(json_project, transfer_list):
+def iter_validation(json_project, transfer_list, limits_used, compiled=None):
     """
-    Сверяет переводы с бюджетом и правилами MCC.
-    Возвращает подробный результат проверки по этапам и ошибкам.
+    Проверяет переводы по одному и выдаёт пары ("report" | "error", строка).
+    Нарастающие суммы копятся в limits_used {stage_id: {rule_id: сумма}},
+    поэтому transfer_list может быть любым итератором, в том числе бесконечным потоком.
+    compiled - уже скомпилированные правила (compile_contract), если они есть у вызывающего.
     """
-    report = []
-    errors = []
-    stage_lookup = {stage['stage_id']: stage for stage in json_project.get('stages', [])}
-    
-    # Собираем правильные MCC для каждой allowed_categories вместе с лимитами
-    rules_by_stage = {}
-    for stage in json_project.get('stages', []):
-        stage_id = stage['stage_id']
-        rules_by_stage[stage_id] = []
-        for rule in stage.get('spending_rules', []):
-            norm = {
-                "rule_id": rule['rule_id'],
-                "rule_type": rule['rule_type'],
-                "limit": rule['limit'],
-                "allowed_categories": [],
-                "allowed_mcc": set(),
-            }
-            if rule['rule_type'] == 'legal_entities':
-                for cat in rule['allowed_categories']:
-                    # dict: category + mcc_codes
-                    for code in (cat['mcc_codes'] if isinstance(cat,dict) else []):
-                        norm["allowed_mcc"].add(str(code))
-                    norm["allowed_categories"].append(cat['category'])
-            elif rule['rule_type'] == 'individuals':
-                norm["allowed_categories"].extend(rule['allowed_categories'])
-            rules_by_stage[stage_id].append(norm)
-    
-    # Сумматоры по правилам
-    limits_used = {stage_id: {rule['rule_id']: 0 for rule in stage_rules}
-                   for stage_id, stage_rules in rules_by_stage.items()}
+    compiled = compiled or compile_contract(json_project)
 
     for trn in transfer_list:
-        # extract stage (находим по дате)
-        stage_id = None
-        trn_date = datetime.strptime(trn['date'], "%Y-%m-%d").date()
-        for stage in json_project.get('stages', []):
-            if stage['start_date'] <= trn['date'] <= stage['end_date']:
-                stage_id = stage['stage_id']
+        # extract stage (находим по дате через индекс интервалов)
+        stage_id = compiled.stage_at(date_ordinal(trn['date']))
         if stage_id is None:
-            errors.append(f"❌ Перевод на дату {trn['date']} вне диапазона проекта")
+            yield "error", f"❌ Перевод на дату {trn['date']} вне диапазона проекта"
             continue
-        rules = rules_by_stage[stage_id]
-        matched = False
+        rule = compiled.rule_for(stage_id, trn)
         
         if trn.get("payer_type") == "individual":
-            for rule in rules:
-                if rule["rule_type"] == "individuals":
-                    limits_used[stage_id][rule['rule_id']] += trn['amount']
-                    report.append(
-                        f"ФизЛ: ИНН {trn['inn']} сумма {trn['amount']} дата {trn['date']} — В ЭТАПЕ {stage_id} (правило {rule['rule_id']})"
-                    )
-                    # Проверим лимит
-                    if limits_used[stage_id][rule['rule_id']] > rule['limit']:
-                        errors.append(
-                            f"❌ Превышен лимит для {rule['rule_id']} ({stage_id}): {limits_used[stage_id][rule['rule_id']]} > {rule['limit']}"
-                        )
-                    matched = True
-                    break
-            if not matched:
-                errors.append(
-                    f"❌ Нет подходящего правила для физлица ({trn['inn']}) {trn['date']}"
-                )
+            if rule is None:
+                yield "error", f"❌ Нет подходящего правила для физлица ({trn['inn']}) {trn['date']}"
+                continue
+            limits_used[stage_id][rule['rule_id']] += trn['amount']
+            yield "report", f"ФизЛ: ИНН {trn['inn']} сумма {trn['amount']} дата {trn['date']} — В ЭТАПЕ {stage_id} (правило {rule['rule_id']})"
+            # Проверим лимит
+            if limits_used[stage_id][rule['rule_id']] > rule['limit']:
+                yield "error", f"❌ Превышен лимит для {rule['rule_id']} ({stage_id}): {format_amount(limits_used[stage_id][rule['rule_id']])} > {rule['limit']}"
         elif trn.get("payer_type") == "legal_entity":
-            for rule in rules:
-                if rule["rule_type"] == "legal_entities" and str(trn["mcc"]) in rule["allowed_mcc"]:
-                    limits_used[stage_id][rule['rule_id']] += trn['amount']
-                    report.append(
-                        f"ЮрЛ: ИНН {trn['inn']} сумма {trn['amount']} мсс {trn['mcc']} дата {trn['date']} — В ЭТАПЕ {stage_id} (правило {rule['rule_id']})"
-                    )
-                    if limits_used[stage_id][rule['rule_id']] > rule['limit']:
-                        errors.append(
-                            f"❌ Превышен лимит по MCC для {rule['rule_id']} ({stage_id}): {limits_used[stage_id][rule['rule_id']]} > {rule['limit']}"
-                        )
-                    matched = True
-                    break
-            if not matched:
-                errors.append(
-                    f"❌ Нет разрешения на перевод ЮрЛ ({trn['inn']}, {trn['mcc']}) {trn['date']}"
-                )
+            if rule is None:
+                yield "error", f"❌ Нет разрешения на перевод ЮрЛ ({trn['inn']}, {trn['mcc']}) {trn['date']}"
+                continue
+            limits_used[stage_id][rule['rule_id']] += trn['amount']
+            yield "report", f"ЮрЛ: ИНН {trn['inn']} сумма {trn['amount']} мсс {trn['mcc']} дата {trn['date']} — В ЭТАПЕ {stage_id} (правило {rule['rule_id']})"
+            if limits_used[stage_id][rule['rule_id']] > rule['limit']:
+                yield "error", f"❌ Превышен лимит по MCC для {rule['rule_id']} ({stage_id}): {format_amount(limits_used[stage_id][rule['rule_id']])} > {rule['limit']}"
         else:
-            errors.append(f"❌ Не определён тип плательщика: {trn}")
+            yield "error", f"❌ Не определён тип плательщика: {trn}"
+
+def empty_limits_used(rules_by_stage):
+    """Сумматоры по правилам"""
+    return {stage_id: {rule['rule_id']: 0 for rule in stage_rules}
+            for stage_id, stage_rules in rules_by_stage.items()}
+
+def validate_payments(json_project, transfer_list, key=None):
+    """
+    Сверяет переводы с бюджетом и правилами MCC.
+    key - ключ версии контракта для кэша правил (см. compile_contract).
+    Возвращает подробный результат проверки по этапам и ошибкам.
+    """
+    report = []
+    errors = []
+    compiled = compile_contract(json_project, key)
+    rules_by_stage = compiled.copy_rules_by_stage()
+    limits_used = empty_limits_used(rules_by_stage)
+    mcc_seen = set()
+
+    def transfers():
+        for trn in transfer_list:
+            if trn.get("payer_type") == "legal_entity":
+                mcc_seen.add(str(trn["mcc"]))
+            yield trn
+
+    for kind, message in iter_validation(json_project, transfers(), limits_used, compiled):
+        (report if kind == "report" else errors).append(message)
     
     # Итоговый отчет
     return {
         "report": report,
         "errors": errors,
         "limits_used": limits_used,
-        "rules_by_stage": rules_by_stage
+        "rules_by_stage": rules_by_stage,
+        "unknown_mcc": mcc_registry().unknown(sorted(mcc_seen))   # MCC, которых нет в справочнике
     }
 
 def handlePayments(grant, report):
-    updated_grant = grant
-    
-    total_spent = sum(sum(rules.values()) for rules in report["limits_used"].values())
-    updated_grant['grant_metadata']['total_budget'] -= total_spent
-
-
-    for stage_id, rules in report["limits_used"].items():       # Обрабатываем каждый этап и правило
-        for stage in updated_grant['stages']:                   # Находим соответствующий этап в гранте
-            if stage['stage_id'] == stage_id:                   # Обрабатываем каждое правило на этом этапе
-                for rule_id, used_amount in rules.items():      # Находим правило и вычитаем использованную сумму из его лимита
-                    for rule in stage['spending_rules']:
-                        if rule['rule_id'] == rule_id:          # Вычитаем использованную сумму из лимита правила
-                            if 'limit' in rule:
-                                rule['limit'] -= used_amount
-                            rule['spent'] = rule.get('spent', 0) + used_amount
-                            break
-                break
-    
-    return updated_grant
\ No newline at end of file
+    """
+    Учитывает траты из отчёта validate_payments в состоянии гранта.
+    Исходные лимиты и бюджет не изменяются, траты копятся в validation_state.
+    """
+    state = ValidationState.from_contract(grant)
+
+    for stage_id, rules in report["limits_used"].items():
+        for rule_id, used_amount in rules.items():
+            if (stage_id, rule_id) in state.spent:
+                state.spent[(stage_id, rule_id)] += used_amount
+
+    return state.store(grant)
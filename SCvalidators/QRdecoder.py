@@ -0,0 +1,204 @@
+import io
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image, ImageOps, ImageFilter, ImageSequence
+from pyzbar.pyzbar import decode, ZBarSymbol
+
+# ========================
+# Распознавание QR-кодов с лестницей предобработки
+# ========================
+#
+# Сначала быстрый проход по картинке как есть; если QR не нашёлся - по очереди
+# более дорогие варианты: серый с автоконтрастом, уменьшение больших фото, белое поле,
+# бинаризация, подавление шума, увеличение, локальный порог, поворот. Останавливаемся на первой
+# ступени, где нашёлся хотя бы один QR, и отдаём все найденные на ней коды.
+
+MAX_SIDE = 1600           # больше - zbar работает медленно и хуже находит мелкий QR на фото
+BATCH_MIN = 4             # меньше картинок - без пула процессов, запуск пула дороже
+SYMBOLS = [ZBarSymbol.QRCODE]
+
+qr_metrics = {"images": 0, "decoded": 0, "symbols": 0, "ms": 0.0, "by_step": {}}
+_metrics_lock = threading.Lock()
+
+
+def _otsu(gray):
+    hist = np.bincount(np.asarray(gray).ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * levels)
+    between = (mean[-1] * weight - mean * weight[-1]) ** 2 / np.maximum(weight * (weight[-1] - weight), 1)
+    return int(np.argmax(between))
+
+
+def _fit(img, side):
+    scale = side / max(img.size)
+    return img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+
+
+# Ступени: (имя, функция от серой картинки с автоконтрастом). Порядок - от дешёвых к дорогим.
+def _gray(img):
+    return img
+
+def _downscale(img):
+    return _fit(img, MAX_SIDE) if max(img.size) > MAX_SIDE else None
+
+def _upscale(img):
+    # x2 с медианой: на мелком, наклонённом или пережатом JPEG модули QR становятся различимы
+    if max(img.size) >= MAX_SIDE:
+        return None
+    return img.resize((img.width * 2, img.height * 2), Image.LANCZOS).filter(ImageFilter.MedianFilter(3))
+
+def _threshold(img):
+    img = _downscale(img) or img
+    return img.point(lambda v, t=_otsu(img): 255 if v > t else 0)
+
+def _denoise(img):
+    # медиана убирает точечный шум, нерезкая маска возвращает края модулей
+    img = _downscale(img) or img
+    return img.filter(ImageFilter.MedianFilter(3)).filter(ImageFilter.UnsharpMask(3, 300, 0))
+
+def _adaptive(img):
+    # локальный порог: тень и неравномерный свет, при которых общий порог Оцу съедает часть QR
+    img = (_downscale(img) or img).filter(ImageFilter.MedianFilter(3))
+    pixels = np.asarray(img, dtype=np.int16)
+    local = np.asarray(img.filter(ImageFilter.BoxBlur(15)), dtype=np.int16)
+    return Image.fromarray(np.where(pixels > local - 8, 255, 0).astype(np.uint8))
+
+def _rotate(img):
+    img = _downscale(img) or img
+    return img.rotate(45, expand=True, fillcolor=255)
+
+def _quiet_zone(img):
+    # QR вплотную к краю кадра zbar часто не видит - добавляем белое поле
+    return ImageOps.expand(img, border=max(img.size) // 8, fill=255)
+
+LADDER = [
+    ("gray", _gray),
+    ("downscale", _downscale),
+    ("quiet_zone", _quiet_zone),
+    ("threshold", _threshold),
+    ("denoise", _denoise),
+    ("upscale", _upscale),
+    ("adaptive", _adaptive),
+    ("rotate", _rotate),
+]
+
+
+def _open(image):
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(image))
+    if hasattr(image, "getvalue"):
+        return Image.open(io.BytesIO(image.getvalue()))
+    return Image.open(image)
+
+
+def _symbols(img):
+    texts = []
+    for symbol in decode(img, symbols=SYMBOLS):
+        text = symbol.data.decode("utf-8", errors="replace")
+        if text not in texts:
+            texts.append(text)
+    return texts
+
+
+def _record(result):
+    with _metrics_lock:
+        qr_metrics["images"] += 1
+        qr_metrics["decoded"] += bool(result["symbols"])
+        qr_metrics["symbols"] += len(result["symbols"])
+        qr_metrics["ms"] += result["ms"]
+        step = result["step"] or "failed"
+        qr_metrics["by_step"][step] = qr_metrics["by_step"].get(step, 0) + 1
+
+
+def decode_frame(img, max_steps=None):
+    """
+    QR-коды одного кадра PIL.
+    Возвращает {"symbols": [тексты], "step": ступень или None, "attempts": сколько проходов zbar}.
+    """
+    attempts = 1
+    symbols = _symbols(img)
+    if symbols:
+        return {"symbols": symbols, "step": "raw", "attempts": attempts}
+
+    gray = ImageOps.autocontrast(ImageOps.exif_transpose(img).convert("L"))
+    for name, step in LADDER[:max_steps]:
+        variant = step(gray)
+        if variant is None:
+            continue
+        attempts += 1
+        symbols = _symbols(variant)
+        if symbols:
+            return {"symbols": symbols, "step": name, "attempts": attempts}
+    return {"symbols": [], "step": None, "attempts": attempts}
+
+
+def decode_qr(image, max_steps=None):
+    """
+    Все QR-коды картинки (file-like, bytes или PIL.Image); многостраничные файлы (TIFF, GIF) -
+    по всем страницам. Результат: {"symbols", "step", "attempts", "pages", "ms"}; ошибок не бросает.
+    """
+    started = time.perf_counter()
+    result = {"symbols": [], "step": None, "attempts": 0, "pages": 0}
+    try:
+        img = _open(image)
+        if img.format == "JPEG" and max(img.size) > MAX_SIDE:
+            # фото с телефона сразу декодируем в 1/2..1/8 размера - быстрее и для zbar не хуже
+            scale = MAX_SIDE / max(img.size)
+            img.draft("RGB", (int(img.width * scale), int(img.height * scale)))
+        for frame in ImageSequence.Iterator(img):
+            page = decode_frame(frame.copy(), max_steps)
+            result["pages"] += 1
+            result["attempts"] += page["attempts"]
+            result["symbols"] += [text for text in page["symbols"] if text not in result["symbols"]]
+            result["step"] = result["step"] or page["step"]
+    except Exception as e:
+        result["error"] = str(e)
+    result["ms"] = (time.perf_counter() - started) * 1000
+    _record(result)
+    return result
+
+
+def _read(image):
+    if isinstance(image, bytes):
+        return image
+    if isinstance(image, (bytearray, memoryview)):
+        return bytes(image)
+    if hasattr(image, "getvalue"):
+        return image.getvalue()
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            return f.read()
+    return image.read()
+
+
+def decode_batch(images, workers=None, max_steps=None):
+    """
+    QR-коды пачки картинок (file-like, bytes или пути) в пуле процессов;
+    порядок результатов - как у images. Маленькие пачки разбираются в текущем процессе.
+    """
+    blobs = [_read(image) for image in images]
+    if len(blobs) < BATCH_MIN or workers == 1:
+        return [decode_qr(blob, max_steps) for blob in blobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(decode_qr, blobs, [max_steps] * len(blobs)))
+    for result in results:
+        _record(result)  # метрики дочерних процессов переносим в текущий
+    return results
+
+
+def metrics_report():
+    """Доля распознанных картинок, среднее время и на какой ступени находился QR"""
+    with _metrics_lock:
+        images = qr_metrics["images"]
+        return {
+            "images": images,
+            "success_rate": qr_metrics["decoded"] / images if images else 0.0,
+            "ms_avg": qr_metrics["ms"] / images if images else 0.0,
+            "symbols": qr_metrics["symbols"],
+            "by_step": dict(qr_metrics["by_step"]),
+        }
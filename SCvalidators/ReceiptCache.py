@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from SCvalidators.CacheDir import cache_path
+
+# ========================
+# Постоянный кэш проверки чеков
+# ========================
+#
+# Два слоя в одном SQLite-файле:
+#   ocr      - хэш содержимого картинки -> поля, распознанные LLM;
+#   verdicts - фискальные признаки (fn, fd, fp, дата, сумма) -> ответ ФНС.
+# Положительный ответ ФНС хранится долго, отрицательный - недолго (чек мог ещё не дойти до ФНС).
+# Сбои на нашей стороне (нет cookie, сеть, 5xx, не-JSON) ответом ФНС не считаются и не кэшируются.
+# Перед SQLite стоит LRU в памяти процесса, повторная загрузка того же чека обходится без диска.
+# В receipt_uses записывается, в каких грантах чек уже принят, - повторное использование видно сразу.
+
+CACHE_PATH = os.environ.get("RECEIPT_CACHE", cache_path("receipts.db"))
+
+OCR_TTL = 90 * 24 * 3600          # распознанные поля картинки не меняются
+POSITIVE_TTL = 30 * 24 * 3600     # чек найден в ФНС
+NEGATIVE_TTL = 10 * 60            # чек не найден - скоро спросим снова
+MAX_ROWS = 100_000                # на слой; лишнее вытесняется по давности использования
+MEMORY_ENTRIES = 4096
+PRUNE_EVERY = 500                 # чистка устаревших/лишних строк раз в столько записей
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ocr_used ON ocr (used);
+CREATE TABLE IF NOT EXISTS verdicts (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS verdicts_used ON verdicts (used);
+CREATE TABLE IF NOT EXISTS receipt_uses (
+    key TEXT NOT NULL,
+    grant_name TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (key, grant_name)
+);
+"""
+
+LAYERS = ("ocr", "verdicts")
+
+
+def image_key(image):
+    """Хэш содержимого картинки (file-like с getvalue/read или bytes)"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        data = bytes(image)
+    elif hasattr(image, "getvalue"):
+        data = image.getvalue()
+    else:
+        pos = image.tell()
+        data = image.read()
+        image.seek(pos)
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def _norm_summ(value):
+    text = str(value).replace("\xa0", "").replace(" ", "").replace(",", ".")
+    try:
+        return f"{float(text):.2f}"
+    except ValueError:
+        return text
+
+def fiscal_key(data):
+    """
+    Ключ чека по фискальным признакам или None, если признаков нет
+    (LLM отдаёт нули, когда не нашла их на фото).
+    """
+    try:
+        parts = [str(data[field]).strip() for field in ("fn", "fd", "fp", "date")] + [_norm_summ(data["summ"])]
+    except (KeyError, TypeError):
+        return None
+    if not any(part.strip("0.,") for part in parts[:3]):
+        return None
+    return "|".join(parts)
+
+
+def is_fns_answer(details):
+    """Ответ ФНС по существу (HTTP 200 с полем success), а не сбой cookie, сети или сервера"""
+    return isinstance(details, dict) and "success" in details
+
+
+class ReceiptCache:
+    def __init__(self, path=CACHE_PATH, memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.stats = {f"{layer}_{kind}": 0 for layer in LAYERS for kind in ("memory", "disk", "miss")}
+        self._local = threading.local()
+        self._memory = OrderedDict()   # (слой, ключ) -> (expires, значение)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, layer, key, expires, value):
+        with self._lock:
+            self._memory[(layer, key)] = (expires, value)
+            self._memory.move_to_end((layer, key))
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, layer, key):
+        """Значение из слоя или None (нет или устарело)"""
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get((layer, key))
+            if cached is not None and cached[0] > now:
+                self._memory.move_to_end((layer, key))
+                self.stats[f"{layer}_memory"] += 1
+                return cached[1]
+
+        conn = self._connect()
+        row = conn.execute(f"SELECT value, expires FROM {layer} WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= now:
+            with self._lock:
+                self.stats[f"{layer}_miss"] += 1
+            return None
+        with conn:
+            conn.execute(f"UPDATE {layer} SET used = ? WHERE key = ?", (now, key))
+        value = json.loads(row[0])
+        self._remember(layer, key, row[1], value)
+        with self._lock:
+            self.stats[f"{layer}_disk"] += 1
+        return value
+
+    def put(self, layer, key, value, ttl):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(f"INSERT OR REPLACE INTO {layer} (key, value, expires, used) VALUES (?, ?, ?, ?)",
+                         (key, json.dumps(value, ensure_ascii=False), now + ttl, now))
+        self._remember(layer, key, now + ttl, value)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self, max_rows=MAX_ROWS):
+        """Удаляет устаревшие записи и самые давно использованные сверх max_rows"""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            for layer in LAYERS:
+                conn.execute(f"DELETE FROM {layer} WHERE expires <= ?", (now,))
+                conn.execute(f"DELETE FROM {layer} WHERE key IN "
+                             f"(SELECT key FROM {layer} ORDER BY used DESC LIMIT -1 OFFSET ?)", (max_rows,))
+
+    # --- слои ---
+
+    def get_fields(self, image):
+        return self.get("ocr", image_key(image))
+
+    def put_fields(self, image, fields):
+        """Запоминает распознанные поля; ответ «не найдено» (нули вместо признаков) не кэшируется - чек распознается снова"""
+        if fiscal_key(fields):
+            self.put("ocr", image_key(image), fields, OCR_TTL)
+
+    def get_verdict(self, data):
+        """(ok, details) из кэша или None"""
+        key = fiscal_key(data)
+        value = self.get("verdicts", key) if key else None
+        return tuple(value) if value is not None else None
+
+    def put_verdict(self, data, ok, details):
+        """Запоминает ответ ФНС; ошибки запроса не кэшируются - следующая проверка спросит ФНС снова"""
+        key = fiscal_key(data)
+        if key and is_fns_answer(details):
+            self.put("verdicts", key, [ok, details], POSITIVE_TTL if ok else NEGATIVE_TTL)
+
+    def mark_used(self, data, grant_name):
+        """Отмечает чек за грантом; возвращает другие гранты, где этот чек уже принят"""
+        key = fiscal_key(data)
+        if not key:
+            return []
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO receipt_uses (key, grant_name, first_seen) VALUES (?, ?, ?)",
+                         (key, grant_name, time.time()))
+            rows = conn.execute("SELECT grant_name FROM receipt_uses WHERE key = ? AND grant_name != ? "
+                                "ORDER BY first_seen", (key, grant_name)).fetchall()
+        return [row[0] for row in rows]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def receipt_cache():
+    """Общий на процесс кэш чеков"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReceiptCache()
+        return _cache
@@ -0,0 +1,136 @@
+import io
+import os
+import time
+import numpy as np
+from PIL import Image, ImageOps
+
+# ========================
+# Подготовка фото чека перед распознаванием
+# ========================
+#
+# Фото с телефона весит мегабайты, а LLM для чтения чека хватает серой картинки
+# около мегапикселя. Порядок: поворот по EXIF -> обрезка по светлому листу чека ->
+# оттенки серого -> уменьшение до бюджета пикселей -> JPEG не больше MAX_BYTES.
+
+PIXEL_BUDGET = int(os.environ.get("RECEIPT_PIXEL_BUDGET", 1_500_000))
+MAX_BYTES = int(os.environ.get("RECEIPT_MAX_BYTES", 300_000))
+JPEG_QUALITIES = (85, 75, 65, 55, 45)
+
+EXIF_ORIENTATION = 0x0112
+PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png"}
+
+CROP_PROBE = 256        # сторона уменьшенной копии, по которой ищется чек
+CROP_MARGIN = 0.02      # запас вокруг найденного чека (доля стороны)
+CROP_MIN_SHARE = 0.15   # меньше этой доли кадра - скорее ошибка, не обрезаем
+
+
+def _read_bytes(image):
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    if hasattr(image, "getvalue"):
+        return image.getvalue()
+    pos = image.tell()
+    data = image.read()
+    image.seek(pos)
+    return data
+
+
+def _otsu(values):
+    """Порог Оцу для массива яркостей 0..255"""
+    hist = np.bincount(values.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * levels)
+    total = weight[-1]
+    between = (mean[-1] * weight - mean * total) ** 2 / np.maximum(weight * (total - weight), 1)
+    return int(np.argmax(between))
+
+
+def receipt_box(gray):
+    """
+    Рамка светлого листа чека на фоне (left, top, right, bottom) или None, если обрезать не нужно.
+    Считается по уменьшенной копии: строки и столбцы, где светлых пикселей больше трети.
+    """
+    probe = gray.copy()
+    probe.thumbnail((CROP_PROBE, CROP_PROBE))
+    pixels = np.asarray(probe)
+    bright = pixels > _otsu(pixels)
+    rows = np.flatnonzero(bright.mean(axis=1) > 0.33)
+    cols = np.flatnonzero(bright.mean(axis=0) > 0.33)
+    if not len(rows) or not len(cols):
+        return None
+
+    h, w = pixels.shape
+    top, bottom = rows[0] / h, (rows[-1] + 1) / h
+    left, right = cols[0] / w, (cols[-1] + 1) / w
+    share = (bottom - top) * (right - left)
+    if share < CROP_MIN_SHARE or share > 0.9:
+        return None
+    W, H = gray.size
+    return (max(0, int((left - CROP_MARGIN) * W)), max(0, int((top - CROP_MARGIN) * H)),
+            min(W, int((right + CROP_MARGIN) * W)), min(H, int((bottom + CROP_MARGIN) * H)))
+
+
+def _encode(img, max_bytes):
+    """JPEG не больше max_bytes: сначала снижается качество, потом размер"""
+    while True:
+        for quality in JPEG_QUALITIES:
+            out = io.BytesIO()
+            img.save(out, "JPEG", quality=quality, optimize=True)
+            if out.tell() <= max_bytes:
+                return out.getvalue(), quality, img.size
+        if min(img.size) < 200:
+            return out.getvalue(), quality, img.size
+        img = img.resize((int(img.width * 0.75), int(img.height * 0.75)), Image.LANCZOS)
+
+
+def preprocess_receipt(image, pixel_budget=PIXEL_BUDGET, max_bytes=MAX_BYTES, crop=True, grayscale=True):
+    """
+    Готовит фото чека к отправке в LLM.
+    Возвращает (байты картинки, статистика): размеры и вес до/после, качество JPEG, время в мс,
+    mime - тип картинки (JPEG, либо исходный формат, если перекодирование не уменьшило файл).
+    """
+    started = time.perf_counter()
+    data = _read_bytes(image)
+    img = Image.open(io.BytesIO(data))
+    before_size = img.size
+    upright = img.getexif().get(EXIF_ORIENTATION, 1) == 1
+    original_format = img.format
+
+    # JPEG можно сразу декодировать в 1/2..1/8 размера - заметно быстрее полного декодирования
+    scale = (pixel_budget / (img.width * img.height)) ** 0.5
+    if scale < 1 and img.format == "JPEG":
+        img.draft("L" if grayscale else "RGB", (int(img.width * scale), int(img.height * scale)))
+
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("L") if grayscale else img.convert("RGB")
+
+    cropped = False
+    if crop:
+        box = receipt_box(img if grayscale else img.convert("L"))
+        if box:
+            img = img.crop(box)
+            cropped = True
+
+    if img.width * img.height > pixel_budget:
+        scale = (pixel_budget / (img.width * img.height)) ** 0.5
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+
+    jpeg, quality, size = _encode(img, max_bytes)
+    # Маленькая ровная картинка после перекодирования бывает только тяжелее - отправляем как есть
+    mime = "image/jpeg"
+    passthrough = original_format in PASSTHROUGH_FORMATS and upright and len(data) <= min(len(jpeg), max_bytes)
+    if passthrough:
+        jpeg, size, cropped, mime = data, before_size, False, PASSTHROUGH_FORMATS[original_format]
+    stats = {
+        "before_bytes": len(data),
+        "after_bytes": len(jpeg),
+        "before_size": before_size,
+        "after_size": size,
+        "cropped": cropped,
+        "passthrough": passthrough,
+        "mime": mime,
+        "quality": quality,
+        "ms": (time.perf_counter() - started) * 1000,
+    }
+    return jpeg, stats
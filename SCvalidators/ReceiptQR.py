@@ -0,0 +1,73 @@
+import time
+import threading
+from datetime import datetime
+from urllib.parse import parse_qs
+from SCvalidators.QRdecoder import decode_qr
+
+# ========================
+# Чек по QR-коду без LLM
+# ========================
+#
+# На кассовом чеке есть QR вида t=20231215T1945&s=2448.00&fn=...&i=...&fp=...&n=1 -
+# ровно те поля, которые иначе приходится читать модели. Если QR нашёлся и разобрался,
+# запрос к LLM не нужен.
+
+QR_FIELDS = ("t", "s", "fn", "i", "fp")
+# Формат t выбирается по длине: strptime прочитал бы 20231215T1945 как 19:04:05
+QR_TIME_FORMATS = {13: "%Y%m%dT%H%M", 15: "%Y%m%dT%H%M%S"}
+
+qr_stats = {"attempts": 0, "hits": 0, "qr_ms": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _qr_datetime(value):
+    fmt = QR_TIME_FORMATS.get(len(value))
+    try:
+        return datetime.strptime(value, fmt) if fmt else None
+    except ValueError:
+        return None
+
+
+def parse_receipt_qr(text):
+    """
+    Поля запроса к ФНС (как у extract_receipt_data_from_image) из текста QR чека
+    или None, если это не QR кассового чека.
+    """
+    params = {key: values[0].strip() for key, values in parse_qs(text.strip(), keep_blank_values=True).items()}
+    if not all(params.get(field) for field in QR_FIELDS):
+        return None
+    moment = _qr_datetime(params["t"])
+    if moment is None:
+        return None
+    try:
+        summ = float(params["s"])
+    except ValueError:
+        return None
+    if not (params["fn"].isdigit() and params["i"].isdigit() and params["fp"].isdigit()):
+        return None
+
+    return {
+        "type": "request",
+        "fp": params["fp"],
+        "fn": params["fn"],
+        "fd": params["i"],
+        "date": moment.strftime("%d.%m.%Y"),
+        "time": moment.strftime("%H:%M"),
+        "operationtype": params.get("n") or "1",
+        "summ": f"{summ:.2f}".replace(".", ","),
+    }
+
+
+def receipt_from_qr(image):
+    """Поля чека из его QR-кода или None (QR не найден или не от кассового чека)"""
+    started = time.perf_counter()
+    data = None
+    for text in decode_qr(image)["symbols"]:
+        data = parse_receipt_qr(text)
+        if data:
+            break
+    with _stats_lock:
+        qr_stats["attempts"] += 1
+        qr_stats["hits"] += bool(data)
+        qr_stats["qr_ms"] += (time.perf_counter() - started) * 1000
+    return data
@@ -0,0 +1,170 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from SCvalidators.HTTPpool import RateLimiter
+from SCvalidators.BillValidator import extract_receipt_data_from_image, fetch_receipt
+from SCvalidators.ReceiptQR import receipt_from_qr
+from SCvalidators.ReceiptCache import receipt_cache, fiscal_key
+
+# ========================
+# Пакетная проверка чеков: распознавание -> ФНС
+# ========================
+#
+# Два этапа работают одновременно и связаны ограниченными очередями:
+# пока одни чеки распознаются (по QR-коду или, если его нет, LLM), уже распознанные проверяются в ФНС.
+# Лимитеры общие на процесс, так что параллельные сеансы вместе не превышают лимиты сервисов.
+# Повторно загруженные чеки берутся из ReceiptCache и не тратят ни лимитов, ни запросов.
+
+OCR_WORKERS = 4
+FNS_WORKERS = 4
+QUEUE_SIZE = 8
+OCR_RPM = int(os.environ.get("RECEIPT_OCR_RPM", 40))
+FNS_RPM = int(os.environ.get("RECEIPT_FNS_RPM", 60))
+
+ocr_limiter = RateLimiter(OCR_RPM)
+fns_limiter = RateLimiter(FNS_RPM)
+
+_DONE = object()
+
+
+def _result(index, image, started, ok=False, stage="ocr", data=None, details=None, error=None,
+            cached=(), reused_in=()):
+    return {
+        "index": index,
+        "name": getattr(image, "name", str(index)),
+        "ok": ok,
+        "stage": stage,        # на каком этапе закончилась проверка: ocr или fns
+        "data": data,          # распознанные поля чека
+        "details": details,    # ответ ФНС
+        "error": error,
+        "cached": list(cached),        # этапы, ответ которых взят из кэша
+        "reused_in": list(reused_in),  # другие гранты, где этот чек уже принят
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+async def verify_receipts(images, ocr_workers=OCR_WORKERS, fns_workers=FNS_WORKERS, queue_size=QUEUE_SIZE,
+                          ocr=extract_receipt_data_from_image, verify=fetch_receipt, fast=receipt_from_qr,
+                          ocr_rate=None, fns_rate=None, cache=None, grant=None):
+    """
+    Проверяет чеки images (список) и отдаёт результаты по мере готовности (не в порядке загрузки):
+        async for result in verify_receipts(files): ...
+    ocr и verify - синхронные функции этапов (по умолчанию LLM и ФНС), выполняются в потоках;
+    fast - локальное распознавание до ocr (QR-код чека), не тратит лимит LLM; None - не использовать.
+    cache - ReceiptCache (по умолчанию общий, False - без кэша); с grant принятые чеки
+    отмечаются за грантом, а в reused_in попадают другие гранты с тем же чеком.
+    """
+    if cache is None:
+        cache = receipt_cache()
+    ocr_rate = ocr_rate or ocr_limiter
+    fns_rate = fns_rate or fns_limiter
+    ocr_queue = asyncio.Queue(queue_size)
+    fns_queue = asyncio.Queue(queue_size)
+    results = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    # Свои потоки: пул по умолчанию на малом числе ядер урезал бы параллельность этапов
+    executor = ThreadPoolExecutor(max_workers=ocr_workers + fns_workers)
+
+    async def feed():
+        for index, image in enumerate(images):
+            await ocr_queue.put((index, image, time.perf_counter()))
+        for _ in range(ocr_workers):
+            await ocr_queue.put(_DONE)
+
+    async def recognize(image):
+        """
+        (поля чека, этапы из кэша, ошибка). Единственное место, где QR идёт раньше LLM:
+        лимит ocr_rate тратится, только если до модели действительно дошло.
+        """
+        data = cache.get_fields(image) if cache else None
+        if data:
+            return data, ("ocr",), None
+        if fast:
+            try:
+                data = await loop.run_in_executor(executor, fast, image)
+            except Exception:
+                data = None   # быстрый путь - только экономия, при его сбое чек распознаёт ocr
+        if not data:
+            await ocr_rate.acquire()
+            data = await loop.run_in_executor(executor, ocr, image)
+        if not data or not fiscal_key(data):
+            # нули вместо фискальных признаков - модель их не нашла, спрашивать ФНС не о чем
+            return None, (), "Не удалось распознать чек"
+        if cache:
+            cache.put_fields(image, data)
+        return data, (), None
+
+    async def ocr_worker():
+        while (item := await ocr_queue.get()) is not _DONE:
+            index, image, started = item
+            # любая ошибка этапа (QR, кэш, LLM) - результат с ошибкой, а не упавший обработчик
+            try:
+                data, cached, error = await recognize(image)
+            except Exception as e:
+                data, cached, error = None, (), str(e)
+            if data:
+                await fns_queue.put((index, image, started, data, cached))
+            else:
+                await results.put(_result(index, image, started, error=error))
+
+    async def fns_worker():
+        while (item := await fns_queue.get()) is not _DONE:
+            index, image, started, data, cached = item
+            try:
+                verdict = cache.get_verdict(data) if cache else None
+                if verdict:
+                    ok, details = verdict
+                    cached += ("fns",)
+                else:
+                    await fns_rate.acquire()
+                    ok, details = await loop.run_in_executor(executor, verify, data)
+                    if cache:
+                        cache.put_verdict(data, ok, details)
+                reused_in = cache.mark_used(data, grant) if cache and ok and grant else ()
+                result = _result(index, image, started, ok=ok, stage="fns", data=data, details=details,
+                                 cached=cached, reused_in=reused_in)
+            except Exception as e:
+                result = _result(index, image, started, stage="fns", data=data, error=str(e), cached=cached)
+            await results.put(result)
+
+    async def run():
+        await asyncio.gather(feed(), *(ocr_worker() for _ in range(ocr_workers)))
+        for _ in range(fns_workers):
+            await fns_queue.put(_DONE)
+
+    tasks = [asyncio.create_task(run())] + [asyncio.create_task(fns_worker()) for _ in range(fns_workers)]
+
+    async def next_result():
+        """Следующий результат; упавшая задача конвейера поднимает свою ошибку здесь, а не вешает ожидание"""
+        getter = asyncio.ensure_future(results.get())
+        alive = set(tasks)
+        try:
+            while True:
+                done, _ = await asyncio.wait([getter, *alive], return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    return getter.result()
+                for task in done:
+                    if task.exception() is not None:
+                        raise task.exception()
+                alive -= done
+                if not alive and results.empty():
+                    raise RuntimeError("Проверка чеков завершилась, не выдав всех результатов")
+        finally:
+            getter.cancel()
+
+    try:
+        for _ in range(len(images)):
+            yield await next_result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        executor.shutdown(wait=False)
+
+
+def verify_receipts_sync(images, **kwargs):
+    """Синхронная обёртка: список результатов в порядке загрузки"""
+    async def collect():
+        return [result async for result in verify_receipts(images, **kwargs)]
+    return sorted(asyncio.run(collect()), key=lambda result: result["index"])
@@ -1,43 +1,88 @@
 import json
-import csv
+import time
 from pathlib import Path
-from docx import Document
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from SCvalidators.HTTPpool import openai_client
+from SCvalidators.LLMgateway import llm_gateway
+from SCvalidators.MCCindex import load_mcc_index, smeta_categories
+from SCvalidators.MCCregistry import mcc_registry, contract_codes, MCC_CSV
+from SCvalidators.SmetaCache import smeta_cache, smeta_key
+from SCvalidators.JSONstream import IncrementalJSON, JSONStreamError
+from SCvalidators.SmetaSplit import split_smeta, merge_fragments, check_merged
+from SCvalidators.SmetaLayout import docx_lines, layout_contract, apply_classes
+from SCvalidators.SmetaCompact import COMPACT_SCHEMA, COMPACT_WATCH, expand_compact, expand_metadata, expand_stage
 from config import NVIDIA_API_SC
+from _presets import MODELS
+
+BASE_URL = "https://integrate.api.nvidia.com/v1"
+SMETA_MODELS = MODELS   # модели, между которыми parse_smeta выбирает самую быструю (см. LLMgateway)
+
+PROMPT_VERSION = 2      # менять при любой правке шаблона промпта - старые ответы в кэше станут недействительны
+MCC_TOP_K = 8           # кодов из справочника на каждую категорию сметы; 0 - весь справочник в промпт
+MCC_LINE_CHARS = 240    # описание кода в коротком списке обрезается - модели хватает начала
+
+# Подсказки модели; эти коды всегда попадают в промпт, даже если поиск их не нашёл
+MCC_HINTS = {
+    "Научное/медицинское оборудование": ["5047", "5094", "5122"],
+    "Компьютеры": ["5732", "5734", "5045"],
+    "Химические реагенты": ["5169", "5085", "5984"],
+    "Лабораторные услуги": ["8071", "8099"],
+    "Расходные материалы": ["5111", "5198", "5199"],
+    "Тестирование": ["8734"],
+}
+HINTED_CODES = [code for codes in MCC_HINTS.values() for code in codes]
+
+SPLIT_WORKERS = 4           # одновременных запросов при разборе по этапам
+METADATA_MAX_TOKENS = 1024
+STAGE_MAX_TOKENS = 4096
+CLASSIFY_MAX_TOKENS = 2048
+
+# Части ответа, о которых сообщается сразу, как только они пришли целиком
+STREAM_WATCH = [("grant_metadata",), ("stages", "*")]
 
 class SmetaParser:
     """Библиотека для парсинга DOCX смет в JSON с MCC кодами"""
 
-    def __init__(self, api_key=None, mcc_csv_path="SCValidators/examples/mcc_codes.csv", preset={"MODEL": "deepseek-ai/deepseek-v3.2", "TEMP":0.15, "TOP-P":0.7}):
+    def __init__(self, api_key=None, mcc_csv_path=MCC_CSV, preset={"MODEL": "deepseek-ai/deepseek-v3.2", "TEMP":0.15, "TOP-P":0.7}, mcc_top_k=MCC_TOP_K, compact=True,
+                 models=None):
         self.api_key = api_key or NVIDIA_API_SC
         self.mcc_csv_path = mcc_csv_path
         self.preset = preset
+        self.mcc_top_k = mcc_top_k
+        self.compact = compact      # модель отвечает по краткой схеме, полный контракт собирается локально
         
-        self.client = OpenAI(
-            base_url="https://integrate.api.nvidia.com/v1",
+        self.client = openai_client(
+            base_url=BASE_URL,
             api_key=self.api_key,
             timeout=300.0
         )
+        # с models запросы идут через шлюз: модель из пресета первая, остальные - запасные и для дублей
+        self.gateway = None
+        if models:
+            models = [preset["MODEL"]] + [model for model in models if model != preset["MODEL"]]
+            self.gateway = llm_gateway("smeta", f"{BASE_URL}/chat/completions", self.api_key, models, timeout=300.0)
+        self.last_model = None     # какая модель ответила последней
         
-        self.mcc_codes = self._load_mcc_codes()
-    
-    def _load_mcc_codes(self):
-        mcc_data = []
-        try:
-            with open(self.mcc_csv_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    mcc_data.append(f"{row['MCC']}: {row['Название']} - {row['Описание']}")
-        except FileNotFoundError:
-            print(f"Внимание: файл {self.mcc_csv_path} не найден")
-        return mcc_data
+        # справочник общий на процесс: CSV не перечитывается при каждом создании парсера
+        self.mcc_registry = mcc_registry(self.mcc_csv_path)
+        self.mcc_index = load_mcc_index(self.mcc_csv_path) if mcc_top_k else None
+        self.stream_stats = None   # замеры последнего потокового ответа
+        self.split_stats = None    # замеры и расхождения последнего разбора по этапам
+        self.layout_stats = None   # замеры последнего разбора по вёрстке (без генерации всего JSON)
     
     def _read_docx(self, file_path):
-        doc = Document(file_path)
-        return "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
+        return "\n".join(docx_lines(file_path))
     
+    def _mcc_lines(self, smeta_text):
+        """Строки справочника для промпта: подсказанные коды и ближайшие к категориям сметы"""
+        if self.mcc_index is None:
+            return self.mcc_registry.lines()
+        codes = self.mcc_index.shortlist(smeta_categories(smeta_text), self.mcc_top_k, hinted=HINTED_CODES)
+        return [self.mcc_index.line(code, MCC_LINE_CHARS) for code in codes]
+
     def _create_prompt(self, smeta_text):
-        mcc_list = "\n".join(self.mcc_codes)
+        mcc_list = "\n".join(self._mcc_lines(smeta_text))
+        hints = "\n".join(f"- {name} → {', '.join(codes)}" for name, codes in MCC_HINTS.items())
         
         return f"""Преобразуй смету в JSON. Для каждой категории юрлиц подбери ВСЕ релевантные MCC коды.
 
@@ -52,12 +97,7 @@ MCC КОДЫ:
 - Для individuals: ["строка1", "строка2"]
 
 ПОДБОР MCC:
-- Научное/медицинское оборудование → 5047, 5094, 5122
-- Компьютеры → 5732, 5734, 5045
-- Химические реагенты → 5169, 5085, 5984
-- Лабораторные услуги → 8071, 8099
-- Расходные материалы → 5111, 5198, 5199
-- Тестирование → 8734
+{hints}
 
 JSON:
 {{
@@ -102,6 +142,231 @@ JSON:
 
 Верни ТОЛЬКО JSON."""
     
+    def _compact_prompt(self, smeta_text):
+        mcc_list = "\n".join(self._mcc_lines(smeta_text))
+        hints = "\n".join(f"- {name} → {', '.join(codes)}" for name, codes in MCC_HINTS.items())
+
+        return f"""Преобразуй смету в JSON по краткой схеме. Для каждой категории юрлиц подбери ВСЕ релевантные MCC коды.
+
+СМЕТА:
+{smeta_text}
+
+MCC КОДЫ:
+{mcc_list}
+
+ПОДБОР MCC:
+{hints}
+
+СХЕМА:
+{COMPACT_SCHEMA}
+"i" - выплаты физическим лицам (категории - строки), "l" - закупки у юридических лиц (категории с MCC).
+Суммы - числа в рублях, даты - YYYY-MM-DD, этапы и правила - в порядке сметы.
+
+Верни ТОЛЬКО JSON одной строкой, без отступов и пояснений."""
+
+    def _metadata_prompt(self, head_text, stage_count):
+        return f"""Извлеки из общей части сметы метаданные гранта. Этапов в смете: {stage_count}.
+
+СМЕТА (общая часть):
+{head_text}
+
+JSON:
+{{
+  "name": "название",
+  "total_budget": число,
+  "currency": "RUB",
+  "start_date": "YYYY-MM-DD",
+  "end_date": "YYYY-MM-DD",
+  "duration_months": число,
+  "payment_system": "Мир"
+}}
+
+Верни ТОЛЬКО JSON."""
+
+    def _stage_prompt(self, stage_id, stage_text):
+        mcc_list = "\n".join(self._mcc_lines(stage_text))
+        hints = "\n".join(f"- {name} → {', '.join(codes)}" for name, codes in MCC_HINTS.items())
+
+        return f"""Преобразуй раздел сметы (этап {stage_id}) в JSON. Для каждой категории юрлиц подбери ВСЕ релевантные MCC коды.
+
+РАЗДЕЛ СМЕТЫ:
+{stage_text}
+
+MCC КОДЫ:
+{mcc_list}
+
+СТРУКТУРА allowed_categories:
+- Для legal_entities: [{{"category": "название", "mcc_codes": ["код1", "код2"]}}]
+- Для individuals: ["строка1", "строка2"]
+
+ПОДБОР MCC:
+{hints}
+
+JSON:
+{{
+  "stage_id": {stage_id},
+  "stage_name": "название",
+  "start_date": "YYYY-MM-DD",
+  "end_date": "YYYY-MM-DD",
+  "duration_months": число,
+  "stage_budget": число,
+  "status": "planned",
+  "spending_rules": [
+    {{
+      "rule_id": "id",
+      "rule_type": "individuals" или "legal_entities",
+      "rule_name": "название",
+      "limit": число,
+      "allowed_categories": [...],
+      "transactions": []
+    }}
+  ]
+}}
+
+Верни ТОЛЬКО JSON."""
+
+    def _fragment(self, prompt, max_tokens):
+        """(ответ, JSON или None) одного запроса; неудачный ответ запрашивается ещё раз"""
+        for _ in range(2):
+            response = self._text(prompt, max_tokens)
+            result = self._extract_json(response)
+            if result:
+                return response, result
+        return response, None
+
+    def _parse_split(self, smeta_text, on_progress=None, workers=SPLIT_WORKERS):
+        """
+        Смета по этапам: метаданные гранта отдельным коротким запросом, этапы - параллельно
+        (не больше workers запросов сразу), затем сборка и сверка. Возвращает (ответы, JSON или None);
+        замеры и расхождения - в self.split_stats. Без разделов этапов - обычный разбор целиком.
+        """
+        head, sections = split_smeta(smeta_text)
+        if len(sections) < 2:
+            return self._parse_whole(smeta_text, on_progress)
+
+        started = time.perf_counter()
+        stats = {"stages": len(sections), "metadata_ms": None, "stage_ms": {}, "wall_ms": None, "issues": []}
+        self.split_stats = stats
+        responses, stages, failed = [], [], []
+
+        def run(stage_id, prompt, max_tokens):
+            begin = time.perf_counter()
+            response, result = self._fragment(prompt, max_tokens)
+            return stage_id, response, result, (time.perf_counter() - begin) * 1000
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run, None, self._metadata_prompt(head, len(sections)), METADATA_MAX_TOKENS)]
+            futures += [pool.submit(run, number, self._stage_prompt(number, text), STAGE_MAX_TOKENS)
+                        for number, text in sections]
+            metadata = None
+            for future in as_completed(futures):
+                stage_id, response, result, ms = future.result()
+                responses.append(response)
+                if stage_id is None:
+                    stats["metadata_ms"] = ms
+                    metadata = result
+                    event = "metadata"
+                else:
+                    stats["stage_ms"][stage_id] = ms
+                    if result is None:
+                        failed.append(stage_id)
+                        continue
+                    result["stage_id"] = stage_id   # номер этапа берём из заголовка раздела, не у модели
+                    stages.append(result)
+                    event = "stage"
+                if on_progress and result:
+                    on_progress(event, result)
+        stats["wall_ms"] = (time.perf_counter() - started) * 1000
+
+        if metadata is None or failed:
+            stats["issues"].append("Не разобраны: " + ", ".join(
+                (["метаданные"] if metadata is None else []) + [f"этап {stage_id}" for stage_id in sorted(failed)]))
+            return "\n\n".join(responses), None
+        result = merge_fragments(metadata, stages)
+        stats["issues"] = check_merged(result, [number for number, _ in sections])
+        return "\n\n".join(responses), result
+
+    def _classify_prompt(self, rules, categories):
+        """rules - [(rule_id, название)] с неясным типом, categories - категории, которым нужны MCC"""
+        mcc_list = "\n".join(self._mcc_lines("\n".join(categories)))
+        hints = "\n".join(f"- {name} → {', '.join(codes)}" for name, codes in MCC_HINTS.items())
+        rule_list = "\n".join(f"{rule_id}: {name}" for rule_id, name in rules) or "(нет)"
+        category_list = "\n".join(f"{number}. {category}" for number, category in enumerate(categories, 1)) or "(нет)"
+
+        return f"""Классифицируй статьи сметы гранта.
+1) Для каждого правила определи, кому идут выплаты: "individuals" (физлица) или "legal_entities" (юрлица).
+2) Для каждой категории юрлиц подбери ВСЕ релевантные MCC коды.
+
+ПРАВИЛА:
+{rule_list}
+
+КАТЕГОРИИ:
+{category_list}
+
+MCC КОДЫ:
+{mcc_list}
+
+ПОДБОР MCC:
+{hints}
+
+JSON (ключи categories - номера категорий):
+{{"rule_types": {{"id правила": "individuals" или "legal_entities"}}, "categories": {{"1": ["код1", "код2"]}}}}
+
+Верни ТОЛЬКО JSON."""
+
+    def _parse_layout(self, contract):
+        """
+        Смета типовой вёрстки: этапы, лимиты и даты уже разобраны из текста (layout_contract),
+        модель только определяет неясные типы правил и MCC категорий юрлиц - короткий ответ вместо
+        всего JSON. Если всё ясно из названий (одни физлица), модель не вызывается вовсе.
+        Возвращает (ответ модели, JSON или None); замеры - в self.layout_stats.
+        """
+        started = time.perf_counter()
+        stats = {"rules": 0, "categories": 0, "classify_ms": None, "total_ms": None, "issues": check_merged(contract)}
+        self.layout_stats = stats
+
+        rules, categories = [], []
+        for stage in contract["stages"]:
+            for rule in stage["spending_rules"]:
+                stats["rules"] += 1
+                if rule["rule_type"] is None:
+                    rules.append((rule["rule_id"], rule["rule_name"]))
+                if rule["rule_type"] != "individuals":
+                    categories += [category for category in rule["allowed_categories"] if category not in categories]
+        stats["categories"] = len(categories)
+
+        response, types, codes = "", {}, {}
+        if rules or categories:
+            begin = time.perf_counter()
+            response, answer = self._fragment(self._classify_prompt(rules, categories), CLASSIFY_MAX_TOKENS)
+            stats["classify_ms"] = (time.perf_counter() - begin) * 1000
+            if answer is None:
+                stats["total_ms"] = (time.perf_counter() - started) * 1000
+                return response, None
+            types = answer.get("rule_types") or {}
+            numbered = answer.get("categories") or {}
+            codes = {category: numbered.get(str(number), []) for number, category in enumerate(categories, 1)}
+
+        missing = apply_classes(contract, types, codes)
+        stats["total_ms"] = (time.perf_counter() - started) * 1000
+        if missing:
+            stats["issues"].append("Модель не заполнила: " + ", ".join(missing))
+            return response, None
+        return response, contract
+
+    def _parse_whole(self, smeta_text, on_progress=None, stream=False):
+        prompt = self._compact_prompt(smeta_text) if self.compact else self._create_prompt(smeta_text)
+        if stream or on_progress:
+            return self._complete_streaming(prompt, on_progress, self.compact)
+        response = self._text(prompt)
+        result = self._extract_json(response)
+        if result and self.compact:
+            try:
+                result = expand_compact(result)
+            except ValueError:
+                result = None
+        return response, result
+
     def _extract_json(self, text):
         start = text.find('{')
         end = text.rfind('}') + 1
@@ -112,7 +377,91 @@ JSON:
                 return None
         return None
     
-    def parse(self, docx_path, verbose=True, log=False):
+    def unknown_mcc(self, result):
+        """MCC из ответа модели, которых нет в справочнике (выдуманные или с опечаткой)"""
+        return self.mcc_registry.unknown(contract_codes(result))
+
+    def cache_key(self, smeta_text, split=False, layout=False):
+        """
+        Ключ кэша: текст сметы, способ разбора, модель и её параметры, версия промпта и справочника MCC.
+        Через шлюз ответить может любая модель задачи, поэтому в ключе весь их список.
+        """
+        mode = ("layout",) if layout else ("split",) if split else ("compact",) if self.compact else ()
+        models = ("models",) + tuple(self.gateway.models) if self.gateway else ()
+        extra = (self.mcc_top_k, self.mcc_registry.source) + mode + models
+        return smeta_key(smeta_text, self.preset, PROMPT_VERSION, extra=extra)
+
+    def _complete(self, prompt, stream=False, max_tokens=8192, model=None):
+        return self.client.chat.completions.create(
+            model=model or self.preset["MODEL"],
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.preset["TEMP"],
+            top_p=self.preset["TOP-P"],
+            max_tokens=max_tokens,
+            stream=stream
+        )
+
+    def _text(self, prompt, max_tokens=8192):
+        """
+        Текст ответа модели: напрямую или через шлюз (быстрейшая модель, запасная, дубль).
+        Ошибка запроса поднимается, как и у клиента OpenAI: если не ответила ни одна модель - GatewayError.
+        """
+        if self.gateway is None:
+            self.last_model = self.preset["MODEL"]
+            return self._complete(prompt, max_tokens=max_tokens).choices[0].message.content
+        reply = self.gateway.complete([{"role": "user", "content": prompt}], temperature=self.preset["TEMP"],
+                                      top_p=self.preset["TOP-P"], max_tokens=max_tokens)
+        self.last_model = reply["model"]
+        return reply["content"]
+
+    def _complete_streaming(self, prompt, on_progress=None, compact=False):
+        """
+        Потоковый ответ модели с разбором JSON на лету: о метаданных и каждом этапе сообщается
+        в on_progress(событие, данные), как только они пришли; если ответ перестал быть JSON,
+        поток обрывается сразу. Возвращает (текст ответа, JSON или None); замеры - в self.stream_stats.
+        compact - ответ по краткой схеме: этапы и итог разворачиваются в полный формат.
+        """
+        started = time.perf_counter()
+        stats = {"first_token_ms": None, "first_stage_ms": None, "total_ms": None, "chars": 0, "stages": 0, "aborted": None}
+        self.stream_stats = stats
+        parser = IncrementalJSON(watch=COMPACT_WATCH if compact else STREAM_WATCH)
+        # поток шлюз не дублирует, но модель выбирает он - самую быструю здоровую
+        self.last_model = self.gateway.route()[0] if self.gateway else self.preset["MODEL"]
+        response = self._complete(prompt, stream=True, model=self.last_model)
+        result = None
+        try:
+            for chunk in response:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if not text:
+                    continue
+                if stats["first_token_ms"] is None:
+                    stats["first_token_ms"] = (time.perf_counter() - started) * 1000
+                stats["chars"] += len(text)
+                for path, value in parser.feed(text):
+                    event = "stage" if len(path) == 2 else "metadata"
+                    if compact:
+                        value = expand_stage(value) if event == "stage" else expand_metadata(value)
+                    if event == "stage":
+                        stats["stages"] += 1
+                        if stats["first_stage_ms"] is None:
+                            stats["first_stage_ms"] = (time.perf_counter() - started) * 1000
+                    if on_progress:
+                        on_progress(event, value)
+                if parser.done:
+                    break   # хвост после JSON не нужен
+            if parser.done:
+                result = expand_compact(parser.result()) if compact else parser.result()
+        except (JSONStreamError, ValueError) as e:   # ValueError - этап не по краткой схеме
+            stats["aborted"] = str(e)
+        finally:
+            response.close()
+            stats["total_ms"] = (time.perf_counter() - started) * 1000
+            if self.gateway:
+                self.gateway.record(self.last_model, stats["total_ms"], result is not None)
+        return parser.text, result
+
+    def parse(self, docx_path, verbose=True, log=False, use_cache=True, stream=False, on_progress=None, split=False,
+              layout=True):
         """
         Парсит DOCX смету в JSON
         
@@ -120,6 +469,11 @@ JSON:
             docx_path (str): Путь к DOCX файлу
             verbose (bool): Выводить ли прогресс
             log (bool): Тип ответа (False: JSON/None, True: isSucess, JSON/Response)
+            use_cache (bool): Брать готовый ответ из кэша смет и сохранять новый (False - всегда спрашивать модель)
+            stream (bool): Получать ответ потоком и разбирать JSON на лету (включается и при on_progress)
+            on_progress (callable): on_progress(событие, данные) - "metadata" и "stage" по мере готовности
+            split (bool): Разбирать большую смету по этапам параллельными запросами
+            layout (bool): Смету типовой вёрстки разбирать без генерации всего JSON (модель - только MCC и типы правил)
         
         Returns:
             См. аргумент log
@@ -131,23 +485,79 @@ JSON:
         
         if verbose:
             print(f"Прочитано {len(smeta_text)} символов")
-            print("Генерация JSON...")
         
-        prompt = self._create_prompt(smeta_text)
-        
-        completion = self.client.chat.completions.create(
-            model=self.preset["MODEL"],
-            messages=[{"role": "user", "content": prompt}],
-            temperature=self.preset["TEMP"],
-            top_p=self.preset["TOP-P"],
-            max_tokens=8192,
-            stream=False
-        )
+        def cached(key):
+            result = smeta_cache().get(key) if key else None
+            if result is not None:
+                if verbose:
+                    print("Смета уже разбиралась - JSON из кэша")
+                if on_progress:
+                    on_progress("metadata", result.get("grant_metadata"))
+                    for stage in result.get("stages", []):
+                        on_progress("stage", stage)
+            return result
+
+        contract = layout_contract(smeta_text) if layout else None
+        if verbose and contract:
+            print("Вёрстка сметы распознана - этапы, лимиты и даты взяты из документа")
+        key = self.cache_key(smeta_text, split, contract is not None) if use_cache else None
+        result = cached(key)
+        if result is not None:
+            return (True, result) if log else result
+
+        if verbose:
+            print("Генерация JSON...")
         
-        response = completion.choices[0].message.content
-        result = self._extract_json(response)
+        self.stream_stats = self.split_stats = self.layout_stats = None
+        self.last_model = None
+        result = None
+        if contract:
+            response, result = self._parse_layout(contract)
+            if verbose:
+                stats = self.layout_stats
+                for issue in stats["issues"]:
+                    print(f"Внимание: {issue}")
+                print(f"Правил: {stats['rules']}, категорий для MCC: {stats['categories']}, "
+                      f"разбор занял {stats['total_ms'] / 1000:.2f} с")
+                if not result:
+                    print("Классификация не удалась - смета разбирается моделью целиком")
+            if not result and key:
+                # Ответ даст разбор моделью - в кэше он лежит под своим ключом, а не под ключом вёрстки
+                key = self.cache_key(smeta_text, split)
+                result = cached(key)
+                if result is not None:
+                    return (True, result) if log else result
+        if result:
+            if on_progress:
+                on_progress("metadata", result["grant_metadata"])
+                for stage in result["stages"]:
+                    on_progress("stage", stage)
+        elif split:
+            response, result = self._parse_split(smeta_text, on_progress)
+        else:
+            response, result = self._parse_whole(smeta_text, on_progress, stream)
+        if verbose and self.stream_stats:
+            stats = self.stream_stats
+            if stats["aborted"]:
+                print(f"Ответ оборван: {stats['aborted']}")
+            elif stats["first_stage_ms"] is not None:
+                print(f"Первый этап через {stats['first_stage_ms'] / 1000:.1f} с, весь ответ - {stats['total_ms'] / 1000:.1f} с")
+        if verbose and self.split_stats:
+            stats = self.split_stats
+            print(f"Этапов: {stats['stages']}, разбор занял {stats['wall_ms'] / 1000:.1f} с "
+                  f"(самый долгий запрос - {max([stats['metadata_ms'] or 0] + list(stats['stage_ms'].values())) / 1000:.1f} с)")
+            for issue in stats["issues"]:
+                print(f"Внимание: {issue}")
         
+        if result and key:
+            smeta_cache().put(key, result)
+
         if verbose:
+            if result:
+                for code in self.unknown_mcc(result):
+                    print(f"Внимание: MCC {code} нет в справочнике")
+            if self.gateway and self.last_model:
+                print(f"Ответила модель {self.last_model}")
             print("\nГотово")
         
         if not result and log:
@@ -158,7 +568,7 @@ JSON:
         return result
 
 
-def parse_smeta(docx_path, output_json_path=None, verbose=True):
+def parse_smeta(docx_path, output_json_path=None, verbose=True, use_cache=True, on_progress=None, split=False, layout=True):
     """
     Быстрый парсинг сметы
     
@@ -166,13 +576,17 @@ def parse_smeta(docx_path, output_json_path=None, verbose=True):
         docx_path (str): путь к DOCX файлу
         output_json_path (str): куда сохранить JSON (опционально)
         verbose (bool): выводить прогресс
+        use_cache (bool): повторная смета берётся из кэша без запроса к модели
+        on_progress (callable): если задан - ответ идёт потоком, этапы сообщаются по мере готовности
+        split (bool): большая смета разбирается по этапам параллельными запросами
+        layout (bool): смета типовой вёрстки разбирается без генерации всего JSON моделью
     
     Returns:
         dict: JSON структура сметы
     """
 
-    parser = SmetaParser()
-    result = parser.parse(docx_path, verbose=verbose)
+    parser = SmetaParser(models=SMETA_MODELS)
+    result = parser.parse(docx_path, verbose=verbose, use_cache=use_cache, on_progress=on_progress, split=split, layout=layout)
     
     if result and output_json_path:
         with open(output_json_path, "w", encoding="utf-8") as f:
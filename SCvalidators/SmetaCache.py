@@ -0,0 +1,122 @@
+import os
+import json
+import hashlib
+import threading
+from SCvalidators.CacheDir import cache_path
+
+# ========================
+# Кэш разобранных смет
+# ========================
+#
+# Разбор сметы моделью занимает минуты, а смета часто загружается повторно без изменений.
+# Ключ - хэш текста сметы вместе со всем, что влияет на ответ: модель, temperature, top_p,
+# версия шаблона промпта и справочник MCC. Каждый результат - отдельный JSON-файл с именем
+# по ключу; время изменения файла обновляется при попадании, и при превышении MAX_BYTES
+# удаляются самые давно использованные файлы.
+
+CACHE_DIR = os.environ.get("SMETA_CACHE", cache_path("smeta_cache"))
+MAX_BYTES = int(os.environ.get("SMETA_CACHE_BYTES", 50 * 1024 * 1024))
+
+smeta_cache_stats = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+_stats_lock = threading.Lock()
+
+
+def smeta_key(smeta_text, preset, prompt_version, extra=()):
+    """Ключ кэша: sha256 текста сметы и параметров, от которых зависит ответ модели"""
+    parts = {
+        "text": smeta_text,
+        "model": preset["MODEL"],
+        "temperature": preset["TEMP"],
+        "top_p": preset["TOP-P"],
+        "prompt": prompt_version,
+        "extra": list(extra),
+    }
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _count(name, value=1):
+    with _stats_lock:
+        smeta_cache_stats[name] += value
+
+
+class SmetaCache:
+    def __init__(self, path=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key):
+        """Разобранная смета или None"""
+        path = self._file(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)   # давность использования для LRU
+        except (OSError, ValueError):
+            _count("misses")
+            return None
+        _count("hits")
+        return value
+
+    def put(self, key, value):
+        os.makedirs(self.path, exist_ok=True)
+        path = self._file(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        _count("writes")
+        self.evict()
+
+    def evict(self, max_bytes=None):
+        """Удаляет самые давно использованные записи, пока кэш больше max_bytes"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            entries, total = [], 0
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            for _, size, path in sorted(entries):
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                total -= size
+                _count("evicted")
+
+    def size(self):
+        """(записей, байт) на диске"""
+        try:
+            sizes = [entry.stat().st_size for entry in os.scandir(self.path) if entry.name.endswith(".json")]
+        except FileNotFoundError:
+            return 0, 0
+        return len(sizes), sum(sizes)
+
+
+def cache_stats():
+    """Счётчики попаданий/промахов и размер кэша на диске"""
+    entries, size = smeta_cache().size()
+    with _stats_lock:
+        stats = dict(smeta_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats.update(entries=entries, bytes=size, hit_rate=stats["hits"] / lookups if lookups else 0.0)
+    return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def smeta_cache():
+    """Общий на процесс кэш смет"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SmetaCache()
+        return _cache
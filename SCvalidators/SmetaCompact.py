@@ -0,0 +1,86 @@
+from SCvalidators.SmetaSplit import merge_fragments
+from SCvalidators.SmetaLayout import months_between
+
+# ========================
+# Краткая схема ответа модели
+# ========================
+#
+# Выходные токены - самая медленная часть запроса, а полный контракт наполовину состоит из того,
+# что модель знать не обязана: summary, status, пустые transactions, currency, payment_system,
+# duration_months, номера правил, длинные ключи и отступы. Модель пишет кортежи:
+#   {"g": [название, бюджет, начало, конец],
+#    "s": [[номер, название, начало, конец, бюджет, [[тип, название, лимит, категории], ...]], ...]}
+# тип "i" - физлица (категории - строки), "l" - юрлица (категории - [название, [MCC, ...]]).
+# expand_compact восстанавливает полную структуру контракта и вычисляет производные поля.
+
+COMPACT_SCHEMA = """{"g":["название гранта",общий_бюджет,"YYYY-MM-DD","YYYY-MM-DD"],
+"s":[[номер_этапа,"название этапа","YYYY-MM-DD","YYYY-MM-DD",бюджет_этапа,[
+["i","название правила",лимит,["категория","категория"]],
+["l","название правила",лимит,[["категория",[MCC,MCC]],["категория",[MCC]]]]]]]}"""
+
+# Части краткого ответа, о которых сообщается по мере поступления (см. IncrementalJSON)
+COMPACT_WATCH = [("g",), ("s", "*")]
+
+RULE_TYPES = {"i": "individuals", "l": "legal_entities"}
+
+
+def _mcc(code):
+    code = str(code).strip()
+    return code.zfill(4) if code.isdigit() else code   # 742 -> "0742": модель может писать коды числами
+
+
+def expand_metadata(row):
+    """[название, бюджет, начало, конец] -> grant_metadata"""
+    name, budget, start, end = row
+    return {"name": name, "total_budget": budget, "currency": "RUB", "start_date": start, "end_date": end,
+            "duration_months": months_between(start, end), "payment_system": "Мир"}
+
+
+def expand_stage(row):
+    """[номер, название, начало, конец, бюджет, правила] -> этап контракта"""
+    stage_id, name, start, end, budget, rules = row
+    spending_rules = []
+    for index, (kind, rule_name, limit, categories) in enumerate(rules, 1):
+        if kind not in RULE_TYPES:
+            raise ValueError(f"Этап {stage_id}: неизвестный тип правила {kind!r}")
+        if kind == "l":
+            categories = [{"category": category, "mcc_codes": [_mcc(code) for code in codes]}
+                          for category, codes in categories]
+        spending_rules.append({"rule_id": f"{stage_id}.{index}", "rule_type": RULE_TYPES[kind],
+                               "rule_name": rule_name, "limit": limit,
+                               "allowed_categories": list(categories), "transactions": []})
+    return {"stage_id": stage_id, "stage_name": name, "start_date": start, "end_date": end,
+            "duration_months": months_between(start, end), "stage_budget": budget,
+            "status": "planned", "spending_rules": spending_rules}
+
+
+def expand_compact(data):
+    """Полный контракт из краткого ответа модели; ValueError, если ответ не по схеме"""
+    try:
+        return merge_fragments(expand_metadata(data["g"]), [expand_stage(row) for row in data["s"]])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Ответ не соответствует краткой схеме: {e}") from e
+
+
+def to_compact(contract):
+    """Обратное expand_compact: контракт в краткой схеме (эталон для проверок и примеров ответа)"""
+    meta = contract["grant_metadata"]
+    stages = []
+    for stage in contract["stages"]:
+        rules = []
+        for rule in stage["spending_rules"]:
+            if rule["rule_type"] == "legal_entities":
+                rules.append(["l", rule["rule_name"], rule["limit"],
+                              [[cat["category"], cat["mcc_codes"]] for cat in rule["allowed_categories"]]])
+            else:
+                rules.append(["i", rule["rule_name"], rule["limit"], rule["allowed_categories"]])
+        stages.append([stage["stage_id"], stage["stage_name"], stage["start_date"], stage["end_date"],
+                       stage["stage_budget"], rules])
+    return {"g": [meta["name"], meta["total_budget"], meta["start_date"], meta["end_date"]], "s": stages}
+
+
+def without_rule_ids(contract):
+    """Этапы без rule_id - для сравнения с исходным контрактом: номера правил краткая схема назначает сама"""
+    return [{**stage, "spending_rules": [{k: v for k, v in rule.items() if k != "rule_id"}
+                                         for rule in stage["spending_rules"]]}
+            for stage in contract["stages"]]
@@ -0,0 +1,179 @@
+import re
+from datetime import date
+from docx import Document
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from SCvalidators.SmetaSplit import merge_fragments, TOP_SECTION
+
+# ========================
+# Смета без модели: чтение DOCX и разбор типовой вёрстки
+# ========================
+#
+# python-docx отдаёт абзацы и таблицы раздельно, поэтому текст собирается обходом тела документа:
+# абзацы и строки таблиц в порядке следования, ячейки строки через " | " (объединённые ячейки - один раз).
+# Если смета свёрстана по шаблону ("N. ЭТАП K: ...", "Период: дд.мм.гггг - дд.мм.гггг",
+# "Бюджет этапа: ...", "N.M название", "Общий лимит: ...", "Разрешенные категории:"), этапы, лимиты
+# и даты собираются напрямую из текста - числа точные, модель не нужна. Модели остаётся только
+# тип правила (физлица/юрлица) и MCC коды категорий - см. SmetaParser._parse_layout.
+
+AMOUNT = r"(\d[\d\s ]*(?:[.,]\d+)?)"
+DATE = r"(\d{1,2}\.\d{1,2}\.\d{4}|\d{4}-\d{2}-\d{2})"
+SEP = r"\s*[:|]\s*"
+
+TITLE = re.compile(r"^\s*название (?:проекта|гранта)" + SEP + r"(.+)$", re.IGNORECASE)
+TOTAL = re.compile(r"^\s*общий бюджет(?: гранта| проекта)?" + SEP + AMOUNT, re.IGNORECASE)
+PERIOD = re.compile(r"^\s*период(?: реализации)?" + SEP + r"(?:с\s+)?" + DATE + r"\s*(?:-|–|—|по)\s*" + DATE
+                    + r"(?:\s*\((\d+)\s*мес)?", re.IGNORECASE)
+PAYMENT = re.compile(r"^\s*(?:платежная )?система платежей" + SEP + r"(.+)$", re.IGNORECASE)
+STAGE = re.compile(r"^\s*(?:\d+[.)]\s*)?этап\s+(\d+)\s*[:.\-–—|]?\s*(.*)$", re.IGNORECASE)
+STAGE_BUDGET = re.compile(r"^\s*бюджет этапа" + SEP + AMOUNT, re.IGNORECASE)
+RULE = re.compile(r"^\s*(\d+(?:\.\d+)+)\.?\s*\|?\s*([^|\d].*?)(?:\s*\|\s*" + AMOUNT + r"[^|]*)?$")
+LIMIT = re.compile(r"^\s*(?:общий )?лимит" + SEP + AMOUNT, re.IGNORECASE)
+CATEGORIES = re.compile(r"^\s*разрешенн\w* категори\w*\s*[:|]?\s*(.*)$", re.IGNORECASE)
+
+# тип правила по названию - когда он очевиден, модель его не решает
+RULE_TYPES = [
+    (re.compile(r"физическ\w* лиц", re.IGNORECASE), "individuals"),
+    (re.compile(r"юридическ\w* лиц", re.IGNORECASE), "legal_entities"),
+]
+
+
+def docx_lines(source):
+    """Непустые строки DOCX (путь или файл) в порядке документа: абзацы и строки таблиц"""
+    doc = Document(source)
+    lines = []
+    for element in doc.element.body.iterchildren():
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "p":
+            text = Paragraph(element, doc).text.strip()
+            if text:
+                lines.append(text)
+        elif tag == "tbl":
+            for row in Table(element, doc).rows:
+                cells = []
+                for cell in row.cells:
+                    text = "; ".join(part.strip() for part in cell.text.splitlines() if part.strip())
+                    if text and (not cells or cells[-1] != text):   # объединённая ячейка повторяется в каждой колонке
+                        cells.append(text)
+                if cells:
+                    lines.append(" | ".join(cells))
+    return lines
+
+
+def _amount(text):
+    value = float(re.sub(r"[\s ]", "", text).replace(",", "."))
+    return int(value) if value == int(value) else value
+
+
+def _date(text):
+    if "-" in text:
+        return date.fromisoformat(text).isoformat()
+    day, month, year = (int(part) for part in text.split("."))
+    return date(year, month, day).isoformat()
+
+
+def months_between(start, end):
+    """Месяцев в периоде, считая первый и последний неполные месяцы целыми"""
+    start, end = date.fromisoformat(start), date.fromisoformat(end)
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def _period(match):
+    start, end = _date(match.group(1)), _date(match.group(2))
+    months = int(match.group(3)) if match.group(3) else months_between(start, end)
+    return start, end, months
+
+
+def rule_type(rule_name):
+    """individuals/legal_entities по названию правила или None, если по названию не понять"""
+    for pattern, kind in RULE_TYPES:
+        if pattern.search(rule_name):
+            return kind
+    return None
+
+
+def layout_contract(smeta_text):
+    """
+    Каркас контракта из сметы типовой вёрстки или None, если вёрстка не распознана.
+    У правил allowed_categories - строки, rule_type - по названию или None: их дополняет модель.
+    """
+    meta = {"name": None, "total_budget": None, "currency": "RUB", "start_date": None, "end_date": None,
+            "duration_months": None, "payment_system": "Мир"}
+    lines = [line.strip() for line in smeta_text.splitlines() if line.strip()]
+    stages, stage, rule, in_categories = [], None, None, False
+    for line in lines:
+        match = STAGE.match(line)
+        if match:
+            stage = {"stage_id": int(match.group(1)), "stage_name": match.group(2).strip(" |"),
+                     "start_date": None, "end_date": None, "duration_months": None,
+                     "stage_budget": None, "status": "planned", "spending_rules": []}
+            stages.append(stage)
+            rule, in_categories = None, False
+            continue
+        if stage is None:
+            if TITLE.match(line):
+                meta["name"] = TITLE.match(line).group(1).strip()
+            elif TOTAL.match(line):
+                meta["total_budget"] = _amount(TOTAL.match(line).group(1))
+            elif PERIOD.match(line):
+                meta["start_date"], meta["end_date"], meta["duration_months"] = _period(PERIOD.match(line))
+            elif PAYMENT.match(line):
+                system = PAYMENT.match(line).group(1)
+                meta["payment_system"] = "Мир" if "мир" in system.lower() else system.strip(' "«»')
+            elif meta["name"] is None and not TOP_SECTION.match(line) and not line.lower().startswith("смета"):
+                meta["name"] = line
+            continue
+
+        if STAGE_BUDGET.match(line):
+            stage["stage_budget"] = _amount(STAGE_BUDGET.match(line).group(1))
+        elif PERIOD.match(line) and rule is None:
+            stage["start_date"], stage["end_date"], stage["duration_months"] = _period(PERIOD.match(line))
+        elif LIMIT.match(line) and rule is not None:
+            rule["limit"] = _amount(LIMIT.match(line).group(1))
+        elif CATEGORIES.match(line) and rule is not None:
+            in_categories = True
+            tail = CATEGORIES.match(line).group(1)
+            rule["allowed_categories"] += [part.strip() for part in re.split(r"[;,]", tail) if part.strip()]
+        elif RULE.match(line) and not TOP_SECTION.match(line):
+            number, name, limit = RULE.match(line).groups()
+            rule = {"rule_id": f"{stage['stage_id']}.{len(stage['spending_rules']) + 1}",
+                    "rule_type": rule_type(name), "rule_name": name.strip(),
+                    "limit": _amount(limit) if limit else None, "allowed_categories": [], "transactions": []}
+            stage["spending_rules"].append(rule)
+            in_categories = False
+        elif TOP_SECTION.match(line):
+            stage, rule, in_categories = None, None, False   # "5. ОБЩИЕ ТРЕБОВАНИЯ" - этапы кончились
+        elif in_categories:
+            rule["allowed_categories"] += [part.strip() for part in line.lstrip("-•* ").split(";") if part.strip()]
+
+    if not stages or None in (meta["name"], meta["total_budget"], meta["start_date"]):
+        return None
+    for stage in stages:
+        if None in (stage["start_date"], stage["stage_budget"]) or not stage["spending_rules"]:
+            return None
+        for rule in stage["spending_rules"]:
+            if rule["limit"] is None or not rule["allowed_categories"]:
+                return None
+    return merge_fragments(meta, stages)
+
+
+def apply_classes(contract, types, codes):
+    """
+    Дополняет каркас ответом модели: types - {rule_id: тип правила}, codes - {категория: [MCC]}.
+    Категории юрлиц становятся {"category", "mcc_codes"}. Возвращает список того, что модель не заполнила.
+    """
+    missing = []
+    for stage in contract["stages"]:
+        for rule in stage["spending_rules"]:
+            rule["rule_type"] = rule["rule_type"] or types.get(rule["rule_id"])
+            if rule["rule_type"] not in ("individuals", "legal_entities"):
+                missing.append(f"тип правила {rule['rule_id']}")
+                continue
+            if rule["rule_type"] == "legal_entities":
+                categories = []
+                for category in rule["allowed_categories"]:
+                    if not codes.get(category):
+                        missing.append(f"MCC для \"{category}\"")
+                    categories.append({"category": category, "mcc_codes": [str(code) for code in codes.get(category, [])]})
+                rule["allowed_categories"] = categories
+    return missing
@@ -0,0 +1,81 @@
+import re
+from datetime import datetime, timezone
+from SCvalidators.PMstages import check_stages
+
+# ========================
+# Разбор большой сметы по этапам
+# ========================
+#
+# Многолетняя смета не помещается в один ответ модели (max_tokens), а один запрос на весь документ
+# не распараллелить. Текст режется на общую часть и разделы этапов ("2. ЭТАП 1: ..."), метаданные
+# гранта и каждый этап разбираются отдельными запросами, потом собираются в один контракт
+# и сверяются: сумма бюджетов этапов, лимиты правил, непрерывность дат.
+
+STAGE_HEADER = re.compile(r"^\s*(?:\d+[.)]\s*)?этап\s+(\d+)\b", re.IGNORECASE)
+TOP_SECTION = re.compile(r"^\s*\d+\.\s+\S")     # "5. ОБЩИЕ ТРЕБОВАНИЯ", но не "2.1 Выплаты"
+
+
+def split_smeta(smeta_text):
+    """
+    (общая часть, [(номер этапа, текст раздела)]) - разделы этапов по заголовкам "N. ЭТАП K".
+    Нумерованные разделы после этапов (общие требования и т.п.) попадают в общую часть.
+    """
+    head, stages, current = [], [], None
+    for line in smeta_text.splitlines():
+        match = STAGE_HEADER.match(line)
+        if match:
+            current = [line]
+            stages.append((int(match.group(1)), current))
+        elif current is not None and TOP_SECTION.match(line):
+            current = None
+            head.append(line)
+        elif current is not None:
+            current.append(line)
+        else:
+            head.append(line)
+    return "\n".join(head), [(number, "\n".join(lines)) for number, lines in stages]
+
+
+def merge_fragments(metadata, stages):
+    """Контракт в формате SmetaParser из метаданных и отдельно разобранных этапов"""
+    stages = sorted(stages, key=lambda stage: stage["stage_id"])
+    return {
+        "grant_metadata": metadata,
+        "stages": stages,
+        "summary": {
+            "total_spent": 0,
+            "total_remaining": metadata.get("total_budget", 0),
+            "spending_by_type": {"individuals": 0, "legal_entities": 0},
+            "spending_by_stage": {},
+            "last_updated": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        },
+    }
+
+
+def check_merged(contract, expected_stages=None):
+    """Расхождения собранного контракта: бюджеты, лимиты, даты, номера этапов"""
+    issues = []
+    meta = contract["grant_metadata"]
+    stages = contract["stages"]
+
+    ids = [stage["stage_id"] for stage in stages]
+    if expected_stages is not None and sorted(ids) != sorted(expected_stages):
+        issues.append(f"Этапы в смете {sorted(expected_stages)}, разобраны {sorted(ids)}")
+
+    budgets = sum(stage.get("stage_budget", 0) for stage in stages)
+    if budgets != meta.get("total_budget"):
+        issues.append(f"Сумма бюджетов этапов {budgets} не равна общему бюджету {meta.get('total_budget')}")
+    for stage in stages:
+        limits = sum(rule.get("limit", 0) for rule in stage.get("spending_rules", []))
+        if limits != stage.get("stage_budget"):
+            issues.append(f"Этап {stage['stage_id']}: сумма лимитов правил {limits} не равна бюджету этапа {stage.get('stage_budget')}")
+
+    try:
+        issues += check_stages(contract)   # пересечения и разрывы между этапами
+        if stages and stages[0]["start_date"] != meta["start_date"]:
+            issues.append(f"Первый этап начинается {stages[0]['start_date']}, грант - {meta['start_date']}")
+        if stages and stages[-1]["end_date"] != meta["end_date"]:
+            issues.append(f"Последний этап заканчивается {stages[-1]['end_date']}, грант - {meta['end_date']}")
+    except (KeyError, ValueError) as e:
+        issues.append(f"Некорректные даты этапов: {e}")
+    return issues
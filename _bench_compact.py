@@ -0,0 +1,55 @@
+import sys
+import json
+import time
+from SCvalidators.SCvalidator import SmetaParser
+from SCvalidators.SmetaCompact import expand_compact, to_compact, without_rule_ids
+from _bench_mcc import tokens, accuracy
+from _presets import MODELS
+
+# Объём ответа модели в полном формате контракта и по краткой схеме (SmetaCompact).
+# Без аргументов - эталон examples/smeta_output.json в обоих форматах: символы, ~токены,
+# и что expand_compact восстанавливает его без потерь. С --llm - каждая модель из _presets.MODELS
+# разбирает smeta_complex.docx в обоих форматах: выходные токены (usage), время, точность (нужен ключ NVIDIA).
+# Запуск: python _bench_compact.py [--llm]
+
+EXAMPLES = "SCvalidators/examples"
+DOCX = f"{EXAMPLES}/smeta_complex.docx"
+
+
+def run(model, compact, text):
+    parser = SmetaParser(preset={"MODEL": model, "TEMP": 0.15, "TOP-P": 0.7}, compact=compact)
+    prompt = parser._compact_prompt(text) if compact else parser._create_prompt(text)
+    start = time.perf_counter()
+    completion = parser._complete(prompt)
+    elapsed = time.perf_counter() - start
+    response = completion.choices[0].message.content
+    result = parser._extract_json(response)
+    if result and compact:
+        try:
+            result = expand_compact(result)
+        except ValueError:
+            result = None
+    usage = getattr(completion, "usage", None)
+    return elapsed, (usage.completion_tokens if usage else tokens(response)), result
+
+
+if __name__ == "__main__":
+    with open(f"{EXAMPLES}/smeta_output.json", encoding="utf-8") as f:
+        reference = json.load(f)
+    full = json.dumps(reference, ensure_ascii=False, indent=2)
+    compact = json.dumps(to_compact(reference), ensure_ascii=False, separators=(",", ":"))
+    restored = expand_compact(json.loads(compact))
+    print(f"Эталон: {len(full)} -> {len(compact)} символов, ~{tokens(full)} -> ~{tokens(compact)} токенов "
+          f"(x{len(full) / len(compact):.1f})")
+    print(f"Восстановлен без потерь: метаданные {'да' if restored['grant_metadata'] == reference['grant_metadata'] else 'НЕТ'}, "
+          f"этапы {'да' if without_rule_ids(restored) == without_rule_ids(reference) else 'НЕТ'}")
+
+    if "--llm" in sys.argv:
+        text = SmetaParser()._read_docx(DOCX)
+        _, reference_tokens, expected = run(MODELS[-1], False, text)   # ответ в полном формате - эталон для сверки
+        print(f"\n{'модель':<45} | {'токенов':>13} | {'время, с':>15} | числа (полный/краткий)")
+        for model in MODELS:
+            before, after = run(model, False, text), run(model, True, text)
+            fields = [f"{accuracy(result, expected)[0]:.0%}" if expected else "-" for _, _, result in (before, after)]
+            print(f"{model:<45} | {before[1]:>5} -> {after[1]:<5} | {before[0]:>6.1f} -> {after[0]:<6.1f} | "
+                  f"{fields[0]} / {fields[1]}")
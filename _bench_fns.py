@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from http.cookies import SimpleCookie
+
+# Локальная заглушка сайта проверки чеков ФНС и замер получения cookie.
+# GET / выдаёт cookie сессии (с задержкой, как у настоящего сайта),
+# POST /openapikkt.html принимает чек только с живой cookie.
+# Запуск: python _bench_fns.py [число чеков] [потоков]
+
+BOOTSTRAP_DELAY = 0.3   # сек на выдачу cookie
+SESSION_TTL = 2.0       # сек жизни сессии на стороне "сайта" - меньше TTL кэша, проверяет перевыпуск
+
+RECEIPT = {"type": "request", "fp": "1", "fn": "2", "fd": "3", "date": "11.11.2025",
+           "time": "12:00", "operationtype": "1", "summ": "100,00"}
+
+
+class FakeFNS(BaseHTTPRequestHandler):
+    sessions = {}
+    stats = {"bootstrap": 0, "accepted": 0, "rejected": 0}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, code, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        time.sleep(BOOTSTRAP_DELAY)
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[token] = time.monotonic()
+            self.stats["bootstrap"] += 1
+        self._reply(200, {}, [("Set-Cookie", f"fns_session={token}; Path=/")])
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        cookie = SimpleCookie(self.headers.get("Cookie", "")).get("fns_session")
+        with self.lock:
+            issued = self.sessions.get(cookie.value) if cookie else None
+            alive = issued is not None and time.monotonic() - issued < SESSION_TTL
+            self.stats["accepted" if alive else "rejected"] += 1
+        if alive:
+            self._reply(200, {"success": True, "data": {"summ": RECEIPT["summ"]}})
+        else:
+            self._reply(403, {"error": "session expired"})
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def bench(name, check, count, workers):
+    FakeFNS.stats.update(bootstrap=0, accepted=0, rejected=0)
+    times = []
+
+    def one(_):
+        start = time.perf_counter()
+        ok, details = check()
+        times.append(time.perf_counter() - start)
+        return ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(one, range(count)))
+    total = time.perf_counter() - start
+    print(f"{name:<22} | {total:6.2f} с | p50 {percentile(times, .5) * 1000:7.1f} мс | "
+          f"p95 {percentile(times, .95) * 1000:7.1f} мс | успешно {sum(results)}/{count} | "
+          f"cookie выдано {FakeFNS.stats['bootstrap']}")
+    assert all(results), "Часть чеков не прошла"
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeFNS)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Адрес сайта читается при импорте - подменяем до него
+    os.environ["FNS_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    from SCvalidators import FNScookies
+    from SCvalidators.BillValidator import post_receipt, fetch_receipt
+
+    def uncached():
+        return post_receipt(RECEIPT, FNScookies.get_cookies_via_http())
+
+    bench("cookie на каждый чек", uncached, count, workers)
+
+    FNScookies._provider = FNScookies.CookieProvider(ttl=60, use_browser=False)
+    bench("CookieProvider", lambda: fetch_receipt(RECEIPT), count, workers)
+    print("Статистика кэша:", FNScookies._provider.stats)
+    server.shutdown()
@@ -0,0 +1,126 @@
+import sys
+import json
+import time
+import random
+import select
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from SCvalidators.LLMgateway import LLMGateway, GatewayError
+from _presets import MODELS
+
+# Шлюз к моделям на локальном эндпоинте-заглушке: у каждой модели из _presets.MODELS своя
+# задержка (с редкими «хвостами») и доля ошибок, deepseek ещё и отвечает 429 (лимит).
+# Сравниваются: одна зашитая модель (как сейчас в SmetaParser), выбор по задержке и выбор
+# с хеджированием. Заглушка видит, когда клиент закрыл соединение, - так проверяется отмена
+# проигравшего запроса. Сеть и ключ не нужны.
+# Запуск: python _bench_gateway.py [запросов на сценарий]
+
+# модель: (обычная задержка, доля «хвостов», задержка хвоста, доля ошибок 503, доля 429), сек
+PROFILES = {
+    "meta/llama-3.3-70b-instruct": (0.30, 0.10, 2.0, 0.00, 0.00),
+    "mistralai/mistral-small-3.1-24b-instruct-2503": (0.15, 0.10, 1.5, 0.02, 0.00),
+    "mistralai/mistral-large-3-675b-instruct-2512": (0.60, 0.05, 3.0, 0.00, 0.00),
+    "deepseek-ai/deepseek-v3.2": (0.80, 0.10, 4.0, 0.05, 0.15),
+}
+WORKERS = 4
+
+server_stats = {"served": 0, "abandoned": 0}
+_lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _wait(self, seconds):
+        """Пауза «генерации»; False, если клиент за это время закрыл соединение"""
+        deadline = time.monotonic() + seconds
+        while (left := deadline - time.monotonic()) > 0:
+            readable, _, _ = select.select([self.connection], [], [], min(left, 0.01))
+            if readable and not self.connection.recv(1, socket.MSG_PEEK):
+                return False
+        return True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        base, tail_rate, tail, error_rate, limit_rate = PROFILES[body["model"]]
+        roll = random.random()
+        if roll < limit_rate:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if roll < limit_rate + error_rate:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        delay = tail if random.random() < tail_rate else base * random.uniform(0.8, 1.2)
+        if not self._wait(delay):
+            with _lock:
+                server_stats["abandoned"] += 1
+            return
+        content = json.dumps({"model": body["model"], "ok": True})
+        data = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with _lock:
+            server_stats["served"] += 1
+
+
+def scenario(url, models, hedge_after, requests):
+    gateway = LLMGateway(url, "stub", models, timeout=10, hedge_after=hedge_after)
+    with _lock:
+        server_stats.update(served=0, abandoned=0)
+    latencies, failed = [], 0
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            gateway.complete([{"role": "user", "content": "смета"}], max_tokens=16)
+            return time.perf_counter() - start
+        except GatewayError:
+            return None
+
+    with ThreadPoolExecutor(WORKERS) as pool:
+        for elapsed in pool.map(one, range(requests)):
+            if elapsed is None:
+                failed += 1
+            else:
+                latencies.append(elapsed)
+    time.sleep(0.1)   # заглушка досчитывает отменённые запросы
+    latencies.sort()
+    percentile = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else float("nan")
+    return gateway, percentile(0.5), percentile(0.95), latencies[-1] if latencies else float("nan"), failed
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    random.seed(1)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+    hardcoded = ["deepseek-ai/deepseek-v3.2"]
+    preferred = hardcoded + [model for model in MODELS if model not in hardcoded]
+
+    print(f"{'сценарий':<28} | {'p50, с':>6} | {'p95, с':>6} | {'макс, с':>7} | ошибок | дублей (выиграли) | отменено на заглушке")
+    for label, models, hedge in (("одна модель (deepseek)", hardcoded, None),
+                                 ("выбор по задержке", preferred, None),
+                                 ("выбор + хедж по p95", preferred, "p95")):
+        gateway, p50, p95, worst, failed = scenario(url, models, hedge, requests)
+        counters = gateway.counters
+        print(f"{label:<28} | {p50:6.2f} | {p95:6.2f} | {worst:7.2f} | {failed:>6} | "
+              f"{counters['hedges']:>6} ({counters['hedge_wins']}) {'':>9} | {server_stats['abandoned']}")
+    print("\nСтатистика шлюза в последнем сценарии:")
+    for row in gateway.report():
+        p50 = f"{row['p50_ms']:.0f}" if row["p50_ms"] is not None else "-"
+        p95 = f"{row['p95_ms']:.0f}" if row["p95_ms"] is not None else "-"
+        print(f"  {row['model']:<48} p50 {p50:>5} мс, p95 {p95:>5} мс, ошибок {row['error_rate']:.0%}, "
+              f"запросов {row['samples']}{'' if row['healthy'] else ', на паузе'}")
+    server.shutdown()
@@ -0,0 +1,123 @@
+import sys
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+from SCvalidators import HTTPpool
+
+# Замер экономии от общего пула соединений на локальной заглушке.
+# Заглушка отвечает как OpenAI-совместимый /v1/chat/completions и как ФНС /openapikkt.html,
+# каждый FLAKY_EVERY-й запрос на /flaky отдаёт 503 - проверка повторов;
+# /dropped обрывает соединение без ответа, /broken отвечает 500 - такой POST повторяться не должен.
+# Запуск: python _bench_http.py [число запросов]
+
+FLAKY_EVERY = 3
+
+COMPLETION = {
+    "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "{}"}}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+class Stub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    disable_nagle_algorithm = True  # иначе заголовки и тело ответа ждут задержанного ACK (~40 мс)
+    connections = set()
+    requests_seen = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            Stub.connections.add(self.client_address)
+            Stub.requests_seen += 1
+            seen = Stub.requests_seen
+        if self.path.endswith("/chat/completions"):
+            self._reply(200, COMPLETION)
+        elif self.path == "/flaky" and seen % FLAKY_EVERY == 0:
+            self._reply(503, {"error": "busy"})
+        elif self.path == "/dropped":
+            self.close_connection = True
+        elif self.path == "/broken":
+            self._reply(500, {"error": "internal"})
+        else:
+            self._reply(200, {"success": True})
+
+    do_GET = do_POST
+
+
+def bench(name, call, count):
+    Stub.connections.clear()
+    call()  # прогрев: импорт, создание клиентов
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    print(f"{name:<32} | среднее {sum(times) / count * 1000:6.2f} мс | p50 {times[count // 2] * 1000:6.2f} мс | "
+          f"p95 {times[int(count * .95)] * 1000:6.2f} мс | соединений {len(Stub.connections)}")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def fns_new_session():
+        with requests.Session() as s:
+            s.post(url + "/openapikkt.html", data={"fn": "1"}, timeout=30).raise_for_status()
+
+    def fns_pooled():
+        HTTPpool.post(url + "/openapikkt.html", data={"fn": "1"}).raise_for_status()
+
+    bench("ФНС: новая сессия на запрос", fns_new_session, count)
+    bench("ФНС: HTTPpool", fns_pooled, count)
+
+    from openai import OpenAI
+
+    def llm_new_client():
+        client = OpenAI(base_url=url + "/v1", api_key="stub", timeout=300.0)
+        client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}])
+        client.close()
+
+    def llm_shared_client():
+        client = HTTPpool.openai_client(base_url=url + "/v1", api_key="stub")
+        client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}])
+
+    bench("LLM: новый OpenAI на запрос", llm_new_client, count)
+    bench("LLM: HTTPpool.openai_client", llm_shared_client, count)
+
+    statuses = [HTTPpool.post(url + "/flaky").status_code for _ in range(30)]
+    assert statuses == [200] * 30, statuses
+    print(f"Повторы: 30 из 30 запросов к /flaky успешны (каждый {FLAKY_EVERY}-й ответ заглушки - 503)")
+
+    for path in ("/dropped", "/broken"):
+        before = Stub.requests_seen
+        try:
+            HTTPpool.post(url + path)
+        except requests.RequestException:
+            pass
+        assert Stub.requests_seen - before == 1, (path, Stub.requests_seen - before)
+        before = Stub.requests_seen
+        try:
+            HTTPpool.get(url + path)
+        except requests.RequestException:
+            pass
+        get_tries = Stub.requests_seen - before
+        print(f"{path}: POST отправлен 1 раз, GET - {get_tries} раз(а)")
+    server.shutdown()
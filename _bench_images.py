@@ -0,0 +1,62 @@
+import io
+import os
+import sys
+import glob
+import base64
+from PIL import Image, ImageFilter
+from SCvalidators.ReceiptImage import preprocess_receipt
+
+# Вес и время подготовки фото чеков перед распознаванием.
+# Берёт картинки из SCvalidators/examples/ и добавляет "фото с телефона":
+# чек на тёмном столе 4032x3024, повёрнутый через EXIF, как снимает камера.
+# Запуск: python _bench_images.py [папка]
+
+EXAMPLES = "SCvalidators/examples"
+REPEAT = 5
+
+
+def phone_photo(path):
+    """Чек из примеров, снятый камерой: большой кадр, фон, EXIF Orientation=6"""
+    receipt = Image.open(path).convert("RGB")
+    frame = Image.new("RGB", (3024, 4032), (70, 55, 45)).filter(ImageFilter.GaussianBlur(2))
+    receipt = receipt.resize((int(receipt.width * 3024 * 0.6 / receipt.width), int(receipt.height * 3024 * 0.6 / receipt.width)))
+    frame.paste(receipt, ((frame.width - receipt.width) // 2, (frame.height - receipt.height) // 2))
+    # Камера хранит кадр "лёжа" и пишет в EXIF, как его повернуть
+    frame = frame.transpose(Image.ROTATE_90)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    out = io.BytesIO()
+    frame.save(out, "JPEG", quality=95, exif=exif)
+    return out.getvalue()
+
+
+def bench(name, data):
+    times = []
+    for _ in range(REPEAT):
+        jpeg, stats = preprocess_receipt(io.BytesIO(data))
+        times.append(stats["ms"])
+    before_b64 = len(base64.b64encode(data))
+    after_b64 = len(base64.b64encode(jpeg))
+    print(f"{name:<28} | {stats['before_size'][0]:>4}x{stats['before_size'][1]:<4} {stats['before_bytes'] / 1024:8.1f} КБ -> "
+          f"{stats['after_size'][0]:>4}x{stats['after_size'][1]:<4} {stats['after_bytes'] / 1024:7.1f} КБ "
+          f"({'как есть' if stats['passthrough'] else 'q' + str(stats['quality'])}, обрезка: {'да' if stats['cropped'] else 'нет'}) | "
+          f"base64 {before_b64 / 1024:8.1f} -> {after_b64 / 1024:7.1f} КБ | {min(times):6.1f} мс")
+    return stats
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else EXAMPLES
+    paths = sorted(glob.glob(os.path.join(folder, "*.jpg")) + glob.glob(os.path.join(folder, "*.png")))
+    total_before = total_after = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            stats = bench(os.path.basename(path), f.read())
+        total_before += stats["before_bytes"]
+        total_after += stats["after_bytes"]
+
+    receipt = os.path.join(folder, "image.jpg")
+    if os.path.exists(receipt):
+        stats = bench("фото с телефона (image.jpg)", phone_photo(receipt))
+        total_before += stats["before_bytes"]
+        total_after += stats["after_bytes"]
+    print(f"Итого: {total_before / 1024:.1f} КБ -> {total_after / 1024:.1f} КБ")
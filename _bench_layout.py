@@ -0,0 +1,95 @@
+import re
+import sys
+import json
+import time
+import tempfile
+from types import SimpleNamespace
+from docx import Document
+from SCvalidators.SCvalidator import SmetaParser
+from _bench_mcc import reference_codes
+
+# Разбор сметы типовой вёрстки без генерации всего JSON против полного ответа модели.
+# Эталон examples/smeta_output.json сводится в DOCX с таблицами (этапы и правила - строки таблиц),
+# примеры smeta_complex.docx - абзацами. Модель имитируется: время ответа растёт с его длиной;
+# на полный промпт она отвечает эталонным JSON, на классификацию - кодами эталона.
+# Запуск: python _bench_layout.py [символов в секунду]
+
+EXAMPLES = "SCvalidators/examples"
+LATENCY = 0.3
+
+
+def table_docx(reference, path):
+    """Смета из эталона: общая информация абзацами, этапы и правила - таблицами"""
+    meta = reference["grant_metadata"]
+    document = Document()
+    document.add_paragraph("СМЕТА ГРАНТА")
+    document.add_paragraph(f"Название проекта: {meta['name']}")
+    table = document.add_table(rows=0, cols=2)
+    for label, value in (("Общий бюджет", f"{meta['total_budget']:,} рублей".replace(",", " ")),
+                         ("Период реализации", f"с {meta['start_date']} по {meta['end_date']}"),
+                         ("Система платежей", "Мир")):
+        cells = table.add_row().cells
+        cells[0].text, cells[1].text = label, value
+    for number, stage in enumerate(reference["stages"], 2):
+        document.add_paragraph(f"{number}. ЭТАП {stage['stage_id']}: {stage['stage_name']}")
+        document.add_paragraph(f"Период: {stage['start_date']} - {stage['end_date']} ({stage['duration_months']} месяцев)")
+        document.add_paragraph(f"Бюджет этапа: {stage['stage_budget']} рублей")
+        table = document.add_table(rows=0, cols=3)
+        for index, rule in enumerate(stage["spending_rules"], 1):
+            cells = table.add_row().cells
+            cells[0].text, cells[1].text, cells[2].text = f"{number}.{index}", rule["rule_name"], str(rule["limit"])
+            cells = table.add_row().cells
+            cells[0].text = "Разрешенные категории"
+            cells[1].merge(cells[2]).text = "\n".join(cat["category"] if isinstance(cat, dict) else cat
+                                                       for cat in rule["allowed_categories"])
+    document.save(path)
+
+
+def fake_client(reference, speed):
+    codes = reference_codes(reference)
+
+    def create(messages, max_tokens, **kwargs):
+        prompt = messages[0]["content"]
+        if prompt.startswith("Классифицируй"):
+            rules = re.findall(r"^(\d+\.\d+): (.+)$", prompt.split("КАТЕГОРИИ:")[0], re.MULTILINE)
+            categories = re.findall(r"^(\d+)\. (.+)$", prompt.split("КАТЕГОРИИ:")[1].split("MCC КОДЫ:")[0], re.MULTILINE)
+            answer = {"rule_types": {rule_id: "individuals" if "физическ" in name else "legal_entities" for rule_id, name in rules},
+                      "categories": {number: sorted(codes.get(category, ["5045"])) for number, category in categories}}
+        else:
+            answer = reference
+        text = json.dumps(answer, ensure_ascii=False, indent=2)
+        time.sleep(LATENCY + len(text) / speed)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def numbers(contract):
+    meta = contract["grant_metadata"]
+    return [meta["total_budget"], meta["start_date"], meta["end_date"]] + [
+        (stage["stage_budget"], stage["start_date"], stage["end_date"], [rule["limit"] for rule in stage["spending_rules"]])
+        for stage in contract["stages"]]
+
+
+if __name__ == "__main__":
+    speed = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+    with open(f"{EXAMPLES}/smeta_output.json", encoding="utf-8") as f:
+        reference = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tables = f"{tmp}/smeta_tables.docx"
+        table_docx(reference, tables)
+        parser = SmetaParser(compact=False)
+        parser.client = fake_client(reference, speed)
+        print(f"Модель {speed:.0f} символов/с")
+        for label, path in (("smeta_tables.docx", tables), ("smeta_complex.docx", f"{EXAMPLES}/smeta_complex.docx")):
+            times = {}
+            for layout in (False, True):
+                start = time.perf_counter()
+                result = parser.parse(path, verbose=False, use_cache=False, layout=layout)
+                times[layout] = time.perf_counter() - start
+            stats = parser.layout_stats
+            line = (f"{label:<20} | модель целиком: {times[False]:6.2f} с | по вёрстке: {times[True]:5.2f} с "
+                    f"(запрос {stats['classify_ms'] / 1000:.2f} с, категорий {stats['categories']})")
+            if path == tables:
+                line += f" | числа {'совпали' if numbers(result) == numbers(reference) else 'НЕ совпали'} с эталоном"
+            print(line)
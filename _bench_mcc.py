@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import time
+import tempfile
+from docx import Document
+from SCvalidators.SCvalidator import SmetaParser, HINTED_CODES
+from SCvalidators.MCCindex import smeta_categories
+
+# Размер промпта SmetaParser с полным справочником MCC и с коротким списком по BM25,
+# полнота короткого списка по эталону examples/smeta_output.json.
+# С --llm ещё и разбор сметы моделью в обоих режимах со сверкой с эталоном (нужен ключ NVIDIA).
+# Запуск: python _bench_mcc.py [--llm]
+
+EXAMPLES = "SCvalidators/examples"
+MCC_CSV = os.path.join(EXAMPLES, "mcc_codes.csv")
+REFERENCE = os.path.join(EXAMPLES, "smeta_output.json")
+DOCX = os.path.join(EXAMPLES, "smeta_complex.docx")
+
+
+def tokens(text):
+    """Оценка числа токенов: у BPE-токенизаторов на русском тексте ~3 символа на токен"""
+    return len(text) // 3
+
+
+def smeta_text(reference):
+    """Текст сметы в формате DOCX-примеров, восстановленный из эталонного JSON"""
+    meta = reference["grant_metadata"]
+    lines = ["СМЕТА ГРАНТА", meta["name"], "1. ОБЩАЯ ИНФОРМАЦИЯ",
+             f"Общий бюджет: {meta['total_budget']} рублей",
+             f"Период реализации: с {meta['start_date']} по {meta['end_date']} ({meta['duration_months']} месяцев)",
+             f"Система платежей: {meta['payment_system']}"]
+    for number, stage in enumerate(reference["stages"], 2):
+        lines += [f"{number}. ЭТАП {stage['stage_id']}: {stage['stage_name']}",
+                  f"Период: {stage['start_date']} - {stage['end_date']} ({stage['duration_months']} месяцев)",
+                  f"Бюджет этапа: {stage['stage_budget']} рублей"]
+        for index, rule in enumerate(stage["spending_rules"], 1):
+            lines += [f"{number}.{index} {rule['rule_name']}", f"Общий лимит: {rule['limit']} рублей",
+                      "Разрешенные категории:"]
+            lines += [cat["category"] if isinstance(cat, dict) else cat for cat in rule["allowed_categories"]]
+    return "\n".join(lines)
+
+
+def reference_codes(reference):
+    return {cat["category"]: set(cat["mcc_codes"])
+            for stage in reference["stages"] for rule in stage["spending_rules"]
+            for cat in rule["allowed_categories"] if isinstance(cat, dict)}
+
+
+def recall(parser, text, expected, hinted):
+    codes = set(parser.mcc_index.shortlist(smeta_categories(text), parser.mcc_top_k, hinted=hinted))
+    found = sum(len(codes & wanted) for wanted in expected.values())
+    return found, sum(len(wanted) for wanted in expected.values()), len(codes)
+
+
+def accuracy(result, reference):
+    """Доля совпавших числовых полей и средний Жаккар MCC по категориям эталона"""
+    if not result:
+        return 0.0, 0.0
+    pairs = [(result["grant_metadata"].get("total_budget"), reference["grant_metadata"]["total_budget"])]
+    for got, want in zip(result.get("stages", []), reference["stages"]):
+        pairs.append((got.get("stage_budget"), want["stage_budget"]))
+        for got_rule, want_rule in zip(got.get("spending_rules", []), want["spending_rules"]):
+            pairs.append((got_rule.get("limit"), want_rule["limit"]))
+    fields = sum(a == b for a, b in pairs) / len(pairs)
+
+    got_codes = reference_codes(result)
+    scores = [len(got_codes.get(name, set()) & codes) / len(got_codes.get(name, set()) | codes)
+              for name, codes in reference_codes(reference).items()]
+    return fields, sum(scores) / len(scores)
+
+
+if __name__ == "__main__":
+    with open(REFERENCE, encoding="utf-8") as f:
+        reference = json.load(f)
+    full = SmetaParser(mcc_csv_path=MCC_CSV, mcc_top_k=0)
+    short = SmetaParser(mcc_csv_path=MCC_CSV)
+    texts = {"smeta_output.json": smeta_text(reference), "smeta_complex.docx": full._read_docx(DOCX)}
+
+    print(f"{'смета':<20} | {'кодов':>11} | {'символов':>17} | {'~токенов':>15} | сокращение")
+    for name, text in texts.items():
+        before, after = full._create_prompt(text), short._create_prompt(text)
+        print(f"{name:<20} | {len(full._mcc_lines(text)):>4} -> {len(short._mcc_lines(text)):<4} | "
+              f"{len(before):>7} -> {len(after):<7} | {tokens(before):>6} -> {tokens(after):<6} | "
+              f"x{len(before) / len(after):.1f}")
+
+    expected = reference_codes(reference)
+    found, total, size = recall(short, texts["smeta_output.json"], expected, HINTED_CODES)
+    print(f"Полнота по эталону: {found}/{total} кодов в коротком списке из {size}")
+    found, total, size = recall(short, texts["smeta_output.json"], expected, ())
+    print(f"  без подсказанных кодов (только поиск): {found}/{total} из {size}")
+
+    if "--llm" in sys.argv:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "smeta.docx")
+            document = Document()
+            for line in texts["smeta_output.json"].splitlines():
+                document.add_paragraph(line)
+            document.save(path)
+            for label, parser in (("весь справочник", full), ("короткий список", short)):
+                start = time.perf_counter()
+                result = parser.parse(path, verbose=False, layout=False)
+                fields, mcc = accuracy(result, reference)
+                print(f"{label:<16}: {time.perf_counter() - start:6.1f} с, числовые поля {fields:.0%}, "
+                      f"MCC (Жаккар) {mcc:.2f}")
@@ -0,0 +1,94 @@
+import io
+import os
+import sys
+import time
+import random
+from PIL import Image, ImageFilter, ImageEnhance
+from pyzbar.pyzbar import decode
+from SCvalidators.QRdecoder import decode_qr, decode_batch, metrics_report
+
+# Доля распознанных QR и время на картинку: прежний однократный pyzbar.decode против лестницы.
+# Корпус собирается из примеров SCvalidators/examples/: сами файлы плюс типичные порчи
+# фото чека (большой кадр, размытие, низкий контраст, наклон, мелкий снимок, шум, многостраничный TIFF).
+# Запуск: python _bench_qr.py [повторов корпуса для пакетного прогона]
+
+EXAMPLES = "SCvalidators/examples"
+RECEIPT = os.path.join(EXAMPLES, "image.jpg")
+
+
+def _jpeg(img, quality=90):
+    out = io.BytesIO()
+    img.convert("RGB").save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def corpus():
+    items = []
+    for name in sorted(os.listdir(EXAMPLES)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(os.path.join(EXAMPLES, name), "rb") as f:
+                items.append((name, f.read()))
+
+    receipt = Image.open(RECEIPT).convert("RGB")
+    rnd = random.Random(0)
+    big = Image.new("RGB", (3024, 4032), (90, 80, 70))
+    scaled = receipt.resize((receipt.width * 5, receipt.height * 5), Image.BICUBIC)
+    big.paste(scaled, ((big.width - scaled.width) // 2, (big.height - scaled.height) // 2))
+    items.append(("фото 4032x3024", _jpeg(big)))
+    items.append(("размытие", _jpeg(receipt.filter(ImageFilter.GaussianBlur(1.6)))))
+    items.append(("низкий контраст", _jpeg(ImageEnhance.Contrast(receipt).enhance(0.25))))
+    items.append(("наклон 30°", _jpeg(receipt.rotate(30, expand=True, fillcolor=(120, 120, 120)))))
+    items.append(("мелкий снимок", _jpeg(receipt.resize((receipt.width * 2 // 5, receipt.height * 2 // 5)))))
+    noisy = receipt.copy()
+    pixels = noisy.load()
+    for _ in range(noisy.width * noisy.height // 12):
+        x, y = rnd.randrange(noisy.width), rnd.randrange(noisy.height)
+        pixels[x, y] = (0, 0, 0) if rnd.random() < .5 else (255, 255, 255)
+    items.append(("шум", _jpeg(noisy)))
+    items.append(("сжатие JPEG q10", _jpeg(receipt, quality=10)))
+
+    pages = io.BytesIO()
+    Image.new("RGB", receipt.size, "white").save(pages, "TIFF", save_all=True, append_images=[receipt])
+    items.append(("TIFF, QR на 2-й странице", pages.getvalue()))
+    return items
+
+
+def baseline(data):
+    """Как прежний qr2json: один decode по исходной картинке"""
+    try:
+        return [symbol.data.decode("utf-8") for symbol in decode(Image.open(io.BytesIO(data)))]
+    except Exception:
+        return []
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    items = corpus()
+
+    print(f"{'картинка':<28} | {'раньше':>14} | {'лестница':>26}")
+    ok_before = ok_after = 0
+    ms_before = ms_after = 0.0
+    for name, data in items:
+        start = time.perf_counter()
+        before = baseline(data)
+        ms = (time.perf_counter() - start) * 1000
+        result = decode_qr(data)
+        ok_before += bool(before)
+        ok_after += bool(result["symbols"])
+        ms_before += ms
+        ms_after += result["ms"]
+        print(f"{name:<28} | {'да' if before else 'нет':>4} {ms:7.1f} мс | "
+              f"{'да' if result['symbols'] else 'нет':>4} {result['ms']:7.1f} мс {result['step'] or '-':>11}")
+    n = len(items)
+    print(f"Успешно: раньше {ok_before}/{n}, сейчас {ok_after}/{n}; "
+          f"среднее время {ms_before / n:.1f} -> {ms_after / n:.1f} мс")
+
+    blobs = [data for _, data in items] * repeat
+    start = time.perf_counter()
+    decode_batch(blobs, workers=1)
+    serial = time.perf_counter() - start
+    start = time.perf_counter()
+    decode_batch(blobs)
+    parallel = time.perf_counter() - start
+    print(f"Пакет из {len(blobs)} картинок: подряд {serial:.2f} с, пул процессов ({os.cpu_count()} ядер) {parallel:.2f} с")
+    print("Метрики:", metrics_report())
@@ -0,0 +1,42 @@
+import sys
+import time
+import random
+import asyncio
+from SCvalidators.HTTPpool import RateLimiter
+from SCvalidators.ReceiptQueue import verify_receipts
+
+# Пропускная способность очереди чеков в зависимости от числа обработчиков.
+# Этапы заменены задержками, похожими на настоящие (LLM ~1.5 с, ФНС ~0.5 с);
+# лимит запросов в минуту общий, как в SCvalidators/ReceiptQueue.py.
+# Запуск: python _bench_receipts.py [число чеков] [RPM]
+
+OCR_DELAY = 1.5
+FNS_DELAY = 0.5
+
+
+def fake_ocr(image):
+    time.sleep(OCR_DELAY * random.uniform(0.7, 1.3))
+    return {"fn": f"{image:016d}", "fd": "1", "fp": "1", "date": "15.12.2023", "summ": "100,00"}
+
+def fake_verify(data):
+    time.sleep(FNS_DELAY * random.uniform(0.7, 1.3))
+    return True, {"success": True}
+
+
+async def run(count, workers, rpm):
+    start = time.perf_counter()
+    done = 0
+    async for result in verify_receipts(list(range(count)), ocr_workers=workers, fns_workers=workers,
+                                        ocr=fake_ocr, verify=fake_verify, fast=None, cache=False,
+                                        ocr_rate=RateLimiter(rpm), fns_rate=RateLimiter(rpm)):
+        done += result["ok"]
+    return done, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+    rpm = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    print(f"Чеков: {count}, лимит {rpm} запросов/мин на этап (потолок {rpm / 60:.1f} чек/с)")
+    for workers in (1, 2, 4, 8, 16):
+        done, elapsed = asyncio.run(run(count, workers, rpm))
+        print(f"обработчиков {workers:>2} | {elapsed:6.2f} с | {count / elapsed:5.2f} чек/с | принято {done}/{count}")
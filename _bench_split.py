@@ -0,0 +1,89 @@
+import re
+import sys
+import json
+import time
+import tempfile
+from datetime import date
+from types import SimpleNamespace
+from docx import Document
+from SCvalidators.SCvalidator import SmetaParser
+from _bench_mcc import smeta_text
+
+# Разбор большой сметы одним запросом против разбора по этапам.
+# Смета на несколько лет собирается из этапов examples/smeta_output.json; модель имитируется:
+# отвечает эталонным JSON нужного фрагмента, время ответа растёт с его длиной, ответ длиннее
+# max_tokens обрезается (как у настоящей модели).
+# Запуск: python _bench_split.py [этапов] [символов в секунду]
+
+CHARS_PER_TOKEN = 3
+LATENCY = 0.3
+
+
+def big_contract(stages):
+    with open("SCvalidators/examples/smeta_output.json", encoding="utf-8") as f:
+        reference = json.load(f)
+    result = {"grant_metadata": dict(reference["grant_metadata"]), "stages": [], "summary": reference["summary"]}
+    year = 2026
+    for number in range(1, stages + 1):
+        stage = json.loads(json.dumps(reference["stages"][(number - 1) % len(reference["stages"])]))
+        half = (number - 1) % 2
+        stage.update(stage_id=number, stage_name=f"ЭТАП РАБОТ {number}",
+                     start_date=date(year, 1 + 6 * half, 1).isoformat(),
+                     end_date=date(year, 6, 30).isoformat() if not half else date(year, 12, 31).isoformat(),
+                     duration_months=6)
+        for index, rule in enumerate(stage["spending_rules"], 1):
+            rule["rule_id"] = f"{number}.{index}"
+        stage["stage_budget"] = sum(rule["limit"] for rule in stage["spending_rules"])
+        year += half
+        result["stages"].append(stage)
+    meta = result["grant_metadata"]
+    meta.update(total_budget=sum(stage["stage_budget"] for stage in result["stages"]),
+                start_date=result["stages"][0]["start_date"], end_date=result["stages"][-1]["end_date"],
+                duration_months=6 * stages)
+    return result
+
+
+def fake_client(contract, speed):
+    stages = {stage["stage_id"]: stage for stage in contract["stages"]}
+
+    def create(messages, max_tokens, **kwargs):
+        prompt = messages[0]["content"]
+        match = re.search(r"раздел сметы \(этап (\d+)\)", prompt)
+        if match:
+            answer = stages[int(match.group(1))]
+        elif prompt.startswith("Извлеки"):
+            answer = contract["grant_metadata"]
+        else:
+            answer = contract
+        text = json.dumps(answer, ensure_ascii=False, indent=2)[:max_tokens * CHARS_PER_TOKEN]
+        time.sleep(LATENCY + len(text) / speed)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+if __name__ == "__main__":
+    stages = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 6000
+    contract = big_contract(stages)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/smeta.docx"
+        document = Document()
+        for line in smeta_text(contract).splitlines():
+            document.add_paragraph(line)
+        document.save(path)
+
+        parser = SmetaParser(compact=False)
+        parser.client = fake_client(contract, speed)
+        print(f"Этапов: {stages}, ответ целиком {len(json.dumps(contract, ensure_ascii=False, indent=2))} символов, "
+              f"модель {speed:.0f} символов/с")
+        for split in (False, True):
+            start = time.perf_counter()
+            result = parser.parse(path, verbose=False, use_cache=False, split=split, layout=False)
+            elapsed = time.perf_counter() - start
+            same = result is not None and result["stages"] == contract["stages"]
+            line = f"{'по этапам' if split else 'целиком':<10}: {elapsed:5.2f} с, JSON {'совпал с эталоном' if same else 'не получен'}"
+            if split:
+                stats = parser.split_stats
+                line += f"; самый долгий запрос {max(stats['stage_ms'].values()) / 1000:.2f} с, расхождений {len(stats['issues'])}"
+            print(line)
@@ -0,0 +1,60 @@
+import sys
+import json
+import time
+from types import SimpleNamespace
+from SCvalidators.SCvalidator import SmetaParser
+
+# Время до первого этапа при потоковом ответе против ожидания всего ответа, и как быстро
+# обрывается испорченный ответ. Модель имитируется: эталонный JSON выдаётся кусками
+# с заданной скоростью (символов в секунду), так что сеть и ключ не нужны.
+# Запуск: python _bench_stream.py [символов в секунду]
+
+EXAMPLES = "SCvalidators/examples"
+DOCX = f"{EXAMPLES}/smeta_complex.docx"
+CHUNK = 12      # ~4 токена на кусок
+
+
+class FakeStream:
+    def __init__(self, text, speed):
+        self.text, self.speed, self.closed_at = text, speed, None
+
+    def __iter__(self):
+        for i in range(0, len(self.text), CHUNK):
+            time.sleep(CHUNK / self.speed)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self.text[i:i + CHUNK]))])
+
+    def close(self):
+        self.closed_at = time.perf_counter()
+
+
+def fake_client(text, speed):
+    def create(stream=False, **kwargs):
+        if stream:
+            return FakeStream(text, speed)
+        time.sleep(len(text) / speed)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+if __name__ == "__main__":
+    speed = float(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    with open(f"{EXAMPLES}/smeta_output.json", encoding="utf-8") as f:
+        answer = "```json\n" + json.dumps(json.load(f), ensure_ascii=False, indent=2) + "\n```"
+    broken = answer[:len(answer) // 4] + "\n\nИзвините, продолжу позже: ..." + answer[len(answer) // 4:]
+
+    parser = SmetaParser(compact=False)
+    print(f"Ответ {len(answer)} символов, модель выдаёт {speed:.0f} символов/с")
+    for label, text in (("корректный ответ", answer), ("ответ сломан на 1/4", broken)):
+        parser.client = fake_client(text, speed)
+        start = time.perf_counter()
+        blocking = parser.parse(DOCX, verbose=False, use_cache=False, layout=False)
+        blocking_s = time.perf_counter() - start
+
+        events = []
+        parser.parse(DOCX, verbose=False, use_cache=False, layout=False,
+                     on_progress=lambda event, data: events.append((event, time.perf_counter())))
+        stats = parser.stream_stats
+        first = f"{stats['first_stage_ms'] / 1000:5.2f} с" if stats["first_stage_ms"] is not None else "    -"
+        print(f"{label:<20} | без потока: {blocking_s:5.2f} с, JSON {'есть' if blocking else 'нет'} | "
+              f"поток: первый этап {first}, всего {stats['total_ms'] / 1000:5.2f} с, этапов {stats['stages']}"
+              f"{', оборван' if stats['aborted'] else ''}")
@@ -6,6 +6,7 @@ import asyncio
 from datetime import datetime
 from tqdm.asyncio import tqdm
 from SCvalidators.SCvalidator import SmetaParser
+from SCvalidators.HTTPpool import RateLimiter
 from _presets import MODELS, PARAM_SETS
 
 SOURCE_FILE = "SCvalidators/examples/smeta_complex.docx"
@@ -19,22 +20,6 @@ def strip_vendor(model_id: str) -> str:
     return model_id.split("/")[-1]
 
 
-class RateLimiter:
-    """RPM-limiter"""
-    def __init__(self, max_rpm: int):
-        self.interval = 60.0 / max_rpm
-        self._lock = asyncio.Lock()
-        self._last = 0.0
-
-    async def acquire(self):
-        async with self._lock:
-            now = asyncio.get_event_loop().time()
-            wait = self._last + self.interval - now
-            if wait > 0:
-                await asyncio.sleep(wait)
-            self._last = asyncio.get_event_loop().time()
-
-
 async def run_single(parser: SmetaParser, source_file: str, output_file: str, rate_limiter: RateLimiter, semaphore: asyncio.Semaphore):
     async with semaphore:
         await rate_limiter.acquire()
@@ -42,7 +27,7 @@ async def run_single(parser: SmetaParser, source_file: str, output_file: str, ra
         try:
             result = await loop.run_in_executor(
                 None,
-                lambda: parser.parse(docx_path=source_file, verbose=False, log=True),
+                lambda: parser.parse(docx_path=source_file, verbose=False, log=True, layout=False),
             )
             if result[0]:
                 with open(output_file, "w", encoding="utf-8") as f:
@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import SChandler
+from SCstorage import JsonStore, SqliteStore
+from SCvalidators.PMstate import ValidationState
+
+# Нагрузочная проверка: сотни одновременных оплат по одному гранту
+# из пула потоков и пула процессов; лимиты не должны превышаться ни разу.
+# Запуск: python _stress_payments.py [json|sqlite]
+
+SOURCE_CONTRACT = "SCvalidators/examples/smeta_output.json"
+GRANT = "stress"
+PAYMENTS = 400
+WORKERS = 16
+
+
+def make_store(backend, folder):
+    if backend == "sqlite":
+        return SqliteStore(os.path.join(folder, "contracts.db"))
+    return JsonStore(folder, snapshot_every=25)
+
+def init_worker(backend, folder):
+    SChandler._store = make_store(backend, folder)
+
+def pay(transfer):
+    return SChandler.paySC(GRANT, [transfer])
+
+
+def random_transfers(contract, count, seed):
+    """Переводы физлицам в первом этапе: суммарно заметно больше лимита"""
+    rnd = random.Random(seed)
+    stage = contract['stages'][0]
+    rule = next(r for r in stage['spending_rules'] if r['rule_type'] == 'individuals')
+    mean = rule['limit'] * 3 // count
+    return [{"payer_type": "individual", "inn": f"{i:012d}", "amount": rnd.randint(1, 2 * mean),
+             "date": stage['start_date']} for i in range(count)]
+
+
+def check(contract, accepted):
+    sc = SChandler.readSC(GRANT)
+    state = ValidationState.from_contract(sc)
+    for (stage_id, rule_id), spent in state.spent.items():
+        assert spent <= state.limits[(stage_id, rule_id)], f"Превышен лимит {rule_id}: {spent}"
+    assert state.total_spent() == sum(t['amount'] for t in accepted), "Потеряна или удвоена оплата"
+    assert len(SChandler.getPayments(GRANT)) == len(accepted), "Журнал не совпадает с оплатами"
+    return state.total_spent()
+
+
+def run(backend, pool_cls):
+    with open(SOURCE_CONTRACT, "r", encoding="utf-8") as f:
+        contract = json.load(f)
+    with tempfile.TemporaryDirectory() as folder:
+        init_worker(backend, folder)
+        SChandler._cache_clear()
+        SChandler.saveSC(GRANT, contract)
+
+        transfers = random_transfers(contract, PAYMENTS, seed=len(backend))
+        with pool_cls(max_workers=WORKERS, initializer=init_worker, initargs=(backend, folder)) as pool:
+            results = list(pool.map(pay, transfers))
+
+        accepted = [t for t, errors in zip(transfers, results) if not errors]
+        spent = check(contract, accepted)
+        print(f"{backend:>6} | {pool_cls.__name__:<20} | принято {len(accepted):>3} из {PAYMENTS} | потрачено {spent:,}")
+
+
+if __name__ == "__main__":
+    backends = sys.argv[1:] or ["json", "sqlite"]
+    for backend in backends:
+        for pool_cls in (ThreadPoolExecutor, ProcessPoolExecutor):
+            run(backend, pool_cls)
+    print("Лимиты не превышены")
@@ -1,8 +1,10 @@
 import streamlit as st
-from SCvalidators.PMvalidator import validate_payments, handlePayments, qr2json
-from SChandler import readSC, saveSC
-from SCvalidators.BillValidator import extract_receipt_data_from_image, fetch_receipt
-import json
+from SCvalidators.PMvalidator import qr2transfers
+from SCvalidators.PMstate import ValidationState
+from SChandler import readSC, paySC
+from SCvalidators.ReceiptQueue import verify_receipts
+from SCvalidators.BillValidator import fast_path_stats
+import asyncio
 
 
 def format_currency(amount):
@@ -16,8 +18,10 @@ def display_sc_info(data):
     Args:
         data: dict - JSON-структура смарт-контракта
     """
+    state = ValidationState.from_contract(data)
+
     # Метаданные гранта
-    st.markdown(f"**Общий бюджет:** {format_currency(data['grant_metadata']['total_budget'])}")
+    st.markdown(f"**Общий бюджет:** {format_currency(state.total_budget)}")
     st.markdown(f"**Период:** {data['grant_metadata']['start_date']} — {data['grant_metadata']['end_date']} ({data['grant_metadata']['duration_months']} мес.)")
     st.divider()
 
@@ -29,7 +33,7 @@ def display_sc_info(data):
         # Правила трат
         for rule in stage['spending_rules']:
             st.markdown(f"**{rule['rule_name']}**")
-            st.markdown(f"Лимит: {format_currency(rule['limit'])}")
+            st.markdown(f"Лимит: {format_currency(state.remaining(stage['stage_id'], rule['rule_id']))} из {format_currency(state.limits[(stage['stage_id'], rule['rule_id'])])}")
             
             # Категории (если есть)
             if 'allowed_categories' in rule and rule['allowed_categories']:
@@ -43,6 +47,23 @@ def display_sc_info(data):
         
         st.divider()
 
+async def show_receipts(grant_name, bill_photos):
+    """Проверяет чеки пачкой и выводит результат по каждому, как только он готов"""
+    progress = st.progress(0.0, text="Проверка чеков...")
+    done = 0
+    async for result in verify_receipts(bill_photos, grant=grant_name):
+        done += 1
+        progress.progress(done / len(bill_photos), text=f"Проверено чеков: {done} из {len(bill_photos)}")
+        if(result["ok"] and result["reused_in"]):
+            st.warning(f"{result['name']}: чек уже предъявлен по грантам: {', '.join(result['reused_in'])}")
+        elif(result["ok"]): st.success(f"{result['name']}: чек принят!")
+        elif(result["stage"] == "ocr"): st.error(f"{result['name']}: чек не распознан")
+        else: st.warning(f"{result['name']}: чек не найден в базе ФНС!")
+    stats = fast_path_stats()
+    if(stats["qr_hits"]):
+        st.caption(f"По QR-коду распознано чеков: {stats['qr_hits']} из {stats['receipts']}, "
+                   f"сэкономлено запросов к модели: {stats['llm_calls_saved']} (~{stats['seconds_saved']:.0f} с)")
+
 st.set_page_config(page_title="МойГрант", page_icon="💰")
 grant_name = st.query_params["id"]
 
@@ -52,38 +73,40 @@ st.write("онлайн-сервис управления грантами")
 st.divider()
 
 st.subheader(f"Грант: {grant_name}")
-st.write(f"Баланс: {readSC(grant_name)["grant_metadata"]["total_budget"]} ₽")
+grant = readSC(grant_name)
+state = ValidationState.from_contract(grant)
+balance = state.total_budget - state.total_spent()
+st.write(f"Баланс: {balance} ₽")
 st.divider()
 
 st.subheader("Подтверждение оплаты")
-bill_photo = st.file_uploader("Загрузка чека", 
+bill_photos = st.file_uploader("Загрузка чеков", 
     type=["jpg"], 
-    help="Загрузите фотографию чека с расширением JPG"
+    accept_multiple_files=True,
+    help="Загрузите фотографии чеков с расширением JPG (можно несколько сразу)"
 )
-if(st.button("Подтвердить")):
-    bill_data = extract_receipt_data_from_image(bill_photo)
-    succes, _ = fetch_receipt(bill_data)
-
-    if(succes): st.success("Ваш чек принят!")
-    else: st.warning("Ваш чек не найден в базе ФНС!")
+if(st.button("Подтвердить") and bill_photos):
+    asyncio.run(show_receipts(grant_name, bill_photos))
 st.divider()
 
 st.subheader(f"Оплата средствами гранта")
 
-payment_req = st.file_uploader("Реквизиты", 
-    type=["jpg", "png", "jpeg"], 
-    help="Загрузите реквизиты для оплаты"
+payment_reqs = st.file_uploader("Реквизиты", 
+    type=["jpg", "png", "jpeg", "tif", "tiff"], 
+    accept_multiple_files=True,
+    help="Загрузите реквизиты для оплаты (можно несколько файлов или многостраничный TIFF)"
 )
 
 
-if(st.button("Оплатить")):
-    if(payment_req):
-        payment_report = validate_payments(readSC(grant_name), json.loads(qr2json(payment_req)))
-        if(payment_report["errors"]): 
-            for error in payment_report["errors"]: st.write(error)
+if(st.button("Оплатить") and payment_reqs):
+    transfers, failed = qr2transfers(payment_reqs)
+    for name in failed: st.warning(f"{name}: перевод не распознан")
+    if(transfers):
+        errors = paySC(grant_name, transfers)
+        if(errors): 
+            for error in errors: st.write(error)
         else: 
-            st.success("Оплачено!")
-            saveSC(grant_name, handlePayments(readSC(grant_name), payment_report))
+            st.success(f"Оплачено переводов: {len(transfers)}!")
             st.rerun()
     else: st.error("Перевод не распознан")
 
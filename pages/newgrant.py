@@ -1,5 +1,7 @@
 import streamlit as st
 from SCvalidators.SCvalidator import parse_smeta
+from SCvalidators.SmetaCache import cache_stats
+from SCvalidators.PMrules import check_contract
 from SChandler import saveSC
 
 st.set_page_config(page_title="МойГрант", page_icon="💰")
@@ -18,6 +20,21 @@ grant_estimate = st.file_uploader("Смета проекта",
     help="Загрузите документ в формате Word"
 )
 
+reparse = st.checkbox("Разобрать смету заново", help="Не брать результат прошлого разбора этой же сметы из кэша")
+
+def show_progress(event, data):
+    """Этапы сметы на странице по мере того, как модель их выдаёт"""
+    if(event == "metadata"): st.write(f"**{data.get('name', 'Грант')}**, бюджет {data.get('total_budget', '?')} ₽")
+    elif(event == "stage"): st.write(f"Этап {data.get('stage_id', '?')}: {data.get('stage_name', '')} — {data.get('stage_budget', '?')} ₽")
+
 if(st.button("Создать")):
-    saveSC(grant_name, parse_smeta(grant_estimate))
-    st.success("Грант успешно создан!")
\ No newline at end of file
+    with st.status("Разбор сметы...", expanded=True) as status:
+        grant = parse_smeta(grant_estimate, use_cache=not reparse, on_progress=show_progress)
+        status.update(label="Смета разобрана" if grant else "Смета не разобрана", state="complete" if grant else "error")
+    if(grant):
+        saveSC(grant_name, grant)
+        st.success("Грант успешно создан!")
+        for issue in check_contract(grant): st.warning(issue)
+    else: st.error("Модель вернула некорректный ответ, попробуйте ещё раз")
+    stats = cache_stats()
+    st.caption(f"Кэш смет: попаданий {stats['hits']}, промахов {stats['misses']}, записей {stats['entries']}")
\ No newline at end of file
@@ -0,0 +1,26 @@
+import os
+import sys
+import json
+import copy
+import tempfile
+import pytest
+
+# Тесты запускаются из корня проекта: python -m pytest
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Служебные кэши тестов не должны попадать в .cache проекта
+os.environ.setdefault("SMARTGRANT_CACHE_DIR", tempfile.mkdtemp(prefix="smartgrant-cache-"))
+
+EXAMPLE_CONTRACT = os.path.join(ROOT, "SCvalidators", "examples", "smeta_output.json")
+
+
+@pytest.fixture(scope="session")
+def example_contract():
+    with open(EXAMPLE_CONTRACT, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def contract(example_contract):
+    """Независимая копия эталонного контракта"""
+    return copy.deepcopy(example_contract)
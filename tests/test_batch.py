@@ -0,0 +1,64 @@
+import random
+import pytest
+from SCvalidators.PMvalidator import validate_payments
+from SCvalidators.PMbatch import validate_payments_batch
+
+
+def random_transfers(contract, count, seed):
+    """Переводы по всем правилам контракта и несколько заведомо ошибочных"""
+    rnd = random.Random(seed)
+    transfers = []
+    for i in range(count):
+        stage = rnd.choice(contract["stages"])
+        rule = rnd.choice(stage["spending_rules"])
+        if rule["rule_type"] == "individuals":
+            trn = {"payer_type": "individual", "inn": f"{i:012d}"}
+        else:
+            category = rnd.choice(rule["allowed_categories"])
+            trn = {"payer_type": "legal_entity", "inn": f"{i:010d}", "mcc": rnd.choice(category["mcc_codes"])}
+        trn["amount"] = round(rnd.uniform(1, 120000), 2) if rnd.random() < 0.5 else rnd.randint(1, 120000)
+        trn["date"] = rnd.choice([stage["start_date"], stage["end_date"]])
+        transfers.append(trn)
+    transfers += [
+        {"payer_type": "individual", "inn": "1" * 12, "amount": 10, "date": "2030-01-01"},          # вне проекта
+        {"payer_type": "legal_entity", "inn": "7" * 10, "amount": 10, "mcc": "9999", "date": "2026-03-01"},  # нет правила
+        {"payer_type": "robot", "inn": "0", "amount": 10, "date": "2026-03-01"},                    # тип плательщика
+    ]
+    rnd.shuffle(transfers)
+    return transfers
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_batch_matches_scalar(contract, seed):
+    transfers = random_transfers(contract, 2000, seed)
+    scalar = validate_payments(contract, transfers)
+    batch = validate_payments_batch(contract, transfers)
+
+    assert list(batch["report"]) == scalar["report"]
+    assert list(batch["errors"]) == scalar["errors"]
+    assert batch["rules_by_stage"] == scalar["rules_by_stage"]
+    assert batch["unknown_mcc"] == scalar["unknown_mcc"]
+    for stage_id, rules in scalar["limits_used"].items():
+        for rule_id, used in rules.items():
+            assert batch["limits_used"][stage_id][rule_id] == pytest.approx(used, abs=0.005)
+
+
+def test_float_overrun_message_is_rounded(contract):
+    # 0.1 + 0.2 во float - 0.30000000000000004; в сообщении обоих путей должна быть сумма в копейках
+    stage = contract["stages"][0]
+    rule = next(r for r in stage["spending_rules"] if r["rule_type"] == "individuals")
+    rule["limit"] = 0.25
+    transfers = [{"payer_type": "individual", "inn": "1" * 12, "amount": amount, "date": stage["start_date"]}
+                 for amount in (0.1, 0.2)]
+    scalar = validate_payments(contract, transfers)
+    batch = validate_payments_batch(contract, transfers)
+    assert scalar["errors"] == [f"❌ Превышен лимит для {rule['rule_id']} ({stage['stage_id']}): 0.3 > 0.25"]
+    assert list(batch["errors"]) == scalar["errors"]
+
+
+def test_empty_transfer_list(contract):
+    scalar = validate_payments(contract, [])
+    batch = validate_payments_batch(contract, [])
+    assert list(batch["report"]) == scalar["report"] == []
+    assert list(batch["errors"]) == scalar["errors"] == []
+    assert batch["limits_used"] == scalar["limits_used"]
@@ -0,0 +1,32 @@
+import copy
+import pytest
+from SCvalidators.SmetaCompact import expand_compact, to_compact, without_rule_ids
+
+
+def test_round_trip_restores_reference(example_contract):
+    restored = expand_compact(to_compact(example_contract))
+    assert restored["grant_metadata"] == example_contract["grant_metadata"]
+    assert without_rule_ids(restored) == without_rule_ids(example_contract)
+    assert [rule["rule_id"] for rule in restored["stages"][1]["spending_rules"]] == ["2.1", "2.2", "2.3", "2.4"]
+
+
+def test_numeric_mcc_codes_are_zero_padded(example_contract):
+    compact = to_compact(example_contract)
+    compact["s"][0][5] = [["l", "Услуги", 1000, [["Ветеринария", [742, "5047"]]]]]
+    rule = expand_compact(compact)["stages"][0]["spending_rules"][0]
+    assert rule["allowed_categories"] == [{"category": "Ветеринария", "mcc_codes": ["0742", "5047"]}]
+
+
+@pytest.mark.parametrize("damage", [
+    lambda c: c.pop("s"),
+    lambda c: c.__setitem__("g", ["Грант", 100]),
+    lambda c: c["s"][0].pop(),
+    lambda c: c["s"][0][5].append(["x", "Правило", 10, []]),
+    lambda c: c["s"][0][5].append(["l", "Правило", 10, ["без кодов"]]),
+    lambda c: c.__setitem__("s", None),
+])
+def test_broken_answer_raises_value_error(example_contract, damage):
+    compact = copy.deepcopy(to_compact(example_contract))
+    damage(compact)
+    with pytest.raises(ValueError):
+        expand_compact(compact)
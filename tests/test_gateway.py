@@ -0,0 +1,137 @@
+import asyncio
+import time
+import pytest
+from SCvalidators import LLMgateway as gateway_module
+from SCvalidators.LLMgateway import LLMGateway, GatewayError, extract_json
+
+MESSAGES = [{"role": "user", "content": "смета"}]
+
+
+def make_gateway(answers, models=("a", "b", "c"), **kwargs):
+    """
+    Шлюз с подменённым запросом: answers[model] = (секунды, текст) или (секунды, None, ошибка, retry_after).
+    Вызовы моделей пишутся в gateway.calls.
+    """
+    gateway = LLMGateway("http://llm.invalid/v1/chat/completions", "key", list(models), **kwargs)
+    gateway.calls = []
+
+    async def fake_call(model, messages, timeout, params):
+        gateway.calls.append(model)
+        delay, content, *rest = answers[model]
+        begin = time.perf_counter()
+        await asyncio.sleep(delay)
+        error, retry_after = rest if rest else (None, None)
+        return (time.perf_counter() - begin) * 1000, content, error, retry_after
+
+    gateway._call = fake_call
+    return gateway
+
+
+def measure(gateway, model, *latencies, ok=True):
+    for ms in latencies:
+        gateway.record(model, ms, ok)
+
+
+def test_extract_json():
+    assert extract_json('Вот ответ: {"a": {"b": 1}} - готово') == {"a": {"b": 1}}
+    assert extract_json("без json") is None
+    assert extract_json('{"a": ') is None
+
+
+def test_route_asks_new_models_first_then_fast_healthy_ones_and_failed_last():
+    gateway = LLMGateway("url", "key", ["slow", "fast", "new", "broken"], hedge_after=None)
+    measure(gateway, "slow", 900, 1000, 1100)
+    measure(gateway, "fast", 100, 200, 300)
+    measure(gateway, "broken", 50, ok=False)   # одни ошибки в окне - пауза
+    assert gateway.route() == ["new", "fast", "slow", "broken"]
+
+    measure(gateway, "new", 500)
+    gateway.record("fast", 100, False, retry_after=60)   # 429: тоже пауза, но с измеренной задержкой
+    assert gateway.route() == ["new", "slow", "fast", "broken"]
+    assert gateway.route(["broken", "fast"]) == ["fast", "broken"]
+
+
+def test_fallback_to_next_model_on_error_and_invalid_json():
+    gateway = make_gateway({"a": (0, None, "HTTPStatusError: 500", None), "b": (0, "не json"), "c": (0, '{"ok": 1}')},
+                           hedge_after=None)
+    answer = gateway.complete(MESSAGES)
+    assert answer["model"] == "c" and answer["result"] == {"ok": 1} and not answer["hedged"]
+    assert gateway.calls == ["a", "b", "c"]
+    assert gateway.counters["fallbacks"] == 2
+
+
+def test_rate_limited_model_cools_down(monkeypatch):
+    monkeypatch.setattr(gateway_module, "COOLDOWN", 30)
+    gateway = make_gateway({"a": (0, None, "HTTPStatusError: 429", 120.0), "b": (0, '{"ok": 1}')},
+                           models=("a", "b"), hedge_after=None)
+    measure(gateway, "a", 10)
+    measure(gateway, "b", 20)
+    assert gateway.complete(MESSAGES)["model"] == "b"
+    assert gateway.stats["a"].cooldown_until > time.monotonic() + 100
+    # до конца паузы первой идёт здоровая модель
+    gateway.calls.clear()
+    assert gateway.complete(MESSAGES)["model"] == "b"
+    assert gateway.calls == ["b"]
+
+
+def test_all_models_failing_raise_gateway_error():
+    gateway = make_gateway({"a": (0, None, "timeout", None), "b": (0, "{}x")}, models=("a", "b"), hedge_after=None)
+    with pytest.raises(GatewayError) as info:
+        gateway.complete(MESSAGES, validate=lambda text: None)
+    assert set(info.value.errors) == {"a", "b"}
+    assert gateway.counters["failed"] == 1
+
+
+def test_cancelled_primary_is_recorded_with_its_own_elapsed_time():
+    gateway = make_gateway({"a": (0.5, '{"from": "a"}'), "b": (0.05, '{"from": "b"}')}, models=("a", "b"),
+                           hedge_after=0.05)
+    measure(gateway, "a", 20)
+    measure(gateway, "b", 40)
+    answer = gateway.complete(MESSAGES)
+    assert answer["model"] == "b" and answer["hedged"]
+    assert gateway.counters["hedge_wins"] == 1 and gateway.counters["cancelled"] == 1
+    # a шла всю гонку и не успела: нижняя граница выше её p50 и попадает в окно
+    assert [ok for _, ok in gateway.stats["a"].samples] == [True, True]
+    assert gateway.stats["a"].samples[-1][0] == pytest.approx(answer["ms"], abs=20)
+
+
+def test_hedge_cancelled_soon_after_launch_does_not_look_fast():
+    gateway = make_gateway({"a": (0.1, '{"from": "a"}'), "b": (0.5, '{"from": "b"}')}, models=("a", "b"),
+                           hedge_after=0.06)
+    measure(gateway, "a", 50)
+    measure(gateway, "b", 80)
+    answer = gateway.complete(MESSAGES)
+    assert answer["model"] == "a" and answer["hedged"]
+    # дубль прожил ~40 мс - меньше своего p50; время гонки ему не приписывается, но и быстрее он не стал
+    assert list(gateway.stats["b"].samples) == [(80, True)]
+
+
+def test_gateway_finds_the_faster_model_later_in_the_list():
+    # a ~200 мс, b ~30 мс (в 4 раза быстрее, чем у рецензента, чтобы тест шёл недолго)
+    gateway = make_gateway({"a": (0.05, '{"from": "a"}'), "b": (0.008, '{"from": "b"}')}, models=("a", "b"),
+                           hedge_after="p95")
+    winners = [gateway.complete(MESSAGES)["model"] for _ in range(30)]
+    assert winners[0] == "a"          # пока замеров нет - порядок списка
+    assert winners[2:] == ["b"] * 28  # b спрошена и с тех пор первая
+    assert gateway.route() == ["b", "a"]
+    report = {row["model"]: row for row in gateway.report()}
+    assert report["b"]["p50_ms"] < 25 < report["a"]["p50_ms"]
+
+
+def test_new_models_get_primary_requests():
+    gateway = make_gateway({"a": (0.3, '{"from": "a"}'), "b": (0.3, '{"from": "b"}'), "c": (0.01, '{"from": "c"}')},
+                           hedge_after=0.02)
+    measure(gateway, "a", 100)
+    measure(gateway, "b", 200)
+    answer = gateway.complete(MESSAGES)
+    assert gateway.calls == ["c"]
+    assert answer["model"] == "c" and not answer["hedged"]
+
+
+def test_p95_hedge_waits_for_enough_samples():
+    gateway = LLMGateway("url", "key", ["a", "b"], hedge_after="p95")
+    measure(gateway, "a", *[100] * (gateway_module.MIN_SAMPLES - 1))
+    assert gateway._hedge_delay("a", "p95") is None
+    measure(gateway, "a", 100)
+    assert gateway._hedge_delay("a", "p95") == pytest.approx(0.1)
+    assert gateway._hedge_delay("a", None) is None
@@ -0,0 +1,51 @@
+import json
+from SCstorage import JsonStore
+from SCvalidators.PMstate import STATE_KEY, ValidationState
+
+GRANT = "grant"
+
+
+def individual(stage, amount, inn="1" * 12):
+    return {"payer_type": "individual", "inn": inn, "amount": amount, "date": stage["start_date"]}
+
+
+def first_rule(contract):
+    stage = contract["stages"][0]
+    rule = next(r for r in stage["spending_rules"] if r["rule_type"] == "individuals")
+    return stage, rule
+
+
+def test_journal_replay_skips_torn_line(tmp_path, contract):
+    stage, rule = first_rule(contract)
+    store = JsonStore(str(tmp_path), snapshot_every=100)
+    ValidationState.from_contract(contract).store(contract)
+    store.save(GRANT, contract)
+    entries = [(stage["stage_id"], rule["rule_id"], 100, individual(stage, 100)) for _ in range(3)]
+    store.add_payments(GRANT, contract, entries)
+    # обрыв записи посреди строки
+    with open(store.journal_path(GRANT), "a", encoding="utf-8") as f:
+        f.write('[4,"1","1.1",10')
+
+    fresh = JsonStore(str(tmp_path), snapshot_every=100)
+    state = ValidationState.from_contract(fresh.read(GRANT))
+    assert state.spent[(stage["stage_id"], rule["rule_id"])] == 300
+
+    # следующая запись не склеивается с оборванной и получает следующий seq
+    fresh.add_payments(GRANT, fresh.read(GRANT), entries[:1])
+    assert [p["seq"] for p in fresh.payments(GRANT)] == [1, 2, 3, 4]
+    assert ValidationState.from_contract(fresh.read(GRANT)).total_spent() == 400
+
+
+def test_snapshot_folds_journal_into_ledger(tmp_path, contract):
+    stage, rule = first_rule(contract)
+    store = JsonStore(str(tmp_path), snapshot_every=2)
+    state = ValidationState.from_contract(contract)
+    store.save(GRANT, state.store(contract))
+    for _ in range(5):
+        state.apply(individual(stage, 10))
+        store.add_payments(GRANT, state.store(contract), [(stage["stage_id"], rule["rule_id"], 10, individual(stage, 10))])
+
+    with open(store.path(GRANT), "r", encoding="utf-8") as f:
+        assert json.load(f)[STATE_KEY]["journal_seq"] == 4
+    assert ValidationState.from_contract(store.read(GRANT)).total_spent() == 50
+    assert [p["seq"] for p in store.payments(GRANT)] == [1, 2, 3, 4, 5]
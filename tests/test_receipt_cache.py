@@ -0,0 +1,80 @@
+import pytest
+from SCvalidators import ReceiptCache as receipt_cache_module
+from SCvalidators.ReceiptCache import ReceiptCache, fiscal_key
+
+RECEIPT = {"fn": "9287440300090728", "fd": "77133", "fp": "1482926127", "date": "15.12.2023", "summ": "2448,00"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(receipt_cache_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ReceiptCache(str(tmp_path / "receipts.db"))
+
+
+def test_fiscal_key_normalizes_sum_and_needs_fiscal_fields():
+    assert fiscal_key(RECEIPT) == fiscal_key(dict(RECEIPT, summ="2 448.0"))
+    assert fiscal_key(dict(RECEIPT, fn="0", fd="0", fp="0")) is None
+    assert fiscal_key({"fn": "1"}) is None
+
+
+def test_negative_verdict_expires_after_its_ttl(cache, clock, monkeypatch):
+    monkeypatch.setattr(receipt_cache_module, "NEGATIVE_TTL", 60)
+    cache.put_verdict(RECEIPT, False, {"success": False})
+    assert cache.get_verdict(RECEIPT) == (False, {"success": False})
+
+    clock.now += 61
+    assert cache.get_verdict(RECEIPT) is None
+    # и на диске тоже: новый процесс с пустой памятью
+    assert ReceiptCache(cache.path).get_verdict(RECEIPT) is None
+
+
+def test_positive_verdict_outlives_negative(cache, clock):
+    cache.put_verdict(RECEIPT, True, {"success": True})
+    clock.now += receipt_cache_module.NEGATIVE_TTL + 1
+    assert ReceiptCache(cache.path).get_verdict(RECEIPT) == (True, {"success": True})
+    clock.now += receipt_cache_module.POSITIVE_TTL
+    assert cache.get_verdict(RECEIPT) is None
+
+
+@pytest.mark.parametrize("details", [None, "Ошибка сети", {"error": "нет cookie"}, {"status": 503}])
+def test_transport_errors_are_not_cached(cache, details):
+    cache.put_verdict(RECEIPT, False, details)
+    assert cache.get_verdict(RECEIPT) is None
+
+
+def test_prune_removes_expired_rows(cache, clock):
+    cache.put("ocr", "old", {"a": 1}, ttl=10)
+    cache.put("ocr", "new", {"a": 2}, ttl=1000)
+    clock.now += 11
+    cache.prune()
+    fresh = ReceiptCache(cache.path)
+    assert fresh.get("ocr", "old") is None
+    assert fresh.get("ocr", "new") == {"a": 2}
+
+
+def test_receipt_reuse_across_grants(cache):
+    assert cache.mark_used(RECEIPT, "grant-a") == []
+    assert cache.mark_used(RECEIPT, "grant-a") == []
+    assert cache.mark_used(RECEIPT, "grant-b") == ["grant-a"]
+
+
+def test_not_found_ocr_answer_is_not_cached(cache):
+    zeros = {"fn": "0", "fd": "0", "fp": "0", "date": "00.00.0000", "summ": "0,00"}
+    cache.put_fields(b"photo", zeros)
+    assert cache.get_fields(b"photo") is None
+    cache.put_fields(b"photo", RECEIPT)
+    assert ReceiptCache(cache.path).get_fields(b"photo") == RECEIPT
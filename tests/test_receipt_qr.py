@@ -0,0 +1,29 @@
+import pytest
+from SCvalidators.ReceiptQR import parse_receipt_qr
+
+QR = "t=20231215T1945&s=2448.00&fn=9287440300090728&i=77133&fp=1482926127&n=1"
+
+
+def test_qr_fields():
+    assert parse_receipt_qr(QR) == {
+        "type": "request", "fp": "1482926127", "fn": "9287440300090728", "fd": "77133",
+        "date": "15.12.2023", "time": "19:45", "operationtype": "1", "summ": "2448,00",
+    }
+
+
+def test_qr_with_seconds_and_default_operation_type():
+    data = parse_receipt_qr("t=20231215T194530&s=15&fn=1&i=2&fp=3")
+    assert (data["time"], data["summ"], data["operationtype"]) == ("19:45", "15,00", "1")
+
+
+@pytest.mark.parametrize("text", [
+    "https://example.com/",
+    "t=20231215T1945&s=2448.00&fn=9287440300090728&i=77133",       # нет fp
+    "t=20231215T1945&s=2448.00&fn=9287440300090728&i=77133&fp=",   # пустой fp
+    "t=2023121519&s=2448.00&fn=1&i=2&fp=3",                        # неизвестный формат времени
+    "t=20231315T1945&s=2448.00&fn=1&i=2&fp=3",                     # 13-й месяц
+    "t=20231215T1945&s=много&fn=1&i=2&fp=3",
+    "t=20231215T1945&s=2448.00&fn=12a&i=2&fp=3",
+])
+def test_qr_rejects_non_receipts(text):
+    assert parse_receipt_qr(text) is None
@@ -0,0 +1,121 @@
+import threading
+import pytest
+
+# BillValidator читает ключи API из config.py
+pytest.importorskip("config")
+
+from SCvalidators.HTTPpool import RateLimiter
+from SCvalidators.ReceiptCache import ReceiptCache
+from SCvalidators.ReceiptQueue import verify_receipts_sync
+
+RECEIPT = {"fn": "9287440300090728", "fd": "77133", "fp": "1482926127", "date": "15.12.2023", "summ": "2448,00"}
+
+
+def run(images, **kwargs):
+    kwargs.setdefault("fast", None)
+    kwargs.setdefault("cache", False)
+    return verify_receipts_sync(images, ocr_rate=RateLimiter(6000), fns_rate=RateLimiter(6000), **kwargs)
+
+
+def receipt_for(image):
+    return dict(RECEIPT, fd=image.decode())
+
+
+def test_results_come_back_in_upload_order():
+    images = [str(i).encode() for i in range(20)]
+    results = run(images, ocr=receipt_for, verify=lambda data: (True, {"success": True}))
+    assert [r["index"] for r in results] == list(range(20))
+    assert all(r["ok"] and r["stage"] == "fns" for r in results)
+
+
+def test_stage_errors_become_results():
+    def ocr(image):
+        if image == b"bad-ocr":
+            raise RuntimeError("LLM недоступна")
+        if image == b"blank":
+            return None
+        return receipt_for(image)
+
+    def verify(data):
+        if data["fd"] == "bad-fns":
+            raise ConnectionError("ФНС недоступна")
+        return True, {"success": True}
+
+    results = run([b"1", b"bad-ocr", b"blank", b"bad-fns", b"2"], ocr=ocr, verify=verify)
+    assert [(r["ok"], r["stage"]) for r in results] == [
+        (True, "fns"), (False, "ocr"), (False, "ocr"), (False, "fns"), (True, "fns")]
+    assert results[1]["error"] == "LLM недоступна"
+    assert results[2]["error"] == "Не удалось распознать чек"
+    assert results[3]["error"] == "ФНС недоступна"
+
+
+def test_failed_qr_falls_back_to_ocr():
+    def fast(image):
+        if image == b"qr":
+            return dict(RECEIPT, fd="qr")
+        raise ValueError("битая картинка")
+
+    ocr_calls = []
+
+    def ocr(image):
+        ocr_calls.append(image)
+        return receipt_for(image)
+
+    results = run([b"qr", b"photo"], fast=fast, ocr=ocr, verify=lambda data: (True, {"success": True}))
+    assert all(r["ok"] for r in results)
+    assert ocr_calls == [b"photo"]
+
+
+class Interrupted(BaseException):
+    pass
+
+
+class BrokenCache:
+    def get_fields(self, image):
+        raise Interrupted()
+
+
+def test_crashed_pipeline_raises_instead_of_hanging():
+    with pytest.raises(Interrupted):
+        run([b"1", b"2"], cache=BrokenCache(), ocr=receipt_for, verify=lambda data: (True, {"success": True}))
+
+
+def test_cache_skips_repeated_receipts(tmp_path):
+    cache = ReceiptCache(str(tmp_path / "receipts.db"))
+    calls = {"ocr": 0, "fns": 0}
+    lock = threading.Lock()
+
+    def ocr(image):
+        with lock:
+            calls["ocr"] += 1
+        return receipt_for(image)
+
+    def verify(data):
+        with lock:
+            calls["fns"] += 1
+        return True, {"success": True}
+
+    first = run([b"1", b"2"], cache=cache, ocr=ocr, verify=verify, grant="grant-a")
+    second = run([b"1", b"2"], cache=cache, ocr=ocr, verify=verify, grant="grant-b")
+    assert calls == {"ocr": 2, "fns": 2}
+    assert all(r["cached"] == [] for r in first)
+    assert all(r["cached"] == ["ocr", "fns"] and r["reused_in"] == ["grant-a"] for r in second)
+
+
+def test_not_found_answer_is_retried_and_not_sent_to_fns(tmp_path):
+    cache = ReceiptCache(str(tmp_path / "receipts.db"))
+    zeros = {"fn": "0", "fd": "0", "fp": "0", "date": "00.00.0000", "summ": "0,00"}
+    ocr_calls, verify_calls = [], []
+
+    def ocr(image):
+        ocr_calls.append(image)
+        return zeros
+
+    def verify(data):
+        verify_calls.append(data)
+        return True, {"success": True}
+
+    for _ in range(2):
+        result, = run([b"blurred"], cache=cache, ocr=ocr, verify=verify)
+        assert not result["ok"] and result["stage"] == "ocr" and result["error"] == "Не удалось распознать чек"
+    assert len(ocr_calls) == 2 and verify_calls == []
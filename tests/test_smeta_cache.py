@@ -0,0 +1,60 @@
+import uuid
+import pytest
+
+# SmetaParser читает ключ API из config.py
+pytest.importorskip("config")
+
+from SCvalidators import SCvalidator
+from SCvalidators.SCvalidator import SmetaParser
+from SCvalidators.SmetaCache import smeta_cache
+
+WHOLE = {"grant_metadata": {"name": "целиком"}, "stages": []}
+LAYOUT = {"grant_metadata": {"name": "по вёрстке"}, "stages": []}
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    parser = SmetaParser(api_key="test", mcc_top_k=0)
+    text = f"смета {uuid.uuid4()}"   # свой ключ кэша на каждый тест
+    parser.calls = []
+    monkeypatch.setattr(parser, "_read_docx", lambda path: text)
+    monkeypatch.setattr(SCvalidator, "layout_contract", lambda smeta_text: {"stages": []})
+
+    def parse_whole(smeta_text, on_progress, stream):
+        parser.calls.append("whole")
+        return "ответ", WHOLE
+
+    monkeypatch.setattr(parser, "_parse_whole", parse_whole)
+    parser.text = text
+    return parser
+
+
+def classify(parser, result):
+    def parse_layout(contract):
+        parser.calls.append("layout")
+        parser.layout_stats = {"issues": [], "rules": 0, "categories": 0, "total_ms": 0}
+        return None, result
+    return parse_layout
+
+
+def test_failed_classification_is_cached_under_the_whole_parse_key(parser, monkeypatch):
+    monkeypatch.setattr(parser, "_parse_layout", classify(parser, None))
+    assert parser.parse("smeta.docx", verbose=False) == WHOLE
+    assert smeta_cache().get(parser.cache_key(parser.text, layout=True)) is None
+    assert smeta_cache().get(parser.cache_key(parser.text)) == WHOLE
+
+    # повторная смета: классификация снова не удалась, но модель целиком уже не спрашивается
+    assert parser.parse("smeta.docx", verbose=False) == WHOLE
+    assert parser.calls == ["layout", "whole", "layout"]
+
+    # разбор по вёрстке, когда он удался, не получает ответ разбора целиком
+    monkeypatch.setattr(parser, "_parse_layout", classify(parser, LAYOUT))
+    assert parser.parse("smeta.docx", verbose=False) == LAYOUT
+    assert smeta_cache().get(parser.cache_key(parser.text, layout=True)) == LAYOUT
+
+
+def test_layout_result_is_served_from_cache(parser, monkeypatch):
+    monkeypatch.setattr(parser, "_parse_layout", classify(parser, LAYOUT))
+    assert parser.parse("smeta.docx", verbose=False) == LAYOUT
+    assert parser.parse("smeta.docx", verbose=False) == LAYOUT
+    assert parser.calls == ["layout"]
@@ -0,0 +1,48 @@
+import numpy as np
+from SCvalidators.PMstages import StageIndex, check_stages, date_ordinal
+
+
+def stages(*ranges):
+    return [{"stage_id": number, "start_date": start, "end_date": end}
+            for number, (start, end) in enumerate(ranges, 1)]
+
+
+def test_contiguous_stages_have_no_issues():
+    index = StageIndex(stages(("2026-01-01", "2026-06-30"), ("2026-07-01", "2026-12-31")))
+    assert index.issues == []
+    assert index.lookup(date_ordinal("2026-06-30"))["stage_id"] == 1
+    assert index.lookup(date_ordinal("2026-07-01"))["stage_id"] == 2
+    assert index.lookup(date_ordinal("2025-12-31")) is None
+    assert index.lookup(date_ordinal("2027-01-01")) is None
+
+
+def test_overlap_is_reported_and_last_stage_wins():
+    index = StageIndex(stages(("2026-01-01", "2026-06-30"), ("2026-06-01", "2026-12-31")))
+    assert len(index.issues) == 1 and "пересекаются" in index.issues[0]
+    # как в исходном линейном поиске: при пересечении действует последний этап списка
+    assert index.lookup(date_ordinal("2026-06-15"))["stage_id"] == 2
+    assert index.lookup(date_ordinal("2026-05-31"))["stage_id"] == 1
+
+
+def test_nested_stage_returns_to_outer_after_it_ends():
+    index = StageIndex(stages(("2026-01-01", "2026-12-31"), ("2026-03-01", "2026-03-31")))
+    assert index.lookup(date_ordinal("2026-03-15"))["stage_id"] == 2
+    assert index.lookup(date_ordinal("2026-04-01"))["stage_id"] == 1
+
+
+def test_gap_is_reported_and_dates_in_it_are_outside_the_project():
+    index = StageIndex(stages(("2026-01-01", "2026-03-31"), ("2026-05-01", "2026-12-31")))
+    assert len(index.issues) == 1 and "разрыв" in index.issues[0]
+    assert index.lookup(date_ordinal("2026-04-15")) is None
+
+
+def test_reversed_dates_are_reported_and_stage_is_skipped():
+    issues = check_stages({"stages": stages(("2026-06-30", "2026-01-01"))})
+    assert len(issues) == 1 and "позже" in issues[0]
+    assert StageIndex(stages(("2026-06-30", "2026-01-01"))).lookup(date_ordinal("2026-03-01")) is None
+
+
+def test_vector_positions_match_scalar_lookup():
+    index = StageIndex(stages(("2026-01-01", "2026-06-30"), ("2026-06-01", "2026-09-30"), ("2026-11-01", "2026-12-31")))
+    days = np.arange(date_ordinal("2025-12-25"), date_ordinal("2027-01-05"))
+    assert index.positions(days).tolist() == [index.position(int(day)) for day in days]
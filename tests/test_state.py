@@ -0,0 +1,59 @@
+import copy
+from SCvalidators.PMstate import STATE_KEY, ValidationState
+
+
+def individual(stage, amount, inn="1" * 12):
+    return {"payer_type": "individual", "inn": inn, "amount": amount, "date": stage["start_date"]}
+
+
+def first_rule(contract):
+    stage = contract["stages"][0]
+    rule = next(r for r in stage["spending_rules"] if r["rule_type"] == "individuals")
+    return stage, rule
+
+
+def test_apply_all_is_all_or_nothing(contract):
+    stage, rule = first_rule(contract)
+    state = ValidationState.from_contract(contract)
+    errors = state.apply_all([individual(stage, 1000), individual(stage, rule["limit"])])
+    assert errors and "Превышен лимит" in errors[0]
+    assert state.total_spent() == 0
+    assert state.apply_all([individual(stage, 1000), individual(stage, 2000)]) == []
+    assert state.remaining(stage["stage_id"], rule["rule_id"]) == rule["limit"] - 3000
+
+
+def test_state_survives_store_and_restore(contract):
+    stage, rule = first_rule(contract)
+    state = ValidationState.from_contract(contract)
+    state.apply(individual(stage, 1500))
+    restored = ValidationState.from_contract(state.store(contract))
+    assert restored.spent == state.spent
+    assert contract["stages"][0]["spending_rules"][0]["spent"] == 1500
+    # лимиты в новом формате не уменьшаются тратами
+    assert contract["stages"][0]["spending_rules"][0]["limit"] == rule["limit"]
+
+
+def test_legacy_contract_migration_is_idempotent(contract):
+    stage, rule = first_rule(contract)
+    legacy = copy.deepcopy(contract)
+    # старый формат: потраченное вычтено из лимита и бюджета
+    legacy["stages"][0]["spending_rules"][0]["limit"] -= 5000
+    legacy["stages"][0]["spending_rules"][0]["spent"] = 5000
+    legacy["grant_metadata"]["total_budget"] -= 5000
+    original = copy.deepcopy(legacy)
+
+    state = ValidationState.from_contract(legacy)
+    assert legacy == original
+    assert state.migrated and state.total_budget == contract["grant_metadata"]["total_budget"]
+    assert state.limits[(stage["stage_id"], rule["rule_id"])] == rule["limit"]
+
+    assert state.apply(individual(stage, 1000)) == []
+    stored = state.store(legacy)
+    assert STATE_KEY in stored
+    assert stored["stages"][0]["spending_rules"][0]["limit"] == rule["limit"]
+    assert stored["grant_metadata"]["total_budget"] == contract["grant_metadata"]["total_budget"]
+
+    again = ValidationState.from_contract(copy.deepcopy(stored))
+    assert not again.migrated
+    assert again.spent[(stage["stage_id"], rule["rule_id"])] == 6000
+    assert again.store(copy.deepcopy(stored)) == stored
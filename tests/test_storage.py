@@ -0,0 +1,92 @@
+import pytest
+import SChandler
+from SCstorage import JsonStore, SqliteStore, SCConflict
+from SCvalidators.PMstate import ValidationState
+
+GRANT = "grant"
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteStore(str(tmp_path / "contracts.db"))
+    return JsonStore(str(tmp_path), snapshot_every=5)
+
+
+@pytest.fixture
+def handler(store, monkeypatch):
+    """SChandler поверх временного хранилища с пустым кэшем"""
+    monkeypatch.setattr(SChandler, "_store", store)
+    SChandler._cache_clear()
+    yield SChandler
+    SChandler._cache_clear()
+
+
+def individual(stage, amount, inn="1" * 12):
+    return {"payer_type": "individual", "inn": inn, "amount": amount, "date": stage["start_date"]}
+
+
+def first_rule(contract):
+    stage = contract["stages"][0]
+    rule = next(r for r in stage["spending_rules"] if r["rule_type"] == "individuals")
+    return stage, rule
+
+
+def test_save_with_stale_version_conflicts(store, contract):
+    version = store.save(GRANT, contract)
+    store.save(GRANT, contract, expected_version=version)
+    with pytest.raises(SCConflict):
+        store.save(GRANT, contract, expected_version=version)
+
+
+def test_add_payments_with_stale_version_conflicts(store, contract):
+    stage, rule = first_rule(contract)
+    ValidationState.from_contract(contract).store(contract)
+    version = store.save(GRANT, contract)
+    entry = (stage["stage_id"], rule["rule_id"], 100, individual(stage, 100))
+    new_version = store.add_payments(GRANT, contract, [entry], expected_version=version)
+    assert new_version != version
+    with pytest.raises(SCConflict):
+        store.add_payments(GRANT, contract, [entry], expected_version=version)
+    assert len(list(store.payments(GRANT))) == 1
+
+
+def test_pay_accumulates_and_respects_limit(handler, contract):
+    stage, rule = first_rule(contract)
+    handler.saveSC(GRANT, contract)
+    for i in range(12):
+        assert handler.paySC(GRANT, [individual(stage, 1000, inn=f"{i:012d}")]) == []
+    errors = handler.paySC(GRANT, [individual(stage, rule["limit"])])
+    assert errors and "Превышен лимит" in errors[0]
+
+    # свежее чтение мимо кэша: снимки и журнал сходятся к тем же тратам
+    handler._cache_clear()
+    state = ValidationState.from_contract(handler.readSC(GRANT))
+    assert state.spent[(stage["stage_id"], rule["rule_id"])] == 12000
+    assert [p["seq"] for p in handler.getPayments(GRANT)] == list(range(1, 13))
+
+
+def test_pay_retries_after_concurrent_write(handler, contract, monkeypatch):
+    stage, _ = first_rule(contract)
+    handler.saveSC(GRANT, contract)
+    store = handler.getStore()
+    add_payments = store.add_payments
+    calls = []
+
+    def racing_add_payments(name, sc, entries, expected_version=None):
+        # первая попытка проигрывает гонку: другой сеанс успевает оплатить грант
+        if not calls:
+            calls.append("other")
+            other, trn = handler.readSC(name), individual(stage, 500, "2" * 12)
+            state = ValidationState.from_contract(other)
+            assert state.apply(trn) == []
+            add_payments(name, state.store(other), [(stage["stage_id"], "1.1", 500, trn)])
+        calls.append("ours")
+        return add_payments(name, sc, entries, expected_version=expected_version)
+
+    monkeypatch.setattr(store, "add_payments", racing_add_payments)
+    assert handler.paySC(GRANT, [individual(stage, 700)]) == []
+    assert calls == ["other", "ours", "ours"]
+    handler._cache_clear()
+    state = ValidationState.from_contract(handler.readSC(GRANT))
+    assert state.total_spent() == 1200
@@ -0,0 +1,89 @@
+import io
+import json
+import pytest
+from SCvalidators.PMstream import iter_transfers, iter_json_array, validate_stream
+from SCvalidators.PMvalidator import validate_payments
+
+TRANSFERS = [
+    {"payer_type": "individual", "inn": "123456789012", "amount": 1000, "date": "2026-02-01"},
+    {"payer_type": "legal_entity", "inn": "7701234567", "amount": 2500.5, "mcc": "5047", "date": "2026-03-15"},
+    {"payer_type": "legal_entity", "inn": "7707654321", "amount": 12000, "mcc": "8071", "date": "2027-05-20"},
+]
+
+CSV_RU = """Тип плательщика;ИНН;Сумма операции;MCC;Дата операции
+физлицо;123456789012;1 000,00;;01.02.2026
+юрлицо;7701234567;2 500,50;5047;15.03.2026
+ЮЛ;7707654321;12000;8071;20.05.2027
+"""
+
+CSV_EN = """payer_type,inn,amount,mcc,date
+individual,123456789012,1000,,2026-02-01
+legal_entity,7701234567,2500.5,5047,2026-03-15
+legal_entity,7707654321,12000,8071,2027-05-20
+"""
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = {}
+    paths["json"] = tmp_path / "transfers.json"
+    paths["json"].write_text(json.dumps(TRANSFERS, ensure_ascii=False, indent=2), encoding="utf-8")
+    paths["jsonl"] = tmp_path / "transfers.jsonl"
+    paths["jsonl"].write_text("\n".join(json.dumps(t) for t in TRANSFERS) + "\n\n", encoding="utf-8")
+    paths["csv_ru"] = tmp_path / "transfers_ru.csv"
+    # выписки из банка часто приходят с BOM
+    paths["csv_ru"].write_text("﻿" + CSV_RU, encoding="utf-8")
+    paths["csv_en"] = tmp_path / "transfers_en.csv"
+    paths["csv_en"].write_text(CSV_EN, encoding="utf-8")
+    return paths
+
+
+@pytest.mark.parametrize("name", ["json", "jsonl", "csv_ru", "csv_en"])
+def test_readers_yield_same_transfers(files, name):
+    assert list(iter_transfers(str(files[name]))) == TRANSFERS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_json_array_across_chunk_boundaries(chunk_size):
+    data = [1, 23456, -7.5, "a,]b", {"x": [1, 2]}, None, 1e10]
+    assert list(iter_json_array(io.StringIO(json.dumps(data)), chunk_size=chunk_size)) == data
+    assert list(iter_json_array(io.StringIO(" [ ] "), chunk_size=chunk_size)) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 64])
+@pytest.mark.parametrize("text", ["", "{}", "[1, 2", "[1 2]", "[,1]", "[1,,2]", "[1,]", "[1]x", "[1] ]",
+                                  "[1-]", "[tru]", '[{"a" 1}, 2]', '["a]'])
+def test_json_array_rejects_broken_input(text, chunk_size):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+
+
+class CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def test_broken_element_fails_without_reading_the_rest():
+    f = CountingReader('[{"inn": "1"}, {"inn" "2"}, ' + ", ".join(['{"inn": "3"}'] * 10000) + "]")
+    with pytest.raises(ValueError):
+        list(iter_json_array(f, chunk_size=1024))
+    assert f.reads == 1
+
+
+def test_validate_stream_matches_validate_payments(files, contract, tmp_path):
+    out = tmp_path / "report.jsonl"
+    with open(out, "w", encoding="utf-8") as f:
+        stream = validate_stream(contract, str(files["csv_ru"]), f)
+    expected = validate_payments(contract, TRANSFERS)
+    assert stream.limits_used == expected["limits_used"]
+    assert stream.counts == {"transfers": 3, "report": len(expected["report"]), "error": len(expected["errors"])}
+    with open(out, "r", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert [line["message"] for line in lines if line["kind"] == "report"] == expected["report"]
+    assert [line["message"] for line in lines if line["kind"] == "error"] == expected["errors"]
+    assert lines[-1]["kind"] == "summary"